@@ -1,46 +1,217 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from datetime import datetime, timedelta
-import openai
+from concurrent.futures import ThreadPoolExecutor
 import os
 from dotenv import load_dotenv
-from icalendar import Calendar, Event
+from icalendar import Calendar
+from icalendar.parser import foldline
 import json
 from pathlib import Path
+import queue
 import re
-from event_generator import generate_events, create_activity_event
+import threading
+import time
+from event_generator import (generate_events, generate_events_batch, process_events, default_events,
+                             generate_in_batches, parse_batch_days, max_batch_days,
+                             BATCH_MAX_TOKENS, EVENT_BATCH_DAY_TOKENS, EVENT_INSTRUCTIONS)
+from plan_event import (PlanEvent, EVENT_CATEGORIES, PRIORITY_VALUES, WEEKDAYS, BYDAY_CODES, event_uid, profile_hash,
+                        parse_minutes, cancelled_event_ical)
 from icalagentGPT import generate_plan
 from brain_dump import create_calendar_from_brain_dump
+from llm_cache import cached_chat_completion, get_cache_stats
+from llm_client import get_client_stats
+from jobs import submit_job, get_job, iter_job_events
+from event_store import query_events, sync_token, changes_since
+from occupancy import Occupancy
+from scheduler import SLOT_MINUTES, pack_day
+from cashflow import CashFlow
+from perf import stage
+from artifacts import (new_plan_id, open_plan, plan_path, plan_url, plan_feed_url, plan_variants, save_plan_inputs,
+                       load_plan_inputs, touch_plan, PLAN_TTL)
+from ics_writer import (ICSWriter, write_calendar, split_calendar, component_properties, calendar_header,
+                        CALENDAR_FOOTER)
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 app = Flask(__name__)
 
-# Initialize calendar
-cal = Calendar()
-cal.add('prodid', '-//Enhanced Life & Budget Planner//mxm.dk//')
-cal.add('version', '2.0')
-
 # Maximum date range (6 months)
 MAX_DATE_RANGE = timedelta(days=180)
 
-# Default time slots for different types of activities
-TIME_SLOTS = {
-    "morning": {"start": "07:00", "end": "12:00"},
-    "afternoon": {"start": "12:00", "end": "17:00"},
-    "evening": {"start": "17:00", "end": "22:00"}
-}
-
-# Event categories and their colors
-EVENT_CATEGORIES = {
-    "financial": "#4CAF50",  # Green
-    "meal": "#FF9800",       # Orange
-    "workout": "#2196F3",    # Blue
-    "learning": "#9C27B0",   # Purple
-    "hobby": "#E91E63",      # Pink
-    "work": "#FF5722",       # Deep Orange
-    "other": "#607D8B"       # Grey
-}
+# Number of days generated concurrently; each day makes blocking OpenAI calls
+PLAN_CONCURRENCY = int(os.getenv("PLAN_CONCURRENCY", "4"))
+
+# Most days a single request may generate concurrently, whatever concurrency it asks for
+PLAN_CONCURRENCY_MAX = int(os.getenv("PLAN_CONCURRENCY_MAX", "8"))
+
+# Streamed plans a worker process generates at the same time; further stream requests get a 503
+STREAM_WORKERS = int(os.getenv("STREAM_WORKERS", "2"))
+
+_stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix='plan-stream')
+_stream_slots = threading.BoundedSemaphore(STREAM_WORKERS)
+
+# Days covered by one LLM request; 1 sends a separate request per day
+PLAN_BATCH_DAYS = int(os.getenv("PLAN_BATCH_DAYS", "1"))
+
+# Plan generation modes: one plan per day, or one recurring plan per weekday group
+PLAN_MODES = ['daily', 'weekday_template']
+PLAN_MODE = os.getenv("PLAN_MODE", "daily")
+
+# Where financial events come from: a separate LLM request, the LLM in the same request as the
+# activities, or the budget's projected cash flow with no LLM call
+FINANCIAL_SOURCES = ['llm', 'merged', 'local']
+FINANCIAL_SOURCE = os.getenv("FINANCIAL_SOURCE", "llm")
+
+# Time of the first payday or bill event, and weekday (0 = Monday) and time of the
+# weekly budget review, in locally generated financial plans
+TRANSACTION_TIME = "08:00"
+BUDGET_REVIEW_WEEKDAY = 6
+BUDGET_REVIEW_TIME = "18:00"
+
+# Completion tokens allowed for one day's financial plan, and for one day of a merged request
+DAILY_PLAN_TOKENS = 1000
+MERGED_DAY_TOKENS = 3000
+
+# Completion tokens the same days are expected to take in a batched request; batched requests
+# cover as many days as fit in BATCH_MAX_TOKENS (10 and 4 at its default)
+DAILY_PLAN_BATCH_DAY_TOKENS = 400
+MERGED_BATCH_DAY_TOKENS = 1000
+
+# JSON structure of one generated day, shared by the single-day and batched prompts
+DAILY_PLAN_SCHEMA = """{
+        "events": [
+            {
+                "title": "Event Title",
+                "time": "HH:MM",
+                "duration": "1h" or "30m",
+                "description": "Detailed description with proper spacing and formatting",
+                "category": "financial", "meal", "workout", "learning", "hobby", "other",
+                "priority": "high", "medium", or "low",
+                "financial_details": {
+                    "type": "bill_payment", "income", "expense", "savings", "budget_review",
+                    "amount": float,
+                    "due_date": "YYYY-MM-DD",
+                    "account_balance": float,
+                    "notes": string
+                }
+            }
+        ],
+        "financial_summary": {
+            "expected_balance": float,
+            "upcoming_bills": [
+                {
+                    "name": string,
+                    "amount": float,
+                    "due_date": "YYYY-MM-DD"
+                }
+            ],
+            "upcoming_income": [
+                {
+                    "source": string,
+                    "amount": float,
+                    "date": "YYYY-MM-DD"
+                }
+            ],
+            "savings_progress": {
+                "current": float,
+                "goal": float,
+                "percentage": float
+            }
+        }
+    }"""
+
+# Planning rules shared by the single-day and batched prompts
+DAILY_PLAN_INSTRUCTIONS = """Include events for:
+    1. Financial tasks and reminders:
+       - Bill payments due
+       - Income expected
+       - Budget review and planning
+       - Savings goal tracking
+       - Account balance monitoring
+    2. Activities and goals for the day:
+       - Workout sessions
+       - Learning activities
+       - Hobbies and free time activities
+       - Family time
+    3. Meal planning and preparation
+    4. Personal development activities
+
+    Important:
+    - Use 24-hour format for time (e.g., "14:30")
+    - Keep descriptions clear and concise
+    - Ensure all events have valid times between 06:00 and 22:00
+    - Space events appropriately throughout the day
+    - Include specific details in descriptions
+    - Prioritize financial tasks based on due dates
+    - Consider energy levels and time constraints"""
+
+# JSON structure of one day with both financial and activity events, for merged requests
+MERGED_DAY_SCHEMA = """{
+        "events": [
+            {
+                "title": "Event Title",
+                "time": "HH:MM",
+                "duration": "1h" or "30m",
+                "description": "Detailed description with proper spacing and formatting",
+                "category": "financial", "work", "meal", "workout", "learning", "hobby", "other",
+                "priority": "high", "medium", or "low",
+                "financial_details": {
+                    "type": "bill_payment", "income", "expense", "savings", "budget_review",
+                    "amount": float,
+                    "due_date": "YYYY-MM-DD",
+                    "account_balance": float,
+                    "notes": string
+                },
+                "activity_details": {
+                    "type": "work", "meal_planning", "workout", "learning", "hobby",
+                    "preferred_time": "morning", "afternoon", "evening",
+                    "notes": string,
+                    "sub_activities": [
+                        {
+                            "name": string,
+                            "duration": "1h" or "30m",
+                            "description": string
+                        }
+                    ]
+                }
+            }
+        ],
+        "financial_summary": {
+            "expected_balance": float,
+            "upcoming_bills": [
+                {
+                    "name": string,
+                    "amount": float,
+                    "due_date": "YYYY-MM-DD"
+                }
+            ],
+            "upcoming_income": [
+                {
+                    "source": string,
+                    "amount": float,
+                    "date": "YYYY-MM-DD"
+                }
+            ],
+            "savings_progress": {
+                "current": float,
+                "goal": float,
+                "percentage": float
+            }
+        },
+        "work_schedule": {
+            "start_time": "HH:MM",
+            "end_time": "HH:MM",
+            "breaks": [
+                {
+                    "start": "HH:MM",
+                    "end": "HH:MM"
+                }
+            ]
+        }
+    }"""
+
+# Rules for merged requests on top of the financial and activity ones
+MERGED_INSTRUCTIONS = '- Give financial events "financial_details" and every other event "activity_details"'
 
 def parse_budget_input(user_input):
     prompt = f"""
@@ -96,7 +267,7 @@ def parse_budget_input(user_input):
     """
     
     try:
-        response = openai.chat.completions.create(
+        response_text = cached_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are a financial information parser. Return only valid JSON, no additional text. Make sure to include all required fields with appropriate default values if not provided."},
@@ -104,8 +275,7 @@ def parse_budget_input(user_input):
             ],
             max_tokens=1000,
             temperature=0.3
-        )
-        response_text = response.choices[0].message.content.strip()
+        ).strip()
         # Remove any markdown code block markers
         response_text = re.sub(r'```json\s*|\s*```', '', response_text)
         # Parse the JSON response
@@ -184,7 +354,7 @@ def parse_activity_goals(user_input):
     """
     
     try:
-        response = openai.chat.completions.create(
+        response_text = cached_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are an activity goals parser. Return only valid JSON, no additional text. Make sure to include all required fields with appropriate default values if not provided."},
@@ -192,8 +362,7 @@ def parse_activity_goals(user_input):
             ],
             max_tokens=1000,
             temperature=0.3
-        )
-        response_text = response.choices[0].message.content.strip()
+        ).strip()
         response_text = re.sub(r'```json\s*|\s*```', '', response_text)
         parsed_data = json.loads(response_text)
         
@@ -237,51 +406,64 @@ def parse_activity_goals(user_input):
         print(f"Error parsing activity goals: {str(e)}")
         return {"error": str(e)}
 
-def generate_daily_plan(date, budget_info, activity_goals):
+def default_daily_plan(budget_info):
+    """Return the minimal plan used when no events could be generated."""
+    return {
+        "events": [{
+            "title": "Daily Planning",
+            "time": "09:00",
+            "duration": "1h",
+            "description": "Review your daily goals and schedule",
+            "category": "other",
+            "priority": "medium"
+        }],
+        "financial_summary": {
+            "expected_balance": budget_info.get('starting_balance', 0),
+            "upcoming_bills": [],
+            "upcoming_income": [],
+            "savings_progress": {
+                "current": 0,
+                "goal": budget_info.get('savings_goal', 0),
+                "percentage": 0
+            }
+        }
+    }
+
+@stage('validation')
+def validate_daily_plan(parsed_data, date, budget_info):
+    """Validate and fill in one day of a generated plan."""
+    if 'events' not in parsed_data or not parsed_data['events']:
+        # Create a default event if none were generated
+        parsed_data = default_daily_plan(budget_info)
+    
+    # Validate each event into a PlanEvent
+    events = []
+    for event in parsed_data['events']:
+        plan_event = PlanEvent.from_dict(event, 'financial_details')
+        
+        # Add financial details if applicable
+        if plan_event.category == 'financial' and not plan_event.details:
+            plan_event.details = {
+                'type': 'budget_review',
+                'amount': 0,
+                'due_date': date.strftime('%Y-%m-%d'),
+                'account_balance': budget_info.get('starting_balance', 0),
+                'notes': 'Daily financial review'
+            }
+        events.append(plan_event)
+    parsed_data['events'] = events
+    
+    # Ensure financial summary exists
+    if 'financial_summary' not in parsed_data:
+        parsed_data['financial_summary'] = default_daily_plan(budget_info)['financial_summary']
+    
+    return parsed_data
+
+def generate_daily_plan(date, budget_info, activity_goals, refresh=False):
     prompt = f"""
     Generate a detailed daily plan for {date.strftime('%Y-%m-%d')} based on the following information.
     Format the response as a JSON object with the following structure:
-    {{
-        "events": [
-            {{
-                "title": "Event Title",
-                "time": "HH:MM",
-                "duration": "1h" or "30m",
-                "description": "Detailed description with proper spacing and formatting",
-                "category": "financial", "meal", "workout", "learning", "hobby", "other",
-                "priority": "high", "medium", or "low",
-                "financial_details": {{
-                    "type": "bill_payment", "income", "expense", "savings", "budget_review",
-                    "amount": float,
-                    "due_date": "YYYY-MM-DD",
-                    "account_balance": float,
-                    "notes": string
-                }}
-            }}
-        ],
-        "financial_summary": {{
-            "expected_balance": float,
-            "upcoming_bills": [
-                {{
-                    "name": string,
-                    "amount": float,
-                    "due_date": "YYYY-MM-DD"
-                }}
-            ],
-            "upcoming_income": [
-                {{
-                    "source": string,
-                    "amount": float,
-                    "date": "YYYY-MM-DD"
-                }}
-            ],
-            "savings_progress": {{
-                "current": float,
-                "goal": float,
-                "percentage": float
-            }}
-        }}
-    }}
+    {DAILY_PLAN_SCHEMA}
 
     Budget Information:
     {json.dumps(budget_info, indent=2)}
@@ -289,226 +471,218 @@ def generate_daily_plan(date, budget_info, activity_goals):
     Activity Goals:
     {json.dumps(activity_goals, indent=2)}
 
-    Include events for:
-    1. Financial tasks and reminders:
-       - Bill payments due
-       - Income expected
-       - Budget review and planning
-       - Savings goal tracking
-       - Account balance monitoring
-    2. Activities and goals for the day:
-       - Workout sessions
-       - Learning activities
-       - Hobbies and free time activities
-       - Family time
-    3. Meal planning and preparation
-    4. Personal development activities
-
-    Important:
-    - Use 24-hour format for time (e.g., "14:30")
-    - Keep descriptions clear and concise
-    - Ensure all events have valid times between 06:00 and 22:00
-    - Space events appropriately throughout the day
-    - Include specific details in descriptions
-    - Prioritize financial tasks based on due dates
-    - Consider energy levels and time constraints
+    {DAILY_PLAN_INSTRUCTIONS}
     """
     
     try:
-        response = openai.chat.completions.create(
+        response_text = cached_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are a daily planner. Return only valid JSON with properly formatted event descriptions. Ensure all events have valid times and durations."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=1000,
-            temperature=0.7
-        )
-        response_text = response.choices[0].message.content.strip()
+            max_tokens=DAILY_PLAN_TOKENS,
+            temperature=0.7,
+            refresh=refresh
+        ).strip()
         response_text = re.sub(r'```json\s*|\s*```', '', response_text)
         
         # Parse and validate the response
         parsed_data = json.loads(response_text)
-        
-        if 'events' not in parsed_data or not parsed_data['events']:
-            # Create a default event if none were generated
-            parsed_data = {
-                "events": [{
-                    "title": "Daily Planning",
-                    "time": "09:00",
-                    "duration": "1h",
-                    "description": "Review your daily goals and schedule",
-                    "category": "other",
-                    "priority": "medium"
-                }],
-                "financial_summary": {
-                    "expected_balance": budget_info.get('starting_balance', 0),
-                    "upcoming_bills": [],
-                    "upcoming_income": [],
-                    "savings_progress": {
-                        "current": 0,
-                        "goal": budget_info.get('savings_goal', 0),
-                        "percentage": 0
-                    }
-                }
-            }
-        
-        # Validate and fix each event
-        for event in parsed_data['events']:
-            # Ensure required fields exist
-            if 'title' not in event:
-                event['title'] = 'Untitled Event'
-            if 'time' not in event:
-                event['time'] = '09:00'
-            if 'duration' not in event:
-                event['duration'] = '1h'
-            if 'description' not in event:
-                event['description'] = ''
-            if 'category' not in event or event['category'] not in EVENT_CATEGORIES:
-                event['category'] = 'other'
-            if 'priority' not in event or event['priority'] not in ['high', 'medium', 'low']:
-                event['priority'] = 'medium'
-                
-            # Validate time format
-            try:
-                hour, minute = map(int, event['time'].split(':'))
-                if hour < 0 or hour > 23 or minute < 0 or minute > 59:
-                    event['time'] = '09:00'
-            except:
-                event['time'] = '09:00'
-                
-            # Validate duration format
-            if not isinstance(event['duration'], str) or not (event['duration'].endswith('h') or event['duration'].endswith('m')):
-                event['duration'] = '1h'
-                
-            # Add financial details if applicable
-            if event['category'] == 'financial' and 'financial_details' not in event:
-                event['financial_details'] = {
-                    'type': 'budget_review',
-                    'amount': 0,
-                    'due_date': date.strftime('%Y-%m-%d'),
-                    'account_balance': budget_info.get('starting_balance', 0),
-                    'notes': 'Daily financial review'
-                }
-        
-        # Ensure financial summary exists
-        if 'financial_summary' not in parsed_data:
-            parsed_data['financial_summary'] = {
-                'expected_balance': budget_info.get('starting_balance', 0),
-                'upcoming_bills': [],
-                'upcoming_income': [],
-                'savings_progress': {
-                    'current': 0,
-                    'goal': budget_info.get('savings_goal', 0),
-                    'percentage': 0
-                }
-            }
-        
-        return parsed_data
+        return validate_daily_plan(parsed_data, date, budget_info)
     except Exception as e:
         print(f"Error generating daily plan: {str(e)}")
         # Return a minimal valid plan
-        return {
-            "events": [{
-                "title": "Daily Planning",
-                "time": "09:00",
-                "duration": "1h",
-                "description": "Review your daily goals and schedule",
-                "category": "other",
-                "priority": "medium"
-            }],
-            "financial_summary": {
-                "expected_balance": budget_info.get('starting_balance', 0),
-                "upcoming_bills": [],
-                "upcoming_income": [],
-                "savings_progress": {
-                    "current": 0,
-                    "goal": budget_info.get('savings_goal', 0),
-                    "percentage": 0
-                }
-            }
-        }
+        return dict(validate_daily_plan(default_daily_plan(budget_info), date, budget_info), error=str(e))
+
+def generate_daily_plans_batch(dates, budget_info, activity_goals, refresh=False):
+    """Generate daily plans for several days, as many per request as fit BATCH_MAX_TOKENS.
+
+    Returns a dict mapping each date ('YYYY-MM-DD') to the structure
+    generate_daily_plan returns. Each day is validated on its own; days
+    missing from a response are requested again (see generate_in_batches).
+    """
+    return generate_in_batches(dates, DAILY_PLAN_BATCH_DAY_TOKENS,
+                               lambda batch: request_daily_plans_batch(batch, budget_info, activity_goals, refresh),
+                               lambda date: generate_daily_plan(date, budget_info, activity_goals, refresh))
 
-def create_event(date, time_str, summary, description, duration_str, category="other", priority="medium", financial_details=None):
-    event = Event()
+def request_daily_plans_batch(dates, budget_info, activity_goals, refresh=False):
+    """Send one batched daily plan request for `dates` and return the days it covered."""
+    date_strs = [date.strftime('%Y-%m-%d') for date in dates]
+    prompt = f"""
+    Generate a detailed daily plan for each of these dates: {', '.join(date_strs)}, based on the following information.
+    Format the response as a JSON object with one entry per date:
+    {{
+        "days": {{
+            "YYYY-MM-DD": {DAILY_PLAN_SCHEMA}
+        }}
+    }}
+
+    Budget Information:
+    {json.dumps(budget_info, indent=2)}
+
+    Activity Goals:
+    {json.dumps(activity_goals, indent=2)}
+
+    {DAILY_PLAN_INSTRUCTIONS}
+    - Include every listed date exactly once and keep descriptions concise
+    """
     
+    plans = {}
     try:
-        # Parse duration with better error handling
-        duration_hours = 1  # default
-        if duration_str:
-            if duration_str.endswith('h'):
-                duration_hours = float(duration_str[:-1])
-            elif duration_str.endswith('m'):
-                duration_hours = float(duration_str[:-1]) / 60
-        
-        # Parse time with better error handling
-        try:
-            hour, minute = map(int, time_str.split(':'))
-        except (ValueError, AttributeError):
-            # Default to 9 AM if time parsing fails
-            hour, minute = 9, 0
-            
-        event_start = date.replace(hour=hour, minute=minute)
-        
-        event.add('summary', summary or 'Untitled Event')
-        event.add('dtstart', event_start)
-        event.add('dtend', event_start + timedelta(hours=duration_hours))
-        
-        # Enhanced description with financial details if applicable
-        full_description = description or ''
-        if financial_details:
-            financial_info = []
-            if financial_details.get('type') == 'bill_payment':
-                financial_info.append(f"Bill Payment: ${financial_details.get('amount', 0):.2f}")
-                financial_info.append(f"Due Date: {financial_details.get('due_date', '')}")
-            elif financial_details.get('type') == 'income':
-                financial_info.append(f"Income: ${financial_details.get('amount', 0):.2f}")
-                financial_info.append(f"Date: {financial_details.get('due_date', '')}")
-            elif financial_details.get('type') == 'savings':
-                financial_info.append(f"Savings Goal: ${financial_details.get('amount', 0):.2f}")
-                financial_info.append(f"Current Balance: ${financial_details.get('account_balance', 0):.2f}")
-            
-            if financial_details.get('notes'):
-                financial_info.append(f"Notes: {financial_details['notes']}")
-            
-            if financial_info:
-                full_description += "\n\nFinancial Details:\n" + "\n".join(financial_info)
-        
-        event.add('description', full_description)
+        response_text = cached_chat_completion(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are a daily planner. Return only valid JSON keyed by date with properly formatted event descriptions. Ensure all events have valid times and durations."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=min(DAILY_PLAN_BATCH_DAY_TOKENS * len(dates), BATCH_MAX_TOKENS),
+            temperature=0.7,
+            refresh=refresh
+        ).strip()
+        response_text = re.sub(r'```json\s*|\s*```', '', response_text)
+        days = parse_batch_days(response_text)
         
-        # Ensure category is valid
-        if category not in EVENT_CATEGORIES:
-            category = "other"
-        event.add('categories', category)
+        for date, date_str in zip(dates, date_strs):
+            if not isinstance(days.get(date_str), dict):
+                continue
+            try:
+                plans[date_str] = validate_daily_plan(days[date_str], date, budget_info)
+            except Exception as e:
+                print(f"Error validating daily plan for {date_str}: {str(e)}")
+                plans[date_str] = dict(validate_daily_plan(default_daily_plan(budget_info), date, budget_info), error=str(e))
+    except Exception as e:
+        print(f"Error generating batched daily plans: {str(e)}")
+    return plans
+
+def split_merged_day(parsed_data, date, budget_info):
+    """Split one day of a merged response into its (financial plan, activity plan), each validated once."""
+    events = [event for event in parsed_data.get('events') or [] if isinstance(event, dict)]
+    financial_plan = {'events': [event for event in events if event.get('category') == 'financial']}
+    if 'financial_summary' in parsed_data:
+        financial_plan['financial_summary'] = parsed_data['financial_summary']
+    activity_plan = {
+        'events': [event for event in events if event.get('category') != 'financial'],
+        'work_schedule': parsed_data.get('work_schedule')
+    }
+    return validate_daily_plan(financial_plan, date, budget_info), process_events(activity_plan)
+
+def default_merged_day(date, budget_info, error):
+    """Return the minimal (financial plan, activity plan) used when a merged request fails."""
+    return (dict(validate_daily_plan(default_daily_plan(budget_info), date, budget_info), error=error),
+            dict(process_events(default_events()), error=error))
+
+def generate_merged_day(date, budget_info, activity_goals, refresh=False):
+    """Generate a day's financial and activity events with one request.
+
+    Returns the (financial plan, activity plan) that generate_daily_plan and
+    generate_events would, from a single response covering both.
+    """
+    prompt = f"""
+    Generate a detailed daily plan for {date.strftime('%Y-%m-%d')} based on the following budget information and activity goals.
+    For each activity, create a separate event with its own time slot.
+    Format the response as a JSON object with the following structure:
+    {MERGED_DAY_SCHEMA}
+
+    Budget Information:
+    {json.dumps(budget_info, indent=2)}
+
+    Activity Goals:
+    {json.dumps(activity_goals, indent=2)}
+
+    {DAILY_PLAN_INSTRUCTIONS}
+    {MERGED_INSTRUCTIONS}
+
+    {EVENT_INSTRUCTIONS}
+    """
+    
+    try:
+        response_text = cached_chat_completion(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are a combined financial and activity planner. Create separate events for each activity and financial task, properly spaced throughout the day. Return only valid JSON with properly formatted event descriptions."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=MERGED_DAY_TOKENS,
+            temperature=0.7,
+            refresh=refresh
+        ).strip()
+        response_text = re.sub(r'```json\s*|\s*```', '', response_text)
+        return split_merged_day(json.loads(response_text), date, budget_info)
+    except Exception as e:
+        print(f"Error generating merged daily plan: {str(e)}")
+        return default_merged_day(date, budget_info, str(e))
+
+def generate_merged_days_batch(dates, budget_info, activity_goals, refresh=False):
+    """Generate the financial and activity events of several days, as many per request as fit BATCH_MAX_TOKENS.
+
+    Returns a dict mapping each date ('YYYY-MM-DD') to the (financial plan,
+    activity plan) generate_merged_day returns. Days missing from a
+    response are requested again (see generate_in_batches).
+    """
+    return generate_in_batches(dates, MERGED_BATCH_DAY_TOKENS,
+                               lambda batch: request_merged_days_batch(batch, budget_info, activity_goals, refresh),
+                               lambda date: generate_merged_day(date, budget_info, activity_goals, refresh))
+
+def request_merged_days_batch(dates, budget_info, activity_goals, refresh=False):
+    """Send one batched merged request for `dates` and return the days it covered."""
+    date_strs = [date.strftime('%Y-%m-%d') for date in dates]
+    prompt = f"""
+    Generate a detailed daily plan for each of these dates: {', '.join(date_strs)}, based on the following budget information and activity goals.
+    For each activity, create a separate event with its own time slot.
+    Format the response as a JSON object with one entry per date:
+    {{
+        "days": {{
+            "YYYY-MM-DD": {MERGED_DAY_SCHEMA}
+        }}
+    }}
+
+    Budget Information:
+    {json.dumps(budget_info, indent=2)}
+
+    Activity Goals:
+    {json.dumps(activity_goals, indent=2)}
+
+    {DAILY_PLAN_INSTRUCTIONS}
+    {MERGED_INSTRUCTIONS}
+    - Include every listed date exactly once and keep descriptions concise
+
+    {EVENT_INSTRUCTIONS}
+    """
+    
+    plans = {}
+    try:
+        response_text = cached_chat_completion(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are a combined financial and activity planner. Create separate events for each activity and financial task, properly spaced throughout each day. Return only valid JSON keyed by date with properly formatted event descriptions."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=min(MERGED_BATCH_DAY_TOKENS * len(dates), BATCH_MAX_TOKENS),
+            temperature=0.7,
+            refresh=refresh
+        ).strip()
+        response_text = re.sub(r'```json\s*|\s*```', '', response_text)
+        days = parse_batch_days(response_text)
         
-        # Add color if supported by the calendar
-        try:
-            event.add('color', EVENT_CATEGORIES.get(category, "#607D8B"))
-        except:
-            pass  # Skip if color is not supported
-            
-        # Add priority if supported
-        try:
-            if priority in ['high', 'medium', 'low']:
-                event.add('priority', {'high': 1, 'medium': 5, 'low': 9}[priority])
-        except:
-            pass  # Skip if priority is not supported
-            
-        # Add financial details as custom properties if supported
-        if financial_details:
+        for date, date_str in zip(dates, date_strs):
+            if not isinstance(days.get(date_str), dict):
+                continue
             try:
-                event.add('X-FINANCIAL-TYPE', financial_details.get('type', ''))
-                event.add('X-FINANCIAL-AMOUNT', str(financial_details.get('amount', 0)))
-                event.add('X-FINANCIAL-DUE-DATE', financial_details.get('due_date', ''))
-                event.add('X-FINANCIAL-BALANCE', str(financial_details.get('account_balance', 0)))
-            except:
-                pass  # Skip if custom properties are not supported
-            
-        cal.add_component(event)
-        return True
+                plans[date_str] = split_merged_day(days[date_str], date, budget_info)
+            except Exception as e:
+                print(f"Error validating merged plan for {date_str}: {str(e)}")
+                plans[date_str] = default_merged_day(date, budget_info, str(e))
     except Exception as e:
-        print(f"Error creating event: {str(e)}")
-        return False
+        print(f"Error generating batched merged plans: {str(e)}")
+    return plans
+
+def new_calendar():
+    """Return an empty calendar for one plan."""
+    cal = Calendar()
+    cal.add('prodid', '-//Enhanced Life & Budget Planner//mxm.dk//')
+    cal.add('version', '2.0')
+    return cal
 
 @app.route('/')
 def home():
@@ -516,27 +690,12 @@ def home():
 
 @app.route('/planner')
 def planner():
-    return render_template('planner.html')
+    return render_template('planner.html', plan_ttl_hours=PLAN_TTL // 3600)
 
 @app.route('/brain-dump')
 def brain_dump():
     return render_template('brain_dump.html')
 
-@app.route('/static/calendar.ics')
-def download_calendar():
-    try:
-        return send_file(
-            'static/calendar.ics',
-            mimetype='text/calendar',
-            as_attachment=True,
-            download_name='calendar.ics'
-        )
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 404
-
 @app.route('/api/parse_budget', methods=['POST'])
 def parse_budget():
     try:
@@ -593,6 +752,26 @@ def parse_activities():
             'error': str(e)
         })
 
+@app.route('/api/llm_cache/stats')
+def llm_cache_stats():
+    try:
+        return jsonify({
+            'success': True,
+            'stats': get_cache_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/llm_client/stats')
+def llm_client_stats():
+    return jsonify({
+        'success': True,
+        'stats': get_client_stats()
+    })
+
 @app.route('/api/generate_plan', methods=['POST'])
 def create_plan():
     try:
@@ -601,16 +780,294 @@ def create_plan():
         end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
         budget_info = data['budget_info']
         activity_goals = data['activity_goals']
+        concurrency = data.get('concurrency')
+        batch_days = data.get('batch_days')
+        mode = data.get('mode')
+        financial_source = data.get('financial_source')
+        error = plan_options_error(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
 
-        success = generate_plan(start_date, end_date, budget_info, activity_goals)
+        plan_id = new_plan_id()
+        calendar_url = generate_plan(start_date, end_date, budget_info, activity_goals,
+                                     concurrency=concurrency, batch_days=batch_days, mode=mode, plan_id=plan_id,
+                                     financial_source=financial_source)
         
-        if success:
-            return jsonify({'success': True})
+        if calendar_url:
+            return jsonify({'success': True, 'calendar_url': calendar_url, 'feed_url': plan_feed_url(plan_id)})
         else:
             return jsonify({'success': False, 'error': 'Failed to generate plan'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/generate_plan/stream', methods=['POST'])
+def stream_plan():
+    """Generate a plan and send the calendar as it is written, day by day.
+
+    The response is a chunked text/calendar body that starts before
+    generation finishes. The calendar is also saved; its URL is returned in
+    the X-Calendar-Url header. Plans are generated on a shared executor of
+    STREAM_WORKERS threads; when all are busy the request gets a 503.
+
+    The status code is sent before generation ends, so a failure can't
+    change it: the body then stops without its closing END:VCALENDAR line,
+    which clients should treat as a failed, incomplete calendar.
+    """
+    try:
+        data = request.json
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
+        end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+        budget_info = data['budget_info']
+        activity_goals = data['activity_goals']
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    error = plan_options_error(data)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+
+    if not _stream_slots.acquire(blocking=False):
+        return jsonify({'success': False, 'error': 'Too many plans are being streamed, try again shortly'}), 503
+
+    plan_id = new_plan_id()
+    chunks = queue.Queue()
+
+    def send(chunk):
+        # The footer is held back until the plan is known to be complete
+        if chunk != CALENDAR_FOOTER:
+            chunks.put(chunk)
+
+    def run():
+        try:
+            calendar_url = generate_plan(start_date, end_date, budget_info, activity_goals,
+                                         concurrency=data.get('concurrency'), batch_days=data.get('batch_days'),
+                                         mode=data.get('mode'), plan_id=plan_id, stream=send,
+                                         financial_source=data.get('financial_source'))
+            if calendar_url:
+                chunks.put(CALENDAR_FOOTER)
+            else:
+                print(f"Error: Streamed plan {plan_id} failed; ending the stream without END:VCALENDAR")
+        finally:
+            chunks.put(None)
+            _stream_slots.release()
+
+    try:
+        _stream_executor.submit(run)
+    except RuntimeError:
+        _stream_slots.release()
+        raise
+
+    def stream():
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/calendar',
+        headers={
+            'Content-Disposition': 'attachment; filename=life_plan.ics',
+            'X-Calendar-Url': plan_url(plan_id),
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@app.route('/static/plans/<plan_id>.ics')
+def download_plan(plan_id):
+    """Serve a generated calendar, precompressed when the client accepts it.
+
+    send_file answers If-None-Match / If-Modified-Since with 304 and Range
+    requests with 206, and hands the file to the server's sendfile support,
+    so re-syncing clients and resumed downloads don't transfer the calendar again.
+    """
+    path = plan_path(plan_id)
+    if path is None or not path.exists():
+        return jsonify({
+            'success': False,
+            'error': 'Plan not found'
+        }), 404
+    return send_plan_file(plan_id)
+
+def send_plan_file(plan_id, etag=True):
+    """Send a plan's calendar file in the best encoding the client accepts.
+
+    `etag` is passed to send_file; given as a string, the encoding is
+    appended so each variant has its own strong ETag.
+    """
+    encoding = None
+    path = plan_path(plan_id)
+    for variant_encoding, variant_path in plan_variants(plan_id):
+        if request.accept_encodings[variant_encoding]:
+            encoding, path = variant_encoding, variant_path
+            break
+    if isinstance(etag, str):
+        etag = f"{etag}-{encoding or 'identity'}"
+
+    # send_file resolves relative paths against app.root_path, not the working directory.
+    response = send_file(os.path.abspath(path), mimetype='text/calendar', conditional=True, etag=etag, max_age=0)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/plans/<plan_id>/feed.ics')
+def plan_feed(plan_id):
+    """Subscribable calendar feed of a plan (webcal://host/api/plans/<plan_id>/feed.ics).
+
+    Every response carries the plan's current X-Sync-Token. A client that
+    sends its last token as ?sync_token= gets only the events changed since,
+    with removed events as STATUS:CANCELLED; other clients get the full
+    calendar. The ETag is derived from the sync token, so polling an
+    unchanged plan is answered with 304 after a single indexed lookup.
+    Each request restarts the plan's PLAN_TTL, so subscribed plans are kept
+    while they are polled.
+    """
+    path = plan_path(plan_id)
+    token = sync_token(plan_id) if path and path.exists() else None
+    if token is None:
+        return jsonify({
+            'success': False,
+            'error': 'Plan not found'
+        }), 404
+    touch_plan(plan_id)
+
+    since = request.args.get('sync_token')
+    changes = changes_since(plan_id, since) if since else None
+    if changes is None:
+        # No token, or one this plan didn't issue: send the stored full calendar
+        response = send_plan_file(plan_id, etag=f"sync-{token}")
+        response.headers['X-Sync-Token'] = token
+        return response
+
+    etag = f"sync-{token}-since-{since}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = [calendar_header(new_calendar())]
+        for uid, start, end, title, seq, ical in changes:
+            if ical is None:
+                body.append(cancelled_event_ical(uid, datetime.fromisoformat(start), datetime.fromisoformat(end),
+                                                 title, seq))
+            else:
+                # SEQUENCE tells clients this version supersedes the one they have
+                body.append(ical[:-len(b"END:VEVENT\r\n")] + f"SEQUENCE:{seq}\r\n".encode('utf-8') + b"END:VEVENT\r\n")
+        body.append(CALENDAR_FOOTER)
+        response = Response(b"".join(body), mimetype='text/calendar')
+    response.set_etag(etag)
+    response.headers['X-Sync-Token'] = token
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def plan_options_error(data):
+    """Return why a plan request's 'concurrency' or 'batch_days' is invalid, or None if both are valid or unset."""
+    for name in ('concurrency', 'batch_days'):
+        value = data.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+            return f"'{name}' must be a positive integer"
+    return None
+
+def date_range_args():
+    """Return the (from, to) dates of a request's query string, or None if they are missing, invalid
+    or more than MAX_DATE_RANGE apart."""
+    try:
+        start_date = datetime.strptime(request.args['from'], '%Y-%m-%d')
+        end_date = datetime.strptime(request.args['to'], '%Y-%m-%d')
+    except (KeyError, ValueError):
+        return None
+    return (start_date, end_date) if start_date <= end_date <= start_date + MAX_DATE_RANGE else None
+
+@app.route('/api/events')
+def list_events():
+    """Return the events of a plan between two dates (inclusive), optionally of one category."""
+    plan_id = request.args.get('plan', '')
+    category = request.args.get('category') or None
+    date_range = date_range_args()
+    if date_range is None or (category and category not in EVENT_CATEGORIES):
+        return jsonify({
+            'success': False,
+            'error': f"'from' and 'to' must be dates in YYYY-MM-DD format at most {MAX_DATE_RANGE.days} days "
+                     f"apart, with a known category if given"
+        }), 400
+
+    start_date, end_date = date_range
+    events = query_events(plan_id, start_date, end_date + timedelta(days=1), category) if plan_path(plan_id) else None
+    if events is None:
+        return jsonify({
+            'success': False,
+            'error': 'Plan not found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'plan': plan_id,
+        'from': start_date.strftime('%Y-%m-%d'),
+        'to': end_date.strftime('%Y-%m-%d'),
+        'events': events
+    })
+
+@app.route('/api/plans/<plan_id>/occupancy')
+def plan_occupancy(plan_id):
+    """Return conflicts, each day's first free slot and busy time, and busy hours per category per week.
+
+    Takes 'from' and 'to' dates like /api/events, and 'length', the minutes
+    of free time to look for within the day's TIME_SLOTS (default 30).
+    """
+    date_range = date_range_args()
+    length = request.args.get('length', '30')
+    if date_range is None or not length.isdigit() or not 0 < int(length) <= 24 * 60:
+        return jsonify({
+            'success': False,
+            'error': f"'from' and 'to' must be dates in YYYY-MM-DD format at most {MAX_DATE_RANGE.days} days "
+                     f"apart and 'length' a number of minutes"
+        }), 400
+
+    start_date, end_date = date_range
+    days = (end_date - start_date).days + 1
+    events = query_events(plan_id, start_date, end_date + timedelta(days=1)) if plan_path(plan_id) else None
+    if events is None:
+        return jsonify({
+            'success': False,
+            'error': 'Plan not found'
+        }), 404
+
+    grid = Occupancy.from_events(start_date, days, events)
+    earliest = min(start for start, _ in SLOT_MINUTES.values())
+    latest = max(end for _, end in SLOT_MINUTES.values())
+    free = grid.first_free(int(length), earliest, latest)
+    busy = grid.busy_minutes()
+    return jsonify({
+        'success': True,
+        'plan': plan_id,
+        'conflicts': [
+            {'start': start.isoformat(), 'end': end.isoformat(), 'events': count}
+            for start, end, count in grid.conflicts()
+        ],
+        'days': [
+            {
+                'date': (start_date + timedelta(days=day)).strftime('%Y-%m-%d'),
+                'first_free': free[day].strftime('%H:%M') if free[day] else None,
+                'busy_minutes': int(busy[day])
+            }
+            for day in range(days)
+        ],
+        'busy_hours_by_week': grid.busy_hours_by_week()
+    })
+
+@app.route('/api/plans/<plan_id>/replan', methods=['POST'])
+def replan_plan(plan_id):
+    """Regenerate a date sub-range, or one category within it, of a generated plan."""
+    try:
+        data = request.get_json()
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
+        end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+        result = replan(plan_id, start_date, end_date, data.get('category'))
+        if result:
+            return jsonify(dict(result, success=True))
+        return jsonify({'success': False, 'error': 'Failed to replan'})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/brain_dump', methods=['POST'])
 def process_brain_dump():
     data = request.get_json()
@@ -623,81 +1080,650 @@ def process_brain_dump():
     
     if cal:
         # Save calendar file
-        with open('static/calendar.ics', 'wb') as f:
-            f.write(cal.to_ical())
-        return jsonify({"status": "success"})
+        plan_id = new_plan_id()
+        with open_plan(plan_id) as f:
+            write_calendar(cal, f.write)
+        return jsonify({"status": "success", "calendar_url": plan_url(plan_id), "feed_url": plan_feed_url(plan_id)})
     else:
         return jsonify({"status": "error", "message": "Failed to generate calendar"})
 
-def generate_plan(start_date, end_date, budget_info, activity_goals):
-    """Generate a complete plan for the specified date range."""
+@app.route('/api/jobs/generate_plan', methods=['POST'])
+def create_plan_job():
+    try:
+        data = request.json
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
+        end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+        options = {
+            'concurrency': data.get('concurrency'),
+            'batch_days': data.get('batch_days'),
+            'mode': data.get('mode'),
+            'financial_source': data.get('financial_source')
+        }
+        error = plan_options_error(options)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+
+        job = submit_job('generate_plan', (end_date - start_date).days + 1, run_plan_job,
+                         start_date, end_date, data['budget_info'], data['activity_goals'], options)
+        return jsonify({
+            'success': True,
+            'job_id': job['id'],
+            'status_url': f"/api/jobs/{job['id']}"
+        }), 202
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/jobs/brain_dump', methods=['POST'])
+def create_brain_dump_job():
+    try:
+        data = request.get_json()
+        start_date = datetime.strptime(data.get('start_date'), '%Y-%m-%d')
+        end_date = datetime.strptime(data.get('end_date'), '%Y-%m-%d')
+
+        job = submit_job('brain_dump', (end_date - start_date).days + 1, run_brain_dump_job,
+                         data.get('input', ''), start_date, end_date)
+        return jsonify({
+            'success': True,
+            'job_id': job['id'],
+            'status_url': f"/api/jobs/{job['id']}"
+        }), 202
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'job': job
+    })
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream a job's per-day progress as Server-Sent Events.
+
+    Idle streams get ': keepalive' comments, and a stream open longer than
+    JOB_STREAM_MAX_SECONDS ends with a 'poll' event, after which the client
+    polls /api/jobs/<job_id> so it doesn't hold a server thread.
+    """
+    if not get_job(job_id):
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+
+    def stream():
+        for name, data in iter_job_events(job_id):
+            if name == 'keepalive':
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def budget_review_event(date):
+    """Return the weekly budget review event for `date`."""
+    details = {'type': 'budget_review', 'amount': 0, 'due_date': date.strftime('%Y-%m-%d'),
+               'notes': 'Weekly budget review'}
+    return PlanEvent(parse_minutes(BUDGET_REVIEW_TIME), 30, "Budget Review",
+                     "Compare this week's spending with the plan and check upcoming bills",
+                     'financial', PRIORITY_VALUES['medium'], details)
+
+def local_financial_plan(date, cashflow, review=True):
+    """Build a day's financial plan from the projected cash flow, without the LLM.
+
+    Each payday and bill due that day becomes an event, and with `review`
+    the weekly budget review falls on BUDGET_REVIEW_WEEKDAY. The figures are
+    filled in by apply_cashflow() when the day is added to the calendar.
+    """
+    events = []
+    start = parse_minutes(TRANSACTION_TIME)
+    for transaction in cashflow.transactions_on(date):
+        if transaction['kind'] == 'income':
+            title, details_type = f"Payday: {transaction['name']}", 'income'
+            description = f"{transaction['name']} pays ${transaction['amount']:.2f}"
+        else:
+            title, details_type = f"{transaction['name']} due", 'bill_payment'
+            description = f"Pay {transaction['name']}: ${transaction['amount']:.2f}"
+        details = {'type': details_type, 'amount': transaction['amount'], 'due_date': transaction['date'], 'notes': ''}
+        priority = PRIORITY_VALUES['high'] if details_type == 'bill_payment' else PRIORITY_VALUES['medium']
+        events.append(PlanEvent(start, 15, title, description, 'financial', priority, details))
+        start += 15
+    if review and date.weekday() == BUDGET_REVIEW_WEEKDAY:
+        events.append(budget_review_event(date))
+    return {'events': events, 'financial_summary': cashflow.summary(date)}
+
+def generate_day(date, budget_info, activity_goals, financial_source='llm', cashflow=None, refresh=False):
+    """Run the LLM calls for a single day and return its financial and activity plans.
+
+    `financial_source` is one of FINANCIAL_SOURCES; 'local' builds the
+    financial plan from `cashflow`. With `refresh` the LLM cache is bypassed
+    and overwritten.
+    """
+    print(f"Generating plans for {date.strftime('%Y-%m-%d')}...")
+    if financial_source == 'merged':
+        return generate_merged_day(date, budget_info, activity_goals, refresh)
+    if financial_source == 'local':
+        financial_plan = local_financial_plan(date, cashflow)
+    else:
+        financial_plan = generate_daily_plan(date, budget_info, activity_goals, refresh)
+    activity_plan = generate_events(date, activity_goals, refresh)
+    return financial_plan, activity_plan
+
+def generate_window(dates, budget_info, activity_goals, financial_source='llm', cashflow=None, refresh=False):
+    """Generate the plans for a window of consecutive days, in date order.
+
+    A single day uses the per-day requests; longer windows send one batched
+    request for both plans, or one each with the 'llm' `financial_source`.
+    With 'local', the financial plans are built from `cashflow` instead.
+    """
+    if len(dates) == 1:
+        return [generate_day(dates[0], budget_info, activity_goals, financial_source, cashflow, refresh)]
+    
+    date_strs = [date.strftime('%Y-%m-%d') for date in dates]
+    if financial_source == 'merged':
+        plans = generate_merged_days_batch(dates, budget_info, activity_goals, refresh)
+        return [plans[date_str] for date_str in date_strs]
+    if financial_source == 'local':
+        financial_plans = {date_str: local_financial_plan(date, cashflow) for date, date_str in zip(dates, date_strs)}
+    else:
+        financial_plans = generate_daily_plans_batch(dates, budget_info, activity_goals, refresh)
+    activity_plans = generate_events_batch(dates, activity_goals, refresh)
+    return [(financial_plans[date_str], activity_plans[date_str]) for date_str in date_strs]
+
+def timed(func, *args):
+    """Call func and return its result with the seconds it took."""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def apply_cashflow(financial_plan, date, cashflow, recurring=False):
+    """Fill a day's financial figures from the projected cash flow instead of the model's guesses.
+
+    The financial summary and the account balance of each financial event
+    come from the projection for `date`, and a bill payment or income event
+    naming one of that day's transactions gets its amount and date. Events
+    of a recurring template get no balance, as it differs per occurrence.
+    """
+    if not financial_plan or cashflow is None:
+        return
+    financial_plan['financial_summary'] = cashflow.summary(date)
+    balance = financial_plan['financial_summary']['expected_balance']
+    transactions = cashflow.transactions_on(date)
+    for event in financial_plan.get('events', []):
+        if event.category != 'financial' or not isinstance(event.details, dict):
+            continue
+        kind = {'bill_payment': 'bill', 'income': 'income'}.get(event.details.get('type'))
+        match = next((transaction for transaction in transactions
+                      if transaction['kind'] == kind and transaction['name'].lower() in event.title.lower()), None)
+        if match:
+            event.details['amount'] = match['amount']
+            event.details['due_date'] = match['date']
+        if recurring:
+            event.details.pop('account_balance', None)
+        else:
+            event.details['account_balance'] = balance
+
+def pack_financial_events(financial_plan, activity_plan):
+    """Move the day's financial events out of the time its activities take, as process_events() packs activities.
+
+    The activities, already placed around the work schedule, stay where
+    they are; each financial event keeps its time if that is free and is
+    otherwise moved to the nearest free time.
+    """
+    financial = [event for event in (financial_plan or {}).get('events', []) if event.category == 'financial']
+    activities = [event for event in (activity_plan or {}).get('events', []) if event.category != 'financial']
+    if not financial:
+        return
+    with stage('overlap'):
+        starts = pack_day([(event.start, event.duration, event.priority, None) for event in financial],
+                          [(event.start, event.end) for event in activities])
+    for event, start in zip(financial, starts):
+        event.start = start
+
+def event_slot(event, slots, recurring=False):
+    """Return the slot of `event` in its day: its category and normalized title, numbered among repeats.
+
+    `slots` counts the slots already taken that day. The slot does not
+    depend on the event's position in the model output, so events of one
+    category keep their UIDs when another category of the day is replanned.
+    """
+    title = re.sub(r'[^a-z0-9]+', '-', event.title.lower()).strip('-')
+    base = f"{event.category}-{title}{'-weekly' if recurring else ''}"
+    count = slots.get(base, 0)
+    slots[base] = count + 1
+    return f"{base}-{count}"
+
+def add_day_to_calendar(cal, date, financial_plan, activity_plan, rrule=None, exdates=None, profile='',
+                        cashflow=None):
+    """Add the events of one generated day to `cal` and return them.
+
+    With `rrule` the events repeat from `date` instead of occurring once,
+    skipping the days listed in `exdates`. Each event gets a UID derived
+    from `profile`, the date and its event_slot(). With `cashflow`, the
+    financial figures are filled in by apply_cashflow(). Financial events
+    are moved out of the activities' time by pack_financial_events().
+    """
+    apply_cashflow(financial_plan, date, cashflow, recurring=bool(rrule))
+    pack_financial_events(financial_plan, activity_plan)
+    added = []
+    slots = {}
+    for plan, financial in ((financial_plan, True), (activity_plan, False)):
+        count = 0
+        for event in (plan or {}).get('events', []):
+            # Financial events come from the financial plan, everything else from the activity plan
+            if (event.category == 'financial') != financial:
+                continue
+            try:
+                slot = event_slot(event, slots, recurring=bool(rrule))
+                event.date = date
+                event.uid = event_uid(profile, date, slot)
+                event.rrule = rrule
+                event.exdates = exdates
+                cal.add_component(event)
+            except Exception as e:
+                print(f"Error creating event: {str(e)}")
+                continue
+            added.append(event)
+            count += 1
+        print(f"Created {count} {'financial' if financial else 'activity'} events")
+    return added
+
+def day_info(date, added, plans, seconds, days=1):
+    """Summarize one generated day (or recurring template) for progress reporting."""
+    return {
+        'date': date.strftime('%Y-%m-%d'),
+        'days': days,
+        'financial_events': sum(1 for event in added if event.category == 'financial'),
+        'activity_events': sum(1 for event in added if event.category != 'financial'),
+        'events': [
+            {'title': event.title, 'time': event.time_str, 'duration': event.duration_str, 'category': event.category}
+            for event in added
+        ],
+        'errors': [plan['error'] for plan in plans if plan and plan.get('error')],
+        'seconds': round(seconds, 3)
+    }
+
+def goal_weekdays(goal):
+    """Return the weekdays (0 = Monday) on which an activity goal applies."""
+    days = [WEEKDAYS.index(day.lower()) for day in goal.get('days') or [] if day.lower() in WEEKDAYS]
+    frequency = goal.get('frequency', 'daily')
+    if frequency in ('weekly', 'specific_days') and days:
+        return set(days)
+    if frequency == 'weekly':
+        return {0}  # Weekly goals without days land on Monday
+    return set(range(7))
+
+def weekday_goals(activity_goals, weekday):
+    """Return `activity_goals` with only the goals that apply on `weekday`."""
+    return dict(activity_goals, goals=[goal for goal in activity_goals.get('goals', [])
+                                       if weekday in goal_weekdays(goal)])
+
+def plan_weekday_templates(dates, cashflow, activity_goals):
+    """Group the range into weekday templates and days that must be planned alone.
+
+    Weekdays sharing the same set of applicable goals share one template.
+    Days with a bill due or income arriving in the `cashflow` projection
+    differ from their template and are returned as overrides. Returns (templates, override_dates); each
+    template holds its weekdays, first date, the date it is generated for,
+    its goals and the dates it must skip.
+    """
+    goals = activity_goals.get('goals', [])
+    goal_days = [goal_weekdays(goal) for goal in goals]
+    overrides = cashflow.event_dates()
+    
+    groups = {}
+    for weekday in range(7):
+        goal_set = frozenset(i for i, days in enumerate(goal_days) if weekday in days)
+        groups.setdefault(goal_set, []).append(weekday)
+    
+    templates = []
+    for goal_set, weekdays in groups.items():
+        group_dates = [date for date in dates if date.weekday() in weekdays]
+        plain_dates = [date for date in group_dates if date not in overrides]
+        if not plain_dates:
+            continue
+        templates.append({
+            'weekdays': weekdays,
+            'first_date': group_dates[0],
+            'date': plain_dates[0],
+            'days': len(plain_dates),
+            'goals': dict(activity_goals, goals=[goals[i] for i in sorted(goal_set)]),
+            'exdates': [date for date in group_dates if date in overrides]
+        })
+    return templates, sorted(overrides)
+
+def window_days(batch_days, financial_source):
+    """Return the days per window: `batch_days`, at most as many as one request of each plan type can cover."""
+    per_day_tokens = {'merged': [MERGED_BATCH_DAY_TOKENS], 'local': [EVENT_BATCH_DAY_TOKENS]}.get(
+        financial_source, [DAILY_PLAN_BATCH_DAY_TOKENS, EVENT_BATCH_DAY_TOKENS])
+    requested = int(batch_days or PLAN_BATCH_DAYS)
+    limit = min(max_batch_days(tokens) for tokens in per_day_tokens)
+    if requested > limit:
+        print(f"batch_days {requested} exceeds the {limit} days one {financial_source} request can cover, using {limit}")
+    return max(1, min(requested, limit))
+
+def plan_workers(concurrency, jobs):
+    """Return the number of threads for `jobs` windows or days: the requested concurrency, at most PLAN_CONCURRENCY_MAX."""
+    return max(1, min(int(concurrency or PLAN_CONCURRENCY), PLAN_CONCURRENCY_MAX, jobs))
+
+def generate_daily_range(cal, dates, budget_info, activity_goals, concurrency=None, batch_days=None, progress=None,
+                         profile='', cashflow=None, financial_source=None, refresh=False):
+    """Generate every day of the range, in windows of up to `batch_days` days (see window_days).
+
+    Financial figures come from `cashflow`, by default projected over the
+    range itself; with the 'local' `financial_source` so do the financial
+    events. With `refresh` every request skips the LLM cache. Returns the
+    number of days processed.
+    """
+    cashflow = cashflow or CashFlow(budget_info, dates[0], dates[-1])
+    financial_source = financial_source or FINANCIAL_SOURCE
+    window_size = window_days(batch_days, financial_source)
+    windows = [dates[i:i + window_size] for i in range(0, len(dates), window_size)]
+    max_workers = plan_workers(concurrency, len(windows))
+    print(f"Generating {len(windows)} windows of up to {window_size} days with concurrency {max_workers}")
+
+    day_count = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map() yields results in submission order, so the calendar is
+        # still assembled day by day while later windows are in flight
+        results = executor.map(lambda window: timed(generate_window, window, budget_info, activity_goals,
+                                                    financial_source, cashflow, refresh), windows)
+        for window, (window_plans, seconds) in zip(windows, results):
+            for current_date, (financial_plan, activity_plan) in zip(window, window_plans):
+                day_count += 1
+                print(f"\nProcessing day {day_count}/{len(dates)}: {current_date.strftime('%Y-%m-%d')}")
+                added = add_day_to_calendar(cal, current_date, financial_plan, activity_plan, profile=profile,
+                                            cashflow=cashflow)
+                if progress:
+                    progress(1, day_info(current_date, added, (financial_plan, activity_plan), seconds))
+    return day_count
+
+def generate_template_plan(cal, dates, budget_info, activity_goals, concurrency=None, progress=None, profile='',
+                           financial_source=None):
+    """Generate one weekly recurring plan per weekday template plus the override days.
+
+    Templates hold activities only, since bills and paydays don't repeat
+    weekly: the weekly budget review is its own recurring event, and every
+    financial event is generated for the override day it falls on. Each
+    override day is planned alone from the goals of its weekday and is an
+    EXDATE of its template and of the review. With the 'local'
+    `financial_source` an override day differs from its template only in
+    its financial events, so it reuses the template's activities instead of
+    taking an LLM request. Returns the number of days covered.
+    """
+    cashflow = CashFlow(budget_info, dates[0], dates[-1])
+    financial_source = financial_source or FINANCIAL_SOURCE
+    local = financial_source == 'local'
+    templates, override_dates = plan_weekday_templates(dates, cashflow, activity_goals)
+    until = dates[-1].replace(hour=23, minute=59, second=59)
+    
+    covered = {weekday for template in templates for weekday in template['weekdays']}
+    generated_overrides = [date for date in override_dates if not (local and date.weekday() in covered)]
+    print(f"Generating {len(templates)} weekday templates and {len(generated_overrides)} of "
+          f"{len(override_dates)} override days")
+    
+    def generate_template(template):
+        return timed(lambda: (None, generate_events(template['date'], template['goals'])))
+    
+    def generate_override(date):
+        goals = weekday_goals(activity_goals, date.weekday())
+        if local:
+            return timed(lambda: (local_financial_plan(date, cashflow), generate_events(date, goals)))
+        return timed(generate_day, date, budget_info, goals, financial_source, cashflow)
+    
+    max_workers = plan_workers(concurrency, len(templates) + len(generated_overrides))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        template_futures = [executor.submit(generate_template, template) for template in templates]
+        override_futures = {date: executor.submit(generate_override, date) for date in generated_overrides}
+        results = [future.result() for future in template_futures]
+        override_results = {date: future.result() for date, future in override_futures.items()}
+    # Activity plan of each weekday's template, copied for the override days that reuse it
+    template_activities = {weekday: activity_plan for template, ((_, activity_plan), _) in zip(templates, results)
+                           for weekday in template['weekdays']}
+    
+    review_date = next((date for date in dates if date.weekday() == BUDGET_REVIEW_WEEKDAY), None)
+    if review_date:
+        print(f"\nAdding weekly budget review starting {review_date.strftime('%Y-%m-%d')}")
+        add_day_to_calendar(cal, review_date, {'events': [budget_review_event(review_date)]}, None,
+                            rrule={'freq': 'weekly', 'byday': [BYDAY_CODES[BUDGET_REVIEW_WEEKDAY]], 'until': until},
+                            exdates=[date for date in override_dates if date.weekday() == BUDGET_REVIEW_WEEKDAY],
+                            profile=profile, cashflow=cashflow)
+    
+    for template, ((financial_plan, activity_plan), seconds) in zip(templates, results):
+        byday = [BYDAY_CODES[weekday] for weekday in template['weekdays']]
+        print(f"\nAdding template for {','.join(byday)} starting {template['first_date'].strftime('%Y-%m-%d')}")
+        added = add_day_to_calendar(
+            cal,
+            template['first_date'],
+            financial_plan,
+            activity_plan,
+            rrule={'freq': 'weekly', 'byday': byday, 'until': until},
+            exdates=template['exdates'],
+            profile=profile,
+            cashflow=cashflow
+        )
+        if progress:
+            info = day_info(template['first_date'], added, (financial_plan, activity_plan), seconds, template['days'])
+            progress(template['days'], dict(info, recurring=byday))
+    for date in override_dates:
+        if date in override_results:
+            (financial_plan, activity_plan), seconds = override_results[date]
+        else:
+            template_plan = template_activities[date.weekday()]
+            activity_plan = dict(template_plan, events=[event.copy() for event in template_plan['events']])
+            financial_plan, seconds = local_financial_plan(date, cashflow), 0.0
+        print(f"\nAdding override day {date.strftime('%Y-%m-%d')}")
+        added = add_day_to_calendar(cal, date, financial_plan, activity_plan, profile=profile, cashflow=cashflow)
+        if progress:
+            progress(1, day_info(date, added, (financial_plan, activity_plan), seconds))
+    
+    return len(dates)
+
+def generate_plan(start_date, end_date, budget_info, activity_goals, concurrency=None, batch_days=None, mode=None,
+                  progress=None, plan_id=None, stream=None, financial_source=None):
+    """Generate a complete plan for the specified date range.
+
+    In 'daily' mode the range is split into windows of `batch_days` days, each
+    generated with one request per plan type. Windows are generated
+    concurrently, at most `concurrency` at a time, and added to the calendar
+    in date order as their results become available.
+
+    In 'weekday_template' mode one plan is generated per group of weekdays
+    sharing the same goals and emitted as weekly recurring events; only days
+    with a bill due or income arriving are generated individually.
+
+    By default ('llm' `financial_source`) each day or window sends separate
+    LLM requests for its financial and activity events; 'merged' sends one
+    request returning both. With 'local' the financial events are built
+    from the budget's projected cash flow, so only the activity plans take
+    LLM requests.
+
+    `progress(days, info)` is called as days are added to the calendar, with
+    a summary of the added events, errors and timing. Events are written to
+    the calendar file of `plan_id` (a new id by default) as they are added,
+    and also passed to `stream(chunk)` when given. Returns the calendar URL,
+    or None on failure.
+    """
     try:
         print(f"\nStarting plan generation from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
         total_days = (end_date - start_date).days + 1
         print(f"Total days to process: {total_days}")
+        if total_days < 1:
+            print("Error: End date must be after start date")
+            return None
+
+        mode = mode or PLAN_MODE
+        if mode not in PLAN_MODES:
+            print(f"Error: Unknown plan mode '{mode}'")
+            return None
+        financial_source = financial_source or FINANCIAL_SOURCE
+        if financial_source not in FINANCIAL_SOURCES:
+            print(f"Error: Unknown financial source '{financial_source}'")
+            return None
+
+        plan_id = plan_id or new_plan_id()
+        profile = profile_hash(budget_info, activity_goals)
+        dates = [start_date + timedelta(days=offset) for offset in range(total_days)]
+        with open_plan(plan_id) as f:
+            def write(chunk):
+                f.write(chunk)
+                if stream:
+                    stream(chunk)
+
+            # Events are written out as each day is added rather than kept in memory
+            cal = ICSWriter(write, new_calendar())
+            if mode == 'weekday_template':
+                day_count = generate_template_plan(cal, dates, budget_info, activity_goals, concurrency, progress, profile,
+                                                   financial_source)
+            else:
+                day_count = generate_daily_range(cal, dates, budget_info, activity_goals, concurrency, batch_days, progress,
+                                                 profile, financial_source=financial_source)
+            cal.close()
         
-        current_date = start_date
-        day_count = 0
-        
-        while current_date <= end_date:
-            day_count += 1
-            print(f"\nProcessing day {day_count}/{total_days}: {current_date.strftime('%Y-%m-%d')}")
-            
-            # Generate financial events
-            print("Generating financial events...")
-            financial_plan = generate_daily_plan(current_date, budget_info, activity_goals)
-            if financial_plan and 'events' in financial_plan:
-                financial_count = 0
-                for event in financial_plan['events']:
-                    if event['category'] == 'financial':
-                        create_event(
-                            current_date,
-                            event['time'],
-                            event['title'],
-                            event['description'],
-                            event['duration'],
-                            event['category'],
-                            event['priority'],
-                            event.get('financial_details')
-                        )
-                        financial_count += 1
-                print(f"Created {financial_count} financial events")
-            
-            # Generate activity events
-            print("Generating activity events...")
-            activity_plan = generate_events(current_date, activity_goals)
-            if activity_plan and 'events' in activity_plan:
-                activity_count = 0
-                for event in activity_plan['events']:
-                    if event['category'] != 'financial':
-                        activity_event = create_activity_event(
-                            current_date,
-                            event['time'],
-                            event['title'],
-                            event['description'],
-                            event['duration'],
-                            event['category'],
-                            event['priority'],
-                            event.get('activity_details')
-                        )
-                        if activity_event:
-                            cal.add_component(activity_event)
-                            activity_count += 1
-                print(f"Created {activity_count} activity events")
-            
-            current_date += timedelta(days=1)
-        
-        # Save the calendar to a file
-        print("\nSaving calendar to file...")
-        with open('static/calendar.ics', 'wb') as f:
-            f.write(cal.to_ical())
+        # Keep the inputs so parts of the plan can be regenerated later
+        save_plan_inputs(plan_id, {
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'budget_info': budget_info,
+            'activity_goals': activity_goals,
+            'options': {'concurrency': concurrency, 'batch_days': batch_days, 'mode': mode,
+                        'financial_source': financial_source},
+            'profile': profile
+        })
         
         print(f"\nCalendar generation completed successfully!")
-        print(f"Total days processed: {day_count}")
-        return True
+        print(f"Total days processed: {day_count}, events written: {cal.count}")
+        return plan_url(plan_id)
     except Exception as e:
         print(f"\nError generating plan: {str(e)}")
-        return False
+        return None
+
+class EventCollector(list):
+    """Stand-in for a calendar that keeps the added events in memory."""
+    add_component = list.append
+
+def recurring_dates(properties, dates):
+    """Return the dates among `dates` on which a serialized recurring event occurs."""
+    rule = dict(part.split('=', 1) for part in properties['RRULE'].split(';') if '=' in part)
+    first = datetime.strptime(properties['DTSTART'][:8], '%Y%m%d')
+    until = datetime.strptime(rule['UNTIL'][:8], '%Y%m%d') if 'UNTIL' in rule else None
+    byday = {BYDAY_CODES.index(code[-2:]) for code in rule.get('BYDAY', '').split(',') if code[-2:] in BYDAY_CODES}
+    return [
+        date for date in dates
+        if date >= first and (until is None or date <= until)
+        and (rule.get('FREQ') == 'DAILY' or date.weekday() in (byday or {first.weekday()}))
+    ]
+
+def replan(plan_id, start_date, end_date, category=None):
+    """Regenerate the days `start_date`..`end_date` of a saved plan and merge them in by UID.
+
+    Only the affected days are sent to the LLM, bypassing the LLM cache so
+    the same prompts get new responses. With `category`, only events
+    of that category are replaced. Single events on those days are dropped
+    and replaced by the new ones, recurring events get EXDATEs for those
+    days, and every other event is copied through byte for byte. Returns a
+    summary of the changes, or None if the plan cannot be replanned.
+    """
+    inputs = load_plan_inputs(plan_id)
+    path = plan_path(plan_id)
+    if not inputs or not path.exists():
+        print(f"Error: No saved inputs for plan {plan_id}")
+        return None
+    if not (datetime.strptime(inputs['start_date'], '%Y-%m-%d') <= start_date <= end_date
+            <= datetime.strptime(inputs['end_date'], '%Y-%m-%d')):
+        print("Error: Replan range must lie within the plan")
+        return None
+    if category and category not in EVENT_CATEGORIES:
+        print(f"Error: Unknown category '{category}'")
+        return None
+
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    options = inputs.get('options', {})
+    new_events = EventCollector()
+    # Balances are projected from the start of the plan, not of the replanned days
+    cashflow = CashFlow(inputs['budget_info'], datetime.strptime(inputs['start_date'], '%Y-%m-%d'),
+                        datetime.strptime(inputs['end_date'], '%Y-%m-%d'))
+    generate_daily_range(new_events, dates, inputs['budget_info'], inputs['activity_goals'],
+                         options.get('concurrency'), options.get('batch_days'), profile=inputs['profile'],
+                         cashflow=cashflow, financial_source=options.get('financial_source'), refresh=True)
+    new_events = [event for event in new_events if not category or event.category == category]
+
+    with open(path, 'rb') as f:
+        header, components = split_calendar(f.read())
+    removed = 0
+    updated = 0
+    kept = []
+    for component in components:
+        properties = component_properties(component)
+        if 'DTSTART' not in properties or (category and properties.get('CATEGORIES') != category):
+            kept.append((component, properties))
+            continue
+        if 'RRULE' not in properties:
+            if start_date <= datetime.strptime(properties['DTSTART'][:8], '%Y%m%d') <= end_date:
+                removed += 1
+                continue
+        else:
+            skipped = recurring_dates(properties, dates)
+            if skipped:
+                # Exclude the replanned days from the series; the rest of the event is unchanged
+                clock = properties['DTSTART'][8:15] or 'T000000'
+                exdate = "EXDATE:" + ",".join(date.strftime('%Y%m%d') + clock for date in skipped)
+                end_line = b"END:VEVENT\r\n"
+                component = component[:-len(end_line)] + foldline(exdate).encode('utf-8') + b"\r\n" + end_line
+                updated += 1
+        kept.append((component, properties))
+
+    # A repeated UID would make calendars and the event index drop one of the events
+    uids = [properties['UID'] for component, properties in kept if 'UID' in properties]
+    uids += [event.uid for event in new_events]
+    if len(uids) != len(set(uids)):
+        print(f"Error: Replanning plan {plan_id} would repeat event UIDs; the plan is unchanged")
+        return None
+
+    with open_plan(plan_id) as f:
+        f.write(header)
+        for component, properties in kept:
+            f.write(component)
+        for event in new_events:
+            f.write(event.to_ical())
+        f.write(CALENDAR_FOOTER)
+
+    # Keep the inputs around as long as the calendar they belong to
+    save_plan_inputs(plan_id, inputs)
+    print(f"Replanned {len(dates)} days of plan {plan_id}: {removed} events replaced by {len(new_events)}, "
+          f"{updated} recurring events updated")
+    return {
+        'calendar_url': plan_url(plan_id),
+        'feed_url': plan_feed_url(plan_id),
+        'days': len(dates),
+        'removed': removed,
+        'added': len(new_events),
+        'recurring_updated': updated
+    }
+
+def run_plan_job(start_date, end_date, budget_info, activity_goals, options, job_id, progress):
+    """Generate a plan for a background job and return its calendar URL."""
+    return generate_plan(start_date, end_date, budget_info, activity_goals,
+                         progress=progress, plan_id=job_id, **options)
+
+def run_brain_dump_job(user_input, start_date, end_date, job_id, progress):
+    """Generate a brain-dump calendar for a background job and return its URL."""
+    cal = create_calendar_from_brain_dump(user_input, start_date, end_date)
+    if not cal:
+        return None
+    with open_plan(job_id) as f:
+        write_calendar(cal, f.write)
+    return plan_url(job_id)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
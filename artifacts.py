@@ -0,0 +1,213 @@
+"""Generated calendar files.
+
+Every plan is written to its own file, static/plans/<plan_id>.ics, so each
+request serializes only its own events. The inputs a plan was generated
+from are kept next to it, outside the static folder, so parts of the plan
+can be regenerated later. Each calendar is also stored gzip-compressed
+(and brotli-compressed when the brotli package is installed), so downloads
+are served precompressed without compressing per request, and its events
+are indexed in event_store for date-range queries. Plans and job state
+older than PLAN_TTL are deleted; the sweep runs when a plan is written, at most once
+per PLAN_CLEANUP_INTERVAL seconds per worker. Reading a plan's feed counts
+as using it (see touch_plan), so a plan stays as long as a calendar app
+keeps polling its subscription.
+"""
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import event_store
+from jobs import JOBS_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Generated calendars, served by Flask's static route under /static/plans/
+PLANS_DIR = 'static/plans'
+
+# Budget and goals each plan was generated from; not publicly served
+PLAN_INPUTS_DIR = os.getenv("PLAN_INPUTS_DIR", "plans")
+
+# Seconds a generated calendar and its job files are kept after they were last written or their
+# feed was last read (default 24 hours)
+PLAN_TTL = int(os.getenv("PLAN_TTL", str(24 * 3600)))
+
+# Calendars smaller than this are not worth storing compressed
+PLAN_PRECOMPRESS_MIN_BYTES = int(os.getenv("PLAN_PRECOMPRESS_MIN_BYTES", "1024"))
+
+# Content-Encoding of each precompressed variant, by file suffix, in order of preference
+PRECOMPRESSED_VARIANTS = [('br', '.br'), ('gzip', '.gz')]
+
+# Minimum seconds between cleanup sweeps
+PLAN_CLEANUP_INTERVAL = int(os.getenv("PLAN_CLEANUP_INTERVAL", "600"))
+
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
+def new_plan_id():
+    """Return a fresh, unguessable plan id."""
+    return uuid.uuid4().hex
+
+def plan_path(plan_id):
+    """Return the calendar file of a plan, or None if the id is malformed."""
+    if not re.fullmatch(r'[0-9a-f]{32}', plan_id or ''):
+        return None
+    return Path(PLANS_DIR) / f"{plan_id}.ics"
+
+def plan_url(plan_id):
+    return f"/{PLANS_DIR}/{plan_id}.ics"
+
+def plan_feed_url(plan_id):
+    """Return the path of a plan's subscribable feed (see app.plan_feed)."""
+    return f"/api/plans/{plan_id}/feed.ics"
+
+def save_plan_inputs(plan_id, inputs):
+    """Store the JSON-serializable inputs a plan was generated from."""
+    path = Path(PLAN_INPUTS_DIR) / f"{plan_id}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(inputs, f)
+    os.replace(tmp_path, path)
+
+def load_plan_inputs(plan_id):
+    """Return the stored inputs of a plan, or None if there are none."""
+    if plan_path(plan_id) is None:
+        return None
+    try:
+        with open(Path(PLAN_INPUTS_DIR) / f"{plan_id}.json", 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def touch_plan(plan_id):
+    """Restart the PLAN_TTL of a plan's calendar, its variants, inputs and indexed events.
+
+    Called when the plan's feed is read; files touched within the last
+    PLAN_CLEANUP_INTERVAL seconds are left alone, so frequent polling
+    doesn't write on every request.
+    """
+    path = plan_path(plan_id)
+    now = time.time()
+    try:
+        if now - path.stat().st_mtime < PLAN_CLEANUP_INTERVAL:
+            return
+    except OSError:
+        return
+    for touched in [path, Path(PLAN_INPUTS_DIR) / f"{plan_id}.json"] + [variant for _, variant in plan_variants(plan_id)]:
+        try:
+            os.utime(touched, (now, now))
+        except OSError:
+            continue  # No inputs saved, or removed in the meantime
+    try:
+        event_store.touch_plan(plan_id)
+    except sqlite3.Error as e:
+        print(f"Warning: Could not refresh plan {plan_id}: {str(e)}")
+
+def _compress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+def precompress(data, path):
+    """Write the compressed variants of the calendar `data` next to `path`.
+
+    Stale variants are removed when the file is too small to compress or the
+    encoder is unavailable, so a variant never describes an older calendar.
+    """
+    for encoding, suffix in PRECOMPRESSED_VARIANTS:
+        variant_path = Path(f"{path}{suffix}")
+        compressed = _compress(data, encoding) if len(data) >= PLAN_PRECOMPRESS_MIN_BYTES else None
+        if compressed is None:
+            variant_path.unlink(missing_ok=True)
+            continue
+        tmp_path = Path(f"{variant_path}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, variant_path)
+
+def plan_variants(plan_id):
+    """Return [(encoding, path)] of a plan's precompressed files that exist, in order of preference."""
+    path = plan_path(plan_id)
+    variants = [(encoding, Path(f"{path}{suffix}")) for encoding, suffix in PRECOMPRESSED_VARIANTS]
+    return [(encoding, variant) for encoding, variant in variants if variant.exists()]
+
+@contextmanager
+def open_plan(plan_id):
+    """Open a plan's calendar file for writing.
+
+    Data goes to a temporary file that replaces the plan only when the block
+    completes, so downloads never see a partial calendar and a failed
+    generation leaves nothing behind.
+    """
+    path = plan_path(plan_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            yield f
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    with open(tmp_path, 'rb') as f:
+        data = f.read()
+    try:
+        precompress(data, path)
+    except OSError as e:
+        print(f"Warning: Could not precompress plan {plan_id}: {str(e)}")
+        for _, suffix in PRECOMPRESSED_VARIANTS:
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+    os.replace(tmp_path, path)
+    try:
+        event_store.index_plan(plan_id, data)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Warning: Could not index events of plan {plan_id}: {str(e)}")
+    maybe_cleanup()
+
+def cleanup_artifacts(max_age=None):
+    """Delete plans, their inputs and job files older than `max_age` seconds. Returns the number removed."""
+    cutoff = time.time() - (PLAN_TTL if max_age is None else max_age)
+    removed = 0
+    for directory, patterns in [(PLANS_DIR, ['*.ics', '*.ics.gz', '*.ics.br', '*.tmp']),
+                                (PLAN_INPUTS_DIR, ['*.json', '*.tmp']),
+                                (JOBS_DIR, ['*.json', '*.events', '*.tmp'])]:
+        for pattern in patterns:
+            for path in Path(directory).glob(pattern):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except OSError:
+                    continue  # Removed by another worker in the meantime
+    if removed:
+        print(f"Removed {removed} expired plan and job files")
+    try:
+        forgotten = event_store.delete_expired(cutoff)
+        if forgotten:
+            print(f"Removed the events of {forgotten} expired plans")
+    except sqlite3.Error as e:
+        print(f"Warning: Could not remove expired events: {str(e)}")
+    return removed
+
+def maybe_cleanup():
+    """Run cleanup_artifacts() if the last sweep is older than PLAN_CLEANUP_INTERVAL."""
+    global _last_cleanup
+    with _cleanup_lock:
+        if time.time() - _last_cleanup < PLAN_CLEANUP_INTERVAL:
+            return
+        _last_cleanup = time.time()
+    try:
+        cleanup_artifacts()
+    except Exception as e:
+        print(f"Warning: Plan cleanup failed: {str(e)}")
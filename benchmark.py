@@ -0,0 +1,233 @@
+"""End-to-end benchmarks for plan and brain-dump generation.
+
+Runs app.generate_plan, icalagentGPT.generate_plan and the brain-dump
+calendar for 1, 30 and 180 day ranges against the local LLM stand-in
+(llm_stub_server.py), so the numbers measure this code rather than the
+network. Each case runs in a fresh subprocess and reports wall time,
+per-stage time (LLM, validation, overlap check, to_ical, file write), peak
+RSS and the size of the generated calendar.
+
+    python benchmark.py                      # all cases, results in benchmarks/
+    python benchmark.py --days 30 --latency-ms 400
+    python benchmark.py --compare benchmarks/results-<rev>.json
+
+Settings such as PLAN_CONCURRENCY, PLAN_BATCH_DAYS and PLAN_MODE are read
+from the environment as usual, so their effect can be compared directly.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+CASES = ['app_plan', 'gpt_plan', 'brain_dump']
+DEFAULT_DAYS = [1, 30, 180]
+START_DATE = datetime(2025, 1, 6)
+RESULTS_DIR = 'benchmarks'
+REPO_DIR = Path(__file__).resolve().parent
+
+BRAIN_DUMP_INPUT = (
+    "I work 9 to 5 on weekdays. Gym on Monday, Wednesday and Friday mornings, "
+    "read for half an hour every night, practice guitar on weekends and call my parents on Sunday."
+)
+
+# icalagentGPT takes its own budget and goal format
+GPT_BUDGET = {
+    "starting_balance": 5000,
+    "income": {"amount": 4000, "frequency": "monthly"},
+    "savings_goal": 1000,
+    "emergency_fund": 10000,
+    "expenses": [
+        {"name": "Rent", "amount": 1500},
+        {"name": "Utilities", "amount": 200},
+        {"name": "Groceries", "amount": 400}
+    ],
+    "work_schedule": {
+        "days": ["monday", "tuesday", "wednesday", "thursday", "friday"],
+        "start_time": "09:00",
+        "end_time": "17:00"
+    }
+}
+GPT_GOALS = {
+    "goals": [
+        {"title": "Read", "frequency": "daily", "duration": "30"},
+        {"title": "Meal Prep", "frequency": "weekly", "duration": "60"}
+    ],
+    "workout_preferences": {
+        "location": "gym",
+        "experience_level": "intermediate",
+        "available_equipment": ["dumbbells", "yoga_mat"]
+    }
+}
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def run_case(case, days, output_path):
+    """Run one benchmark case in this process and return its measurements."""
+    from llm_client import get_client_stats
+    from llm_stub_server import synth_activity_goals, synth_budget
+    from perf import get_stage_times, reset_stages, stage
+
+    end_date = START_DATE + timedelta(days=days - 1)
+    reset_stages()
+    start = time.perf_counter()
+
+    if case == 'app_plan':
+        import app
+        from artifacts import plan_path
+        ok = bool(app.generate_plan(START_DATE, end_date, synth_budget(random.Random(0)),
+                                    synth_activity_goals(random.Random(0)), plan_id='0' * 32))
+        output_path = plan_path('0' * 32)
+    elif case == 'gpt_plan':
+        import icalagentGPT
+        ok = bool(icalagentGPT.generate_plan(START_DATE, end_date, GPT_BUDGET, GPT_GOALS))
+        output_path = 'static/calendar.ics'
+    elif case == 'brain_dump':
+        from brain_dump import create_calendar_from_brain_dump
+        cal = create_calendar_from_brain_dump(BRAIN_DUMP_INPUT, START_DATE, end_date)
+        ok = cal is not None
+        if ok:
+            with stage('to_ical'):
+                ics = cal.to_ical()
+            with stage('file_write'), open(output_path, 'wb') as f:
+                f.write(ics)
+    else:
+        raise ValueError(f"Unknown benchmark case '{case}'")
+
+    wall = time.perf_counter() - start
+    return {
+        'case': case,
+        'days': days,
+        'ok': ok,
+        'wall_seconds': wall,
+        'stages': get_stage_times(),
+        'peak_rss_mb': peak_rss_mb(),
+        'ics_bytes': os.path.getsize(output_path) if ok and os.path.exists(output_path) else 0,
+        'llm_requests': get_client_stats()['requests']
+    }
+
+def run_subprocess(case, days, base_url, verbose=False):
+    """Run one case in a fresh interpreter so timings and RSS don't leak between cases."""
+    with tempfile.TemporaryDirectory() as workdir:
+        Path(workdir, 'static').mkdir()
+        result_path = Path(workdir, 'result.json')
+        env = dict(os.environ,
+                   OPENAI_BASE_URL=base_url,
+                   OPENAI_API_KEY=os.getenv('OPENAI_API_KEY', 'stub'),
+                   LLM_CACHE_ENABLED='0',
+                   # The stand-in has no account limits, so don't throttle to the real API's
+                   LLM_REQUESTS_PER_MINUTE=os.getenv('LLM_REQUESTS_PER_MINUTE', '1000000'),
+                   LLM_TOKENS_PER_MINUTE=os.getenv('LLM_TOKENS_PER_MINUTE', '1000000000'),
+                   PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_DIR), os.getenv('PYTHONPATH')])))
+        proc = subprocess.run(
+            [sys.executable, str(REPO_DIR / 'benchmark.py'), '--run-case', case, str(days),
+             '--result-file', str(result_path)],
+            cwd=workdir, env=env,
+            stdout=None if verbose else subprocess.DEVNULL,
+            stderr=None if verbose else subprocess.PIPE
+        )
+        if proc.returncode != 0 or not result_path.exists():
+            error = proc.stderr.decode('utf-8', 'replace').strip().splitlines()[-1:] if proc.stderr else []
+            return {'case': case, 'days': days, 'ok': False, 'error': error[0] if error else f"exit code {proc.returncode}"}
+        with open(result_path, 'r') as f:
+            return json.load(f)
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def format_result(result):
+    if not result.get('ok'):
+        return f"{result['case']:<11} {result['days']:>4}d  FAILED {result.get('error', '')}"
+    stages = '  '.join(f"{name}={info['seconds']:.3f}s" for name, info in sorted(result['stages'].items()))
+    return (f"{result['case']:<11} {result['days']:>4}d  wall={result['wall_seconds']:.3f}s  "
+            f"rss={result['peak_rss_mb']:.1f}MB  ics={result['ics_bytes']}B  "
+            f"llm_requests={result['llm_requests']}  {stages}")
+
+def compare(baseline, current):
+    """Print the change in wall time, peak RSS and ICS size against a baseline run."""
+    previous = {(r['case'], r['days']): r for r in baseline['results'] if r.get('ok')}
+    print(f"\nCompared with {baseline.get('git_rev', 'baseline')}:")
+    for result in current['results']:
+        old = previous.get((result['case'], result['days']))
+        if not result.get('ok') or old is None:
+            continue
+        changes = []
+        for key, label in [('wall_seconds', 'wall'), ('peak_rss_mb', 'rss'), ('ics_bytes', 'ics')]:
+            change = (result[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            changes.append(f"{label} {change:+.1f}%")
+        print(f"{result['case']:<11} {result['days']:>4}d  " + '  '.join(changes))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plan and brain-dump generation against the LLM stand-in")
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=CASES)
+    parser.add_argument('--days', nargs='+', type=int, default=DEFAULT_DAYS)
+    parser.add_argument('--latency-ms', type=float, default=0, help="Simulated LLM latency per request")
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of LLM requests answered with a 429")
+    parser.add_argument('--output', help="Results file (default benchmarks/results-<git rev>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--verbose', action='store_true', help="Show the output of each case")
+    parser.add_argument('--run-case', nargs=2, metavar=('CASE', 'DAYS'), help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        case, days = args.run_case
+        result = run_case(case, int(days), os.path.abspath('calendar.ics'))
+        with open(args.result_file, 'w') as f:
+            json.dump(result, f)
+        return
+
+    from llm_stub_server import start_in_thread
+    server, base_url = start_in_thread(mode='synth', latency_ms=args.latency_ms,
+                                       jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    results = []
+    try:
+        for case in args.cases:
+            for days in args.days:
+                result = run_subprocess(case, days, base_url, args.verbose)
+                print(format_result(result))
+                results.append(result)
+    finally:
+        server.shutdown()
+
+    run = {
+        'git_rev': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'error_rate': args.error_rate,
+            'env': {name: os.environ[name] for name in
+                    ['PLAN_CONCURRENCY', 'PLAN_BATCH_DAYS', 'PLAN_MODE'] if name in os.environ}
+        },
+        'results': results
+    }
+    output = args.output or str(REPO_DIR / RESULTS_DIR / f"results-{run['git_rev']}.json")
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(json.load(f), run)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
-import openai
 import json
 from icalendar import Calendar, Event
 import re
+from llm_cache import cached_chat_completion
+from perf import stage
+from plan_event import BYDAY_CODES, PRIORITY_VALUES, WEEKDAYS, event_uid, profile_hash
+from scheduler import pack_week
 
 def parse_brain_dump(user_input):
     """Parse unstructured user input into structured calendar events."""
@@ -18,6 +21,7 @@ def parse_brain_dump(user_input):
                 "description": "Detailed description",
                 "category": "work", "meal", "workout", "learning", "hobby", "other",
                 "priority": "high", "medium", "low",
+                "days": ["monday", "tuesday", etc.] or [] if it happens every day,
                 "activity_details": {{
                     "type": string,
                     "preferred_time": "morning", "afternoon", "evening",
@@ -54,10 +58,11 @@ def parse_brain_dump(user_input):
     5. Consider energy levels and time constraints
     6. Ensure no overlapping events
     7. Include detailed descriptions for each event
+    8. Describe one typical day; set "days" only for events that happen on specific weekdays
     """
     
     try:
-        response = openai.chat.completions.create(
+        response_text = cached_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are a calendar planning assistant. Create a detailed schedule from unstructured input. Return only valid JSON."},
@@ -65,9 +70,7 @@ def parse_brain_dump(user_input):
             ],
             max_tokens=2000,
             temperature=0.7
-        )
-        
-        response_text = response.choices[0].message.content.strip()
+        ).strip()
         response_text = re.sub(r'```json\s*|\s*```', '', response_text)
         parsed_data = json.loads(response_text)
         
@@ -76,8 +79,21 @@ def parse_brain_dump(user_input):
         print(f"Error parsing brain dump: {str(e)}")
         return {"error": str(e)}
 
+def event_weekdays(event):
+    """Return the weekdays (0 = Monday) an event repeats on; all days if unrestricted."""
+    days = {WEEKDAYS.index(day.lower()) for day in event.get('days') or []
+            if isinstance(day, str) and day.lower() in WEEKDAYS}
+    return days or set(range(7))
+
 def create_calendar_from_brain_dump(user_input, start_date, end_date):
-    """Create a calendar from brain dump input."""
+    """Create a calendar from brain dump input.
+
+    Each parsed event is emitted once and repeats until the end date, daily
+    or on the weekdays the input implies, so the calendar size does not
+    depend on the length of the range. Events that overlap on a shared
+    weekday are moved into free time by scheduler.pack_week() rather than
+    dropped.
+    """
     # Validate date range
     if end_date < start_date:
         print("Error: End date must be after start date")
@@ -102,60 +118,72 @@ def create_calendar_from_brain_dump(user_input, start_date, end_date):
         print("Error: No events generated from input")
         return None
     
-    # Generate events for each day in the date range
-    current_date = start_date
-    while current_date <= end_date:
-        # Create events for the current day
-        processed_events = []
-        for event in parsed_data.get("events", []):
-            try:
-                # Create the event
-                event_obj = Event()
-                event_obj.add('summary', event.get('title', 'Untitled Event'))
-                event_obj.add('description', event.get('description', ''))
-                
-                # Set start time
-                time_str = event.get('time', '09:00')
-                start_time = datetime.combine(current_date, datetime.strptime(time_str, '%H:%M').time())
-                
-                # Set duration
-                duration_str = event.get('duration', '1h')
-                duration_hours = 1
-                if duration_str.endswith('h'):
-                    duration_hours = float(duration_str[:-1])
-                elif duration_str.endswith('m'):
-                    duration_hours = float(duration_str[:-1]) / 60
-                
-                end_time = start_time + timedelta(hours=duration_hours)
-                
-                # Check for overlaps with existing events
-                has_overlap = False
-                for processed_event in processed_events:
-                    if check_event_overlap(start_time, end_time,
-                                        processed_event['start'], processed_event['end']):
-                        has_overlap = True
-                        break
-                
-                if not has_overlap:
-                    event_obj.add('dtstart', start_time)
-                    event_obj.add('dtend', end_time)
-                    
-                    # Add category and priority
-                    event_obj.add('categories', [event.get('category', 'other')])
-                    event_obj.add('priority', event.get('priority', 'medium'))
-                    
-                    # Add to calendar
-                    cal.add_component(event_obj)
-                    
-                    # Add to processed events for overlap checking
-                    processed_events.append({
-                        'start': start_time,
-                        'end': end_time
-                    })
-            except Exception as e:
-                print(f"Error creating event: {str(e)}")
+    until = end_date.replace(hour=23, minute=59, second=59)
+    profile = profile_hash(user_input)
+    placed = []
+    for index, event in enumerate(parsed_data.get("events", [])):
+        try:
+            weekdays = event_weekdays(event)
+            
+            # The first occurrence is the first day in the range the event happens on
+            first_date = next((start_date + timedelta(days=offset)
+                               for offset in range(min(7, (end_date - start_date).days + 1))
+                               if (start_date + timedelta(days=offset)).weekday() in weekdays), None)
+            if first_date is None:
                 continue
-        
-        current_date += timedelta(days=1)
+            
+            # Requested start time
+            time_str = event.get('time', '09:00')
+            start = datetime.strptime(time_str, '%H:%M')
+            
+            # Set duration
+            duration_str = event.get('duration', '1h')
+            duration_hours = 1
+            if duration_str.endswith('h'):
+                duration_hours = float(duration_str[:-1])
+            elif duration_str.endswith('m'):
+                duration_hours = float(duration_str[:-1]) / 60
+            placed.append((index, event, weekdays, first_date, start.hour * 60 + start.minute, duration_hours))
+        except Exception as e:
+            print(f"Error creating event: {str(e)}")
+            continue
+    
+    # Keep each requested time that is free on all of the event's weekdays, move the rest into free time
+    with stage('overlap'):
+        starts = pack_week([
+            (start_minute, max(1, round(duration_hours * 60)),
+             PRIORITY_VALUES.get(event.get('priority'), 5),
+             event['activity_details'].get('preferred_time') if isinstance(event.get('activity_details'), dict) else None,
+             weekdays)
+            for index, event, weekdays, first_date, start_minute, duration_hours in placed
+        ])
+    
+    for (index, event, weekdays, first_date, _, duration_hours), start_minute in zip(placed, starts):
+        try:
+            start_time = datetime.combine(first_date, datetime.min.time()) + timedelta(minutes=start_minute)
+            end_time = start_time + timedelta(hours=duration_hours)
+            
+            event_obj = Event()
+            event_obj.add('uid', event_uid(profile, first_date, f"brain-dump-{index}"))
+            event_obj.add('summary', event.get('title', 'Untitled Event'))
+            event_obj.add('description', event.get('description', ''))
+            event_obj.add('dtstart', start_time)
+            event_obj.add('dtend', end_time)
+            
+            # Repeat daily, or weekly on the event's weekdays
+            if len(weekdays) == 7:
+                event_obj.add('rrule', {'freq': 'daily', 'until': until})
+            else:
+                event_obj.add('rrule', {'freq': 'weekly', 'byday': [BYDAY_CODES[day] for day in sorted(weekdays)], 'until': until})
+            
+            # Add category and priority
+            event_obj.add('categories', [event.get('category', 'other')])
+            event_obj.add('priority', PRIORITY_VALUES.get(event.get('priority'), 5))
+            
+            # Add to calendar
+            cal.add_component(event_obj)
+        except Exception as e:
+            print(f"Error creating event: {str(e)}")
+            continue
     
-    return cal 
\ No newline at end of file
+    return cal
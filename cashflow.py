@@ -0,0 +1,166 @@
+"""Daily cash flow and balance projection of a budget.
+
+Income, additional income and bills are expanded to the real dates they
+fall on in the range, from their next or due date on (monthly on their day
+of the month, weekly and biweekly every 7 or 14 days, yearly on their
+date), and expenses, which have no date, are spread evenly over the days.
+A missing or unknown frequency counts as DEFAULT_FREQUENCY everywhere. The amounts are scattered
+into NumPy arrays of one entry per day and the balance is their running
+sum, so a 180-day projection is a handful of array operations and the
+figures in financial events no longer come from the model.
+"""
+import calendar
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Days between occurrences of the fixed-interval frequencies
+FREQUENCY_DAYS = {'weekly': 7, 'biweekly': 14}
+
+# Occurrences per year of each frequency
+PERIODS_PER_YEAR = {'weekly': 52, 'biweekly': 26, 'monthly': 12, 'yearly': 1}
+
+# Frequency assumed for items whose frequency is missing or unknown
+DEFAULT_FREQUENCY = 'monthly'
+
+# Days ahead that bills and income count as upcoming in a day's summary
+UPCOMING_DAYS = 7
+
+def _midnight(value):
+    return datetime(value.year, value.month, value.day)
+
+def normalize_frequency(frequency):
+    """Return `frequency` if it is one of PERIODS_PER_YEAR, otherwise DEFAULT_FREQUENCY."""
+    return frequency if frequency in PERIODS_PER_YEAR else DEFAULT_FREQUENCY
+
+def weekly_amount(amount, frequency):
+    """Convert an amount paid at `frequency` to its average per week."""
+    return amount * PERIODS_PER_YEAR[normalize_frequency(frequency)] / 52
+
+def _clamped(year, month, day):
+    return datetime(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+def occurrence_dates(anchor, frequency, start_date, end_date):
+    """Return the dates from `start_date` to `end_date` on which an item first due on `anchor` recurs.
+
+    Nothing falls before the anchor itself. Monthly and yearly items on a
+    day the month lacks fall on its last day.
+    """
+    anchor, end_date = _midnight(anchor), _midnight(end_date)
+    start_date = max(_midnight(start_date), anchor)
+    frequency = normalize_frequency(frequency)
+    dates = []
+    if frequency in FREQUENCY_DAYS:
+        step = FREQUENCY_DAYS[frequency]
+        # Earliest occurrence on or after the start date
+        current = anchor + timedelta(days=-(-(start_date - anchor).days // step) * step)
+        while current <= end_date:
+            dates.append(current)
+            current += timedelta(days=step)
+        return dates
+    year, month = start_date.year, (start_date.month if frequency == 'monthly' else anchor.month)
+    while datetime(year, month, 1) <= end_date:
+        current = _clamped(year, month, anchor.day)
+        if start_date <= current <= end_date:
+            dates.append(current)
+        if frequency == 'monthly':
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        else:
+            year += 1
+    return dates
+
+def _anchor(date_str, default):
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return default
+
+class CashFlow:
+    """Projected income, outflows and end-of-day balance for each day of a range.
+
+    Takes a budget as parsed by app.parse_budget_input; items without a
+    date (such as icalagentGPT's income) start on the first day.
+    """
+
+    def __init__(self, budget_info, start_date, end_date):
+        self.start = _midnight(start_date)
+        self.days = max(0, (_midnight(end_date) - self.start).days + 1)
+        self.starting_balance = float(budget_info.get('starting_balance') or 0)
+        self.savings_goal = float(budget_info.get('savings_goal') or 0)
+        end = self.start + timedelta(days=self.days - 1)
+
+        income = budget_info.get('income') or {}
+        items = [('income', income.get('source') or 'Income', income)]
+        items += [('income', extra.get('source') or 'Additional income', extra)
+                  for extra in budget_info.get('additional_income') or []]
+        items += [('bill', bill.get('name') or 'Bill', bill) for bill in budget_info.get('bills') or []]
+
+        # (day, kind, name, amount) of every dated transaction, in date order
+        transactions = []
+        for kind, name, item in items:
+            amount = float(item.get('amount') or 0)
+            date_str = item.get('due_date') if kind == 'bill' else item.get('next_date')
+            # A bill without a due date can't be placed; income without one starts on the first day
+            anchor = _anchor(date_str, None if kind == 'bill' else self.start)
+            if not amount or anchor is None:
+                continue
+            for date in occurrence_dates(anchor, item.get('frequency'), self.start, end):
+                transactions.append(((date - self.start).days, kind, name, amount))
+        transactions.sort(key=lambda transaction: transaction[0])
+        self.transactions = transactions
+        self._transaction_days = [transaction[0] for transaction in transactions]
+
+        days = np.array(self._transaction_days, dtype=np.int64)
+        amounts = np.array([transaction[3] for transaction in transactions], dtype=np.float64)
+        is_income = np.array([transaction[1] == 'income' for transaction in transactions], dtype=bool)
+        self.income = np.bincount(days[is_income], amounts[is_income], minlength=self.days)[:self.days]
+        self.bills = np.bincount(days[~is_income], amounts[~is_income], minlength=self.days)[:self.days]
+
+        daily_expenses = sum(weekly_amount(float(expense.get('amount') or 0), expense.get('frequency'))
+                             for expense in budget_info.get('expenses') or []) / 7
+        self.expenses = np.full(self.days, daily_expenses)
+        self.net = self.income - self.bills - self.expenses
+        self.balance = self.starting_balance + np.cumsum(self.net)
+
+    def index(self, date):
+        """Return the position of `date` in the range, or None if it lies outside."""
+        day = (_midnight(date) - self.start).days
+        return day if 0 <= day < self.days else None
+
+    def event_dates(self):
+        """Return the set of dates on which a bill is due or income arrives."""
+        return {self.start + timedelta(days=day) for day in set(self._transaction_days)}
+
+    def transactions_on(self, date, days=1):
+        """Return [{'date', 'kind', 'name', 'amount'}] of the transactions in the `days` days from `date`."""
+        first = (_midnight(date) - self.start).days
+        lo = bisect_left(self._transaction_days, first)
+        hi = bisect_right(self._transaction_days, first + days - 1)
+        return [
+            {'date': (self.start + timedelta(days=day)).strftime('%Y-%m-%d'), 'kind': kind, 'name': name, 'amount': amount}
+            for day, kind, name, amount in self.transactions[lo:hi]
+        ]
+
+    def summary(self, date):
+        """Return the financial_summary of `date`, in the shape of the daily plan schema."""
+        day = self.index(date)
+        balance = float(self.balance[day]) if day is not None else self.starting_balance
+        upcoming = self.transactions_on(date, UPCOMING_DAYS)
+        saved = max(0.0, balance - self.starting_balance)
+        return {
+            'expected_balance': round(balance, 2),
+            'upcoming_bills': [
+                {'name': item['name'], 'amount': item['amount'], 'due_date': item['date']}
+                for item in upcoming if item['kind'] == 'bill'
+            ],
+            'upcoming_income': [
+                {'source': item['name'], 'amount': item['amount'], 'date': item['date']}
+                for item in upcoming if item['kind'] == 'income'
+            ],
+            'savings_progress': {
+                'current': round(saved, 2),
+                'goal': self.savings_goal,
+                'percentage': round(min(100.0, saved / self.savings_goal * 100), 1) if self.savings_goal else 0.0
+            }
+        }
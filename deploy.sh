@@ -37,9 +37,37 @@ server {
         proxy_set_header X-Forwarded-Proto \$scheme;
     }
 
+    # Job progress streams: pass events through as they are sent; the app sends a
+    # keepalive every JOB_STREAM_KEEPALIVE seconds, well within the read timeout
+    location ~ ^/api/jobs/[^/]+/events\$ {
+        proxy_pass http://127.0.0.1:8000;
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto \$scheme;
+        proxy_http_version 1.1;
+        proxy_set_header Connection "";
+        proxy_buffering off;
+        proxy_cache off;
+        proxy_read_timeout 60s;
+    }
+
     location /static {
         alias /var/www/ical-agent/static;
     }
+
+    # Generated calendars: serve the .gz written next to each plan instead of
+    # compressing per request, and let clients revalidate with ETag / 304
+    location /static/plans/ {
+        alias /var/www/ical-agent/static/plans/;
+        types { text/calendar ics; }
+        gzip_static on;
+        gzip_vary on;
+        etag on;
+        sendfile on;
+        add_header Cache-Control "no-cache";
+        # brotli_static on;  # Needs the ngx_brotli module
+    }
 }
 EOF
 
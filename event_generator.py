@@ -1,109 +1,68 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
-import openai
+import os
 import re
-from icalendar import Event
+from llm_cache import cached_chat_completion
+from perf import stage
+from plan_event import PlanEvent
+from scheduler import pack_day, work_blocks
 
-# Event categories and their colors
-EVENT_CATEGORIES = {
-    "financial": "#4CAF50",  # Green
-    "meal": "#FF9800",       # Orange
-    "workout": "#2196F3",    # Blue
-    "learning": "#9C27B0",   # Purple
-    "hobby": "#E91E63",      # Pink
-    "work": "#FF5722",       # Deep Orange
-    "other": "#607D8B"       # Grey
-}
+# Maximum completion tokens for a multi-day (batched) request; a batch covers as many days as fit
+BATCH_MAX_TOKENS = int(os.getenv("BATCH_MAX_TOKENS", "4096"))
 
-def check_event_overlap(event1_start, event1_end, event2_start, event2_end):
-    """Check if two events overlap."""
-    return (event1_start < event2_end and event2_start < event1_end)
+# Completion tokens allowed for one day of events
+EVENT_TOKENS = 2000
 
-def validate_work_schedule(work_schedule):
-    """Validate work schedule to ensure reasonable hours."""
-    if not work_schedule:
-        return None
-        
-    start_time = work_schedule.get("start_time", "09:00")
-    end_time = work_schedule.get("end_time", "17:00")
-    
-    try:
-        start = datetime.strptime(start_time, '%H:%M')
-        end = datetime.strptime(end_time, '%H:%M')
-        
-        # Ensure work hours are between 6 AM and 10 PM
-        if start.hour < 6 or end.hour > 22:
-            print("Warning: Work hours should be between 6 AM and 10 PM")
-            return None
-            
-        # Ensure work duration is reasonable (between 4 and 12 hours)
-        duration = (end - start).total_seconds() / 3600
-        if duration < 4 or duration > 12:
-            print("Warning: Work duration should be between 4 and 12 hours")
-            return None
-            
-        return work_schedule
-    except ValueError:
-        print("Error: Invalid time format in work schedule")
-        return None
+# Completion tokens one day of events is expected to take in a batched request, where
+# descriptions are kept concise; sets how many days share a request (5 at the default BATCH_MAX_TOKENS)
+EVENT_BATCH_DAY_TOKENS = 700
 
-def generate_events(date, activity_goals):
-    """Generate events based on activity goals and preferences."""
-    print(f"Generating events for {date.strftime('%Y-%m-%d')}")
-    
-    prompt = f"""
-    Generate a detailed list of events for {date.strftime('%Y-%m-%d')} based on the following activity goals and preferences.
-    For each activity, create a separate event with its own time slot.
-    Format the response as a JSON object with the following structure:
-    {{
+# JSON structure of one day of events, shared by the single-day and batched prompts
+DAY_SCHEMA = """{
         "events": [
-            {{
+            {
                 "title": "Event Title",
                 "time": "HH:MM",
                 "duration": "1h" or "30m",
                 "description": "Detailed description with proper spacing and formatting",
                 "category": "work", "meal", "workout", "learning", "hobby", "other",
                 "priority": "high", "medium", or "low",
-                "activity_details": {{
+                "activity_details": {
                     "type": "work", "meal_planning", "workout", "learning", "hobby",
                     "preferred_time": "morning", "afternoon", "evening",
                     "notes": string,
                     "sub_activities": [
-                        {{
+                        {
                             "name": string,
                             "duration": "1h" or "30m",
                             "description": string
-                        }}
+                        }
                     ]
-                }}
-            }}
+                }
+            }
         ],
-        "work_schedule": {{
+        "work_schedule": {
             "start_time": "HH:MM",
             "end_time": "HH:MM",
             "breaks": [
-                {{
+                {
                     "start": "HH:MM",
                     "end": "HH:MM"
-                }}
+                }
             ]
-        }}
-    }}
-
-    Activity Goals:
-    {json.dumps(activity_goals, indent=2)}
+        }
+    }"""
 
-    Important Instructions:
+# Scheduling rules shared by the single-day and batched prompts
+EVENT_INSTRUCTIONS = """Important Instructions:
     1. For each activity in the goals:
        - Create a separate event with its own time slot
        - Space events throughout the day based on preferred times
        - Consider energy levels and time constraints
-       - Ensure no overlapping events
 
     2. For work hours:
        - Create a dedicated work block event
        - Include breaks in the work schedule
-       - Ensure other events don't overlap with work hours
        - Consider commute time if applicable
 
     3. For workout sessions:
@@ -134,184 +93,262 @@ def generate_events(date, activity_goals):
 
     Time Guidelines:
     - Use 24-hour format for time (e.g., "14:30")
+    - Overlapping events are moved into free time automatically, so give each event the time that suits it best
     - Keep events between 06:00 and 22:00
     - Space events with appropriate breaks
     - Consider energy levels throughout the day
     - Morning (06:00-12:00): High energy activities
     - Afternoon (12:00-17:00): Medium energy activities
-    - Evening (17:00-22:00): Low energy activities
+    - Evening (17:00-22:00): Low energy activities"""
+
+def validate_work_schedule(work_schedule):
+    """Validate work schedule to ensure reasonable hours."""
+    if not work_schedule:
+        return None
+        
+    start_time = work_schedule.get("start_time", "09:00")
+    end_time = work_schedule.get("end_time", "17:00")
+    
+    try:
+        start = datetime.strptime(start_time, '%H:%M')
+        end = datetime.strptime(end_time, '%H:%M')
+        
+        # Ensure work hours are between 6 AM and 10 PM
+        if start.hour < 6 or end.hour > 22:
+            print("Warning: Work hours should be between 6 AM and 10 PM")
+            return None
+            
+        # Ensure work duration is reasonable (between 4 and 12 hours)
+        duration = (end - start).total_seconds() / 3600
+        if duration < 4 or duration > 12:
+            print("Warning: Work duration should be between 4 and 12 hours")
+            return None
+            
+        return work_schedule
+    except ValueError:
+        print("Error: Invalid time format in work schedule")
+        return None
+
+def default_events():
+    """Return the minimal plan used when no events could be generated."""
+    return {
+        "events": [{
+            "title": "Daily Planning",
+            "time": "09:00",
+            "duration": "1h",
+            "description": "Review your daily goals and schedule",
+            "category": "other",
+            "priority": "medium"
+        }]
+    }
+
+@stage('validation')
+def process_events(parsed_data):
+    """Validate one day of generated events, add the work block and move overlapping events into free time."""
+    if 'events' not in parsed_data or not parsed_data['events']:
+        print("No events generated, creating default event")
+        parsed_data = default_events()
+    
+    # Validate and fix each event
+    print(f"Processing {len(parsed_data['events'])} events...")
+    
+    # First, ensure work schedule is properly handled: one work event per block between breaks,
+    # so the breaks the activities may be packed into are free in the calendar too
+    work_schedule = validate_work_schedule(parsed_data.get("work_schedule"))
+    blocks = work_blocks(work_schedule)
+    work_events = [{
+        "title": "Work Hours",
+        "time": f"{start // 60:02d}:{start % 60:02d}",
+        "duration": f"{end - start}m",
+        "description": "Work hours",
+        "category": "work",
+        "priority": "high",
+        "activity_details": {
+            "type": "work",
+            "preferred_time": "morning",
+            "notes": "Work hours",
+            "sub_activities": []
+        }
+    } for start, end in blocks]
+    parsed_data["events"][:0] = work_events
+    
+    # Validate each event into a PlanEvent
+    events = [PlanEvent.from_dict(event, 'activity_details') for event in parsed_data["events"]]
+    fixed, events = events[:len(work_events)], events[len(work_events):]
+    # The model usually adds its own work block too; the ones from the work schedule replace it
+    events = [event for event in events
+              if not (event.category == 'work' and any(event.start < work.end and work.start < event.end
+                                                         for work in fixed))]
+    
+    # Keep each event's time if it is free, otherwise move it into free time around work and breaks
+    with stage('overlap'):
+        starts = pack_day([(event.start, event.duration, event.priority,
+                            event.details.get('preferred_time') if isinstance(event.details, dict) else None)
+                           for event in events], blocks)
+    for event, start in zip(events, starts):
+        event.start = start
+    processed_events = sorted(fixed + events, key=lambda event: event.start)
+    
+    parsed_data["events"] = processed_events
+    
+    print(f"Successfully processed {len(processed_events)} events")
+    return parsed_data
+
+def generate_events(date, activity_goals, refresh=False):
+    """Generate events based on activity goals and preferences; `refresh` bypasses the LLM cache."""
+    print(f"Generating events for {date.strftime('%Y-%m-%d')}")
+    
+    prompt = f"""
+    Generate a detailed list of events for {date.strftime('%Y-%m-%d')} based on the following activity goals and preferences.
+    For each activity, create a separate event with its own time slot.
+    Format the response as a JSON object with the following structure:
+    {DAY_SCHEMA}
+
+    Activity Goals:
+    {json.dumps(activity_goals, indent=2)}
+
+    {EVENT_INSTRUCTIONS}
     """
     
     try:
         print("Sending request to OpenAI...")
-        response = openai.chat.completions.create(
+        response_text = cached_chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are an activity planner. Create separate events for each activity, properly spaced throughout the day. Return only valid JSON with properly formatted event descriptions."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=2000,
-            temperature=0.7
-        )
+            max_tokens=EVENT_TOKENS,
+            temperature=0.7,
+            refresh=refresh
+        ).strip()
         print("Received response from OpenAI")
-        
-        response_text = response.choices[0].message.content.strip()
         response_text = re.sub(r'```json\s*|\s*```', '', response_text)
         
         # Parse and validate the response
         print("Parsing response...")
         parsed_data = json.loads(response_text)
-        
-        if 'events' not in parsed_data or not parsed_data['events']:
-            print("No events generated, creating default event")
-            parsed_data = {
-                "events": [{
-                    "title": "Daily Planning",
-                    "time": "09:00",
-                    "duration": "1h",
-                    "description": "Review your daily goals and schedule",
-                    "category": "other",
-                    "priority": "medium"
-                }]
-            }
-        
-        # Validate and fix each event
-        print(f"Processing {len(parsed_data['events'])} events...")
-        
-        # First, ensure work schedule is properly handled
-        work_schedule = validate_work_schedule(parsed_data.get("work_schedule"))
-        if work_schedule:
-            start_time = work_schedule.get("start_time", "09:00")
-            end_time = work_schedule.get("end_time", "17:00")
-            
-            # Calculate duration in hours
-            start = datetime.strptime(start_time, '%H:%M')
-            end = datetime.strptime(end_time, '%H:%M')
-            duration = (end - start).total_seconds() / 3600
-            
-            work_event = {
-                "title": "Work Hours",
-                "time": start_time,
-                "duration": f"{duration}h",
-                "description": "Work hours",
-                "category": "work",
-                "priority": "high",
-                "activity_details": {
-                    "type": "work",
-                    "preferred_time": "morning",
-                    "notes": "Work hours",
-                    "sub_activities": []
-                }
-            }
-            parsed_data["events"].insert(0, work_event)
-        
-        # Process all events and ensure no overlaps
-        processed_events = []
-        for event in parsed_data["events"]:
-            # Ensure required fields exist
-            if 'title' not in event:
-                event['title'] = 'Untitled Event'
-            if 'time' not in event:
-                event['time'] = '09:00'
-            if 'duration' not in event:
-                event['duration'] = '1h'
-            if 'description' not in event:
-                event['description'] = ''
-            if 'category' not in event or event['category'] not in EVENT_CATEGORIES:
-                event['category'] = 'other'
-            if 'priority' not in event or event['priority'] not in ['high', 'medium', 'low']:
-                event['priority'] = 'medium'
-                
-            # Validate time format
-            try:
-                hour, minute = map(int, event['time'].split(':'))
-                if hour < 0 or hour > 23 or minute < 0 or minute > 59:
-                    event['time'] = '09:00'
-            except:
-                event['time'] = '09:00'
-                
-            # Validate duration format
-            if not isinstance(event['duration'], str) or not (event['duration'].endswith('h') or event['duration'].endswith('m')):
-                event['duration'] = '1h'
-            
-            # Calculate event start and end times
-            start_time = datetime.strptime(event['time'], '%H:%M').time()
-            duration_hours = 1
-            if event['duration'].endswith('h'):
-                duration_hours = float(event['duration'][:-1])
-            elif event['duration'].endswith('m'):
-                duration_hours = float(event['duration'][:-1]) / 60
-            
-            # Check for overlaps with existing events
-            has_overlap = False
-            for processed_event in processed_events:
-                processed_start = datetime.strptime(processed_event['time'], '%H:%M').time()
-                processed_duration = 1
-                if processed_event['duration'].endswith('h'):
-                    processed_duration = float(processed_event['duration'][:-1])
-                elif processed_event['duration'].endswith('m'):
-                    processed_duration = float(processed_event['duration'][:-1]) / 60
-                
-                if check_event_overlap(start_time, start_time + timedelta(hours=duration_hours),
-                                    processed_start, processed_start + timedelta(hours=processed_duration)):
-                    has_overlap = True
-                    break
-            
-            if not has_overlap:
-                processed_events.append(event)
-        
-        parsed_data["events"] = processed_events
-        
-        print(f"Successfully processed {len(processed_events)} events")
-        return parsed_data
+        return process_events(parsed_data)
     except Exception as e:
         print(f"Error generating events: {str(e)}")
         # Return a minimal valid plan
-        return {
-            "events": [{
-                "title": "Daily Planning",
-                "time": "09:00",
-                "duration": "1h",
-                "description": "Review your daily goals and schedule",
-                "category": "other",
-                "priority": "medium"
-            }]
-        }
+        return dict(process_events(default_events()), error=str(e))
+
+_DAY_KEY = re.compile(r'\s*,?\s*"(\d{4}-\d{2}-\d{2})"\s*:\s*')
 
-def create_activity_event(date, time_str, summary, description, duration_str, category="other", priority="medium", activity_details=None):
-    """Create an event for activities."""
-    event = Event()
+def parse_batch_days(response_text):
+    """Return the {'YYYY-MM-DD': day} of a batched response, salvaging the complete days of a truncated one.
+
+    A response cut off at max_tokens is not valid JSON, but the days before
+    the cut are; they are decoded one by one up to the first incomplete day.
+    """
+    try:
+        return json.loads(response_text).get('days', {})
+    except ValueError:
+        pass
+    decoder = json.JSONDecoder()
+    days = {}
+    match = re.search(r'"days"\s*:\s*\{', response_text)
+    position = match.end() if match else len(response_text)
+    while True:
+        key = _DAY_KEY.match(response_text, position)
+        if not key:
+            break
+        try:
+            day, position = decoder.raw_decode(response_text, key.end())
+        except ValueError:
+            break
+        days[key.group(1)] = day
+    if days:
+        print(f"Salvaged {len(days)} days from a truncated response")
+    return days
+
+def max_batch_days(per_day_tokens):
+    """Return the most days one batched request can cover at `per_day_tokens` each within BATCH_MAX_TOKENS."""
+    return max(1, BATCH_MAX_TOKENS // per_day_tokens)
+
+def generate_in_batches(dates, per_day_tokens, request_batch, request_day):
+    """Return {'YYYY-MM-DD': plan} for `dates`, requested in batches that fit BATCH_MAX_TOKENS.
+
+    `request_batch(dates)` returns the plans of the days its response
+    covered, which are kept even when others are missing or the response
+    was cut short. The missing days are requested again as one batch, and
+    any still missing after that with `request_day(date)`.
+    """
+    size = max_batch_days(per_day_tokens)
+    plans = {}
+    for i in range(0, len(dates), size):
+        missing = dates[i:i + size]
+        for attempt in range(2):
+            if len(missing) < 2:
+                break
+            plans.update(request_batch(missing))
+            missing = [date for date in missing if date.strftime('%Y-%m-%d') not in plans]
+            if missing:
+                print(f"No plans returned for {len(missing)} days, requesting them again")
+        for date in missing:
+            plans[date.strftime('%Y-%m-%d')] = request_day(date)
+    return plans
+
+def generate_events_batch(dates, activity_goals, refresh=False):
+    """Generate events for several days, as few days per request as fit BATCH_MAX_TOKENS.
+
+    Returns a dict mapping each date ('YYYY-MM-DD') to the structure
+    generate_events returns. Each day is validated on its own; days missing
+    from a response are requested again (see generate_in_batches).
+    """
+    return generate_in_batches(dates, EVENT_BATCH_DAY_TOKENS,
+                               lambda batch: request_events_batch(batch, activity_goals, refresh),
+                               lambda date: generate_events(date, activity_goals, refresh))
+
+def request_events_batch(dates, activity_goals, refresh=False):
+    """Send one batched events request for `dates` and return the days it covered."""
+    date_strs = [date.strftime('%Y-%m-%d') for date in dates]
+    print(f"Generating events for {date_strs[0]} to {date_strs[-1]} in one request")
+    
+    prompt = f"""
+    Generate a detailed list of events for each of these dates: {', '.join(date_strs)}, based on the following activity goals and preferences.
+    For each activity, create a separate event with its own time slot.
+    Format the response as a JSON object with one entry per date:
+    {{
+        "days": {{
+            "YYYY-MM-DD": {DAY_SCHEMA}
+        }}
+    }}
+
+    Activity Goals:
+    {json.dumps(activity_goals, indent=2)}
+
+    {EVENT_INSTRUCTIONS}
+
+    Include every listed date exactly once and keep descriptions concise.
+    """
     
+    plans = {}
     try:
-        # Parse duration with better error handling
-        duration_hours = 1  # default
-        if duration_str:
-            if duration_str.endswith('h'):
-                duration_hours = float(duration_str[:-1])
-            elif duration_str.endswith('m'):
-                duration_hours = float(duration_str[:-1]) / 60
-        
-        # Set start time
-        start_time = datetime.combine(date, datetime.strptime(time_str, '%H:%M').time())
-        event.add('dtstart', start_time)
-        
-        # Set end time
-        end_time = start_time + timedelta(hours=duration_hours)
-        event.add('dtend', end_time)
-        
-        # Set summary and description
-        event.add('summary', summary)
-        event.add('description', description)
-        
-        # Set category and priority
-        event.add('categories', [category])
-        event.add('priority', priority)
-        
-        # Add activity details if provided
-        if activity_details:
-            event.add('x-activity-details', json.dumps(activity_details))
+        print("Sending batched request to OpenAI...")
+        response_text = cached_chat_completion(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are an activity planner. Create separate events for each activity, properly spaced throughout each day. Return only valid JSON keyed by date with properly formatted event descriptions."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=min(EVENT_BATCH_DAY_TOKENS * len(dates), BATCH_MAX_TOKENS),
+            temperature=0.7,
+            refresh=refresh
+        ).strip()
+        print("Received response from OpenAI")
+        response_text = re.sub(r'```json\s*|\s*```', '', response_text)
+        days = parse_batch_days(response_text)
         
-        return event
+        for date_str in date_strs:
+            if not isinstance(days.get(date_str), dict):
+                continue
+            try:
+                plans[date_str] = process_events(days[date_str])
+            except Exception as e:
+                print(f"Error processing events for {date_str}: {str(e)}")
+                plans[date_str] = dict(process_events(default_events()), error=str(e))
     except Exception as e:
-        print(f"Error creating activity event: {str(e)}")
-        return None 
\ No newline at end of file
+        print(f"Error generating batched events: {str(e)}")
+    return plans
@@ -0,0 +1,233 @@
+"""SQLite index of the events in each generated plan.
+
+Every calendar written through artifacts.open_plan is indexed here, one row
+per event, with indexes on (plan, start) and (plan, category, start). A
+client that shows one week asks query_events() for that window instead of
+downloading and parsing the whole calendar. Weekly recurring events are
+stored once and expanded to their occurrences in the requested window.
+
+Each plan also has a sync sequence number, bumped whenever re-indexing
+changes its events. Every event row records the sequence at which it last
+changed, and events that disappear are kept as tombstones, so
+changes_since() can tell a subscribed client exactly what changed since
+the sync token it last saw.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from dateutil.rrule import rrulestr
+from icalendar.parser import unescape_char
+
+from ics_writer import component_lines, split_calendar
+from plan_event import EVENT_CATEGORIES, PRIORITY_NAMES
+
+EVENT_STORE_PATH = os.getenv("EVENT_STORE_PATH", "plans/events.sqlite3")
+
+_local = threading.local()
+
+def _connect():
+    """Return this thread's connection to the event database."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        Path(EVENT_STORE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(EVENT_STORE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                plan TEXT NOT NULL,
+                uid TEXT NOT NULL,
+                start TEXT NOT NULL,
+                end TEXT NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                category TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                rrule TEXT,
+                exdates TEXT,
+                PRIMARY KEY (plan, uid)
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS plans (plan TEXT PRIMARY KEY, updated_at REAL NOT NULL)")
+        # Sync columns, added to databases created before feeds existed
+        for table, column, definition in [('events', 'seq', 'INTEGER NOT NULL DEFAULT 0'),
+                                          ('events', 'deleted', 'INTEGER NOT NULL DEFAULT 0'),
+                                          ('events', 'hash', 'TEXT'),
+                                          ('events', 'ical', 'BLOB'),
+                                          ('plans', 'seq', 'INTEGER NOT NULL DEFAULT 0')]:
+            if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        conn.execute("CREATE INDEX IF NOT EXISTS events_plan_start ON events (plan, start)")
+        conn.execute("CREATE INDEX IF NOT EXISTS events_plan_category ON events (plan, category, start)")
+        conn.execute("CREATE INDEX IF NOT EXISTS events_plan_seq ON events (plan, seq)")
+        _local.conn = conn
+    return conn
+
+def parse_ical_datetime(value):
+    """Return the datetime of a raw DTSTART/DTEND/EXDATE value ('20250106T090000', '20250106', ...)."""
+    value = value.strip().rstrip('Z')
+    if 'T' in value:
+        return datetime.strptime(value[:15], '%Y%m%dT%H%M%S')
+    return datetime.strptime(value[:8], '%Y%m%d')
+
+def event_row(plan_id, component, index):
+    """Return the events table row for one serialized VEVENT, or None if it has no start."""
+    properties = {}
+    exdates = []
+    for name, value in component_lines(component):
+        if name == 'EXDATE':
+            exdates.extend(parse_ical_datetime(day).isoformat() for day in value.split(','))
+        else:
+            properties.setdefault(name, value)
+    if 'DTSTART' not in properties:
+        return None
+    start = parse_ical_datetime(properties['DTSTART'])
+    end = parse_ical_datetime(properties['DTEND']) if 'DTEND' in properties else start
+    category = unescape_char(properties.get('CATEGORIES', 'other')).split(',')[0]
+    try:
+        priority = int(properties.get('PRIORITY', 5))
+    except ValueError:
+        priority = 5
+    return (
+        plan_id,
+        unescape_char(properties['UID']) if properties.get('UID') else f"{plan_id}-{index}",
+        start.isoformat(),
+        end.isoformat(),
+        unescape_char(properties.get('SUMMARY', '')),
+        unescape_char(properties.get('DESCRIPTION', '')),
+        category if category in EVENT_CATEGORIES else 'other',
+        priority,
+        properties.get('RRULE'),
+        ','.join(exdates) or None
+    )
+
+def index_plan(plan_id, data):
+    """Update the stored events of a plan to those in its serialized calendar. Returns the number stored.
+
+    Events whose serialized form is unchanged keep their sequence number;
+    new and changed events get the plan's next one, and events no longer in
+    the calendar become tombstones with it.
+    """
+    _, components = split_calendar(data)
+    events = {}
+    for index, component in enumerate(components):
+        if not component.startswith(b"BEGIN:VEVENT"):
+            continue
+        row = event_row(plan_id, component, index)
+        if row:
+            events[row[1]] = (row, hashlib.sha1(component).hexdigest(), component)
+
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        plan = conn.execute("SELECT seq FROM plans WHERE plan = ?", (plan_id,)).fetchone()
+        seq = (plan[0] if plan else 0) + 1
+        existing = {uid: (row_hash, deleted) for uid, row_hash, deleted in
+                    conn.execute("SELECT uid, hash, deleted FROM events WHERE plan = ?", (plan_id,))}
+        changed = [row + (seq, 0, row_hash, component) for uid, (row, row_hash, component) in events.items()
+                   if existing.get(uid) != (row_hash, 0)]
+        removed = [(seq, plan_id, uid) for uid, (_, deleted) in existing.items() if uid not in events and not deleted]
+        conn.executemany("INSERT OR REPLACE INTO events (plan, uid, start, end, title, description, category, priority, "
+                         "rrule, exdates, seq, deleted, hash, ical) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         changed)
+        conn.executemany("UPDATE events SET seq = ?, deleted = 1, ical = NULL WHERE plan = ? AND uid = ?", removed)
+        if not (changed or removed):
+            seq -= 1
+        conn.execute("INSERT OR REPLACE INTO plans (plan, updated_at, seq) VALUES (?, ?, ?)",
+                     (plan_id, time.time(), seq))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(events)
+
+def sync_token(plan_id):
+    """Return the current sync token of a plan, or None if it has not been indexed."""
+    row = _connect().execute("SELECT seq FROM plans WHERE plan = ?", (plan_id,)).fetchone()
+    return str(row[0]) if row else None
+
+def changes_since(plan_id, token):
+    """Return [(uid, start, end, title, seq, ical)] of events changed after sync `token`, in sequence order.
+
+    `ical` is the serialized event, or None for an event that has been removed.
+    Returns None if the token is not one this plan has issued.
+    """
+    current = sync_token(plan_id)
+    if current is None or not token.isdigit() or int(token) > int(current):
+        return None
+    return _connect().execute(
+        "SELECT uid, start, end, title, seq, ical FROM events WHERE plan = ? AND seq > ? ORDER BY seq",
+        (plan_id, int(token))
+    ).fetchall()
+
+def touch_plan(plan_id):
+    """Mark a plan as used now, so delete_expired() keeps it."""
+    _connect().execute("UPDATE plans SET updated_at = ? WHERE plan = ?", (time.time(), plan_id))
+
+def delete_expired(cutoff):
+    """Forget plans last indexed before the `cutoff` timestamp. Returns the number of plans removed."""
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        expired = [(plan,) for plan, in conn.execute("SELECT plan FROM plans WHERE updated_at < ?", (cutoff,))]
+        conn.executemany("DELETE FROM events WHERE plan = ?", expired)
+        conn.executemany("DELETE FROM plans WHERE plan = ?", expired)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(expired)
+
+def _event(uid, start, end, title, description, category, priority, recurring):
+    return {
+        'uid': uid,
+        'title': title,
+        'description': description,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'category': category,
+        'color': EVENT_CATEGORIES.get(category, EVENT_CATEGORIES['other']),
+        'priority': PRIORITY_NAMES.get(priority, 'medium'),
+        'recurring': recurring
+    }
+
+def query_events(plan_id, start, end, category=None):
+    """Return the events of a plan starting in [start, end), recurring ones expanded, in start order.
+
+    Returns None if the plan has not been indexed.
+    """
+    conn = _connect()
+    if conn.execute("SELECT 1 FROM plans WHERE plan = ?", (plan_id,)).fetchone() is None:
+        return None
+
+    columns = "uid, start, end, title, description, category, priority"
+    filters = " AND category = ?" if category else ""
+    extra = (category,) if category else ()
+    events = []
+    for uid, first, last, title, description, row_category, priority in conn.execute(
+            f"SELECT {columns} FROM events WHERE plan = ?{filters} AND deleted = 0 AND rrule IS NULL "
+            "AND start >= ? AND start < ?",
+            (plan_id, *extra, start.isoformat(), end.isoformat())):
+        events.append(_event(uid, datetime.fromisoformat(first), datetime.fromisoformat(last),
+                             title, description, row_category, priority, False))
+
+    # Recurring events are stored once from their first occurrence
+    for uid, first, last, title, description, row_category, priority, rrule, exdates in conn.execute(
+            f"SELECT {columns}, rrule, exdates FROM events WHERE plan = ?{filters} AND deleted = 0 "
+            "AND rrule IS NOT NULL AND start < ?",
+            (plan_id, *extra, end.isoformat())):
+        first = datetime.fromisoformat(first)
+        duration = datetime.fromisoformat(last) - first
+        skipped = set(exdates.split(',')) if exdates else set()
+        for occurrence in rrulestr(rrule, dtstart=first).between(start, end, inc=True):
+            if occurrence < end and occurrence.isoformat() not in skipped:
+                events.append(_event(uid, occurrence, occurrence + duration,
+                                     title, description, row_category, priority, True))
+
+    events.sort(key=lambda event: event['start'])
+    return events
@@ -0,0 +1,151 @@
+"""Recurring financial schedule of a budget, generated without the LLM.
+
+schedule_events() turns a budget in the parse_budget_input format into
+calendar events: one recurring event per income source and bill, with an
+RRULE following its frequency (biweekly paydays as FREQ=WEEKLY;INTERVAL=2,
+monthly items on their day of the month, moved to the last day of shorter
+months), monthly checkpoints for each financial goal until its target date,
+and an event on the extra payday of every month with more paydays than
+usual, such as the third biweekly paycheck. A profile is a few dozen events
+however long the range, so multi-year schedules for thousands of profiles
+are written in seconds.
+"""
+import calendar
+from datetime import datetime, timedelta
+
+from icalendar import Calendar
+
+from cashflow import FREQUENCY_DAYS, PERIODS_PER_YEAR, normalize_frequency, occurrence_dates
+from ics_writer import ICSWriter
+from plan_event import PlanEvent, PRIORITY_VALUES, event_uid, profile_hash
+
+# Start and length of schedule events, in minutes
+EVENT_START = 9 * 60
+EVENT_DURATION = 30
+
+def new_calendar():
+    """Return an empty calendar for one financial schedule."""
+    cal = Calendar()
+    cal.add('prodid', '-//Budget Plan//mxm.dk//')
+    cal.add('version', '2.0')
+    return cal
+
+def _date(date_str):
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def recurrence(anchor, frequency, until):
+    """Return the rrule of an item dated `anchor` that repeats at `frequency`, as cashflow.occurrence_dates does."""
+    frequency = normalize_frequency(frequency)
+    if frequency in FREQUENCY_DAYS:
+        return {'freq': 'weekly', 'interval': FREQUENCY_DAYS[frequency] // 7, 'until': until}
+    rule = {'freq': frequency, 'until': until}
+    if frequency == 'yearly':
+        rule['bymonth'] = anchor.month
+    if anchor.day <= 28:
+        return dict(rule, bymonthday=[anchor.day])
+    # The last of the days from the 28th to the anchor's day that the month has
+    return dict(rule, bymonthday=list(range(28, anchor.day + 1)), bysetpos=-1)
+
+def _month_end(date):
+    return date.replace(day=calendar.monthrange(date.year, date.month)[1])
+
+def _event(profile, slot, date, title, description, details, priority=5, rrule=None):
+    event = PlanEvent(EVENT_START, EVENT_DURATION, title, description, 'financial', priority, details)
+    event.date = date
+    event.uid = event_uid(profile, date, slot)
+    event.rrule = rrule
+    return event
+
+def extra_paydays(dates, frequency):
+    """Return the paydays that fall in a month with more paydays than usual for `frequency`."""
+    usual = PERIODS_PER_YEAR[frequency] // 12
+    months = {}
+    for date in dates:
+        months.setdefault((date.year, date.month), []).append(date)
+    return [paydays[-1] for paydays in months.values() if len(paydays) > usual]
+
+def schedule_events(budget_info, start_date, end_date):
+    """Return the PlanEvents of a budget's financial schedule from `start_date` to `end_date`."""
+    start_date = datetime(start_date.year, start_date.month, start_date.day)
+    end_date = datetime(end_date.year, end_date.month, end_date.day)
+    profile = profile_hash(budget_info)
+    until = end_date.replace(hour=23, minute=59, second=59)
+    events = []
+
+    income = budget_info.get('income') or {}
+    items = [('income', income.get('source') or 'Income', income, income.get('next_date'))]
+    items += [('income', extra.get('source') or 'Additional income', extra, extra.get('next_date'))
+              for extra in budget_info.get('additional_income') or []]
+    items += [('bill_payment', bill.get('name') or 'Bill', bill, bill.get('due_date'))
+              for bill in budget_info.get('bills') or []]
+
+    for index, (kind, name, item, date_str) in enumerate(items):
+        amount = float(item.get('amount') or 0)
+        frequency = item.get('frequency')
+        anchor = _date(date_str)
+        if anchor is None:
+            continue
+        frequency = normalize_frequency(frequency)
+        # The RRULE carries the later occurrences, so only the first year is expanded for the first one
+        first_from = max(start_date, anchor)
+        dates = occurrence_dates(anchor, frequency, first_from, min(end_date, first_from + timedelta(days=366)))[:1]
+        if not dates:
+            continue
+        rrule = recurrence(anchor, frequency, until)
+        details = {'type': kind, 'amount': amount, 'due_date': dates[0].strftime('%Y-%m-%d'),
+                   'notes': f"Repeats {frequency}"}
+        if kind == 'income':
+            events.append(_event(profile, f"income-{index}", dates[0], f"Payday: {name}",
+                                 f"{name} pays ${amount:.2f}", details, rrule=rrule))
+            if frequency in FREQUENCY_DAYS:
+                # Count the paydays of whole months, so the months at either end aren't undercounted
+                month_dates = occurrence_dates(anchor, frequency, start_date.replace(day=1), _month_end(end_date))
+                for extra_date in extra_paydays(month_dates, frequency):
+                    if not start_date <= extra_date <= end_date:
+                        continue
+                    events.append(_event(
+                        profile, f"extra-{index}", extra_date, f"Extra paycheck: {name}",
+                        f"This month has an extra {name} paycheck: the usual ones cover the bills, "
+                        f"so save the ${amount:.2f}",
+                        {'type': 'savings', 'amount': amount, 'due_date': extra_date.strftime('%Y-%m-%d'), 'notes': ''},
+                        PRIORITY_VALUES['high']
+                    ))
+        else:
+            events.append(_event(profile, f"bill-{index}", dates[0], f"{name} due",
+                                 f"Pay {name}: ${amount:.2f}", details, PRIORITY_VALUES['high'], rrule))
+
+    for index, goal in enumerate(budget_info.get('financial_goals') or []):
+        target_date = _date(goal.get('target_date'))
+        target = float(goal.get('target_amount') or 0)
+        if target_date is None or target_date < start_date or not target:
+            continue
+        name = goal.get('name') or 'Financial goal'
+        priority = PRIORITY_VALUES.get(goal.get('priority'), 5)
+        checkpoints = occurrence_dates(start_date, 'monthly', start_date, min(target_date, end_date))
+        monthly = target / len(occurrence_dates(start_date, 'monthly', start_date, target_date))
+        if checkpoints:
+            events.append(_event(
+                profile, f"goal-{index}", checkpoints[0], f"Goal checkpoint: {name}",
+                f"Set aside ${monthly:.2f} this month to reach ${target:.2f} by {goal['target_date']}",
+                {'type': 'savings', 'amount': round(monthly, 2), 'due_date': goal['target_date'], 'notes': ''},
+                priority, recurrence(checkpoints[0], 'monthly', min(target_date.replace(hour=23, minute=59, second=59), until))
+            ))
+        if target_date <= end_date:
+            events.append(_event(
+                profile, f"goal-{index}-deadline", target_date, f"Goal deadline: {name}",
+                f"Target: ${target:.2f}",
+                {'type': 'budget_review', 'amount': target, 'due_date': goal['target_date'], 'notes': ''},
+                priority
+            ))
+    return events
+
+def write_schedule(budget_info, start_date, end_date, write):
+    """Write the financial schedule of a budget as a calendar to `write(bytes)`. Returns the number of events."""
+    writer = ICSWriter(write, new_calendar())
+    for event in schedule_events(budget_info, start_date, end_date):
+        writer.add_component(event)
+    writer.close()
+    return writer.count
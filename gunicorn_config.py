@@ -1,6 +1,7 @@
 bind = "0.0.0.0:8000"
 workers = 4
-threads = 2
+# Each open job progress stream holds a thread for up to JOB_STREAM_MAX_SECONDS
+threads = 8
 timeout = 120
 worker_class = "gthread"
 accesslog = "access.log"
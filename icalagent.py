@@ -1,86 +1,78 @@
-# Install required library:
-# pip install icalendar
-
-from icalendar import Calendar, Event
+"""Write the financial schedule of one or more budgets as iCalendar files.
+
+    python icalagent.py                                  # example budget, budget_plan.ics
+    python icalagent.py budget.json --start 2025-03-21 --years 2
+    python icalagent.py profiles.json --output schedules/
+
+A budget file holds one budget in the parse_budget_input format, or a list
+of them; a list is written as one file per budget into the --output
+directory. Paydays, bills and goal checkpoints come from
+financial_schedule, so no LLM is involved.
+"""
+import argparse
+import json
+import time
 from datetime import datetime, timedelta
-
-# Define starting payday and end date
-start_payday = datetime(2025, 3, 21)
-end_date = datetime(2026, 3, 21)
-
-# Initialize calendar
-cal = Calendar()
-cal.add('prodid', '-//Budget Plan//mxm.dk//')
-cal.add('version', '2.0')
-
-# Constants
-paycheck_amount = 1200
-child_support_day = 13
-child_support_amount = 200
-
-# Function to create event
-def create_event(date, summary, description):
-    event = Event()
-    event.add('summary', summary)
-    event.add('dtstart', date)
-    event.add('dtend', date + timedelta(hours=1))
-    event.add('description', description)
-    cal.add_component(event)
-
-# Generate events
-current_payday = start_payday
-pay_period_counter = 1
-
-while current_payday <= end_date:
-    month = current_payday.month
-
-    # Income
-    income = paycheck_amount
-    description = f'Income: ${income}\n'
-
-    # Child Support Check
-    cs_date = current_payday.replace(day=child_support_day)
-    if current_payday <= cs_date < current_payday + timedelta(days=14):
-        income += child_support_amount
-        description += f'Child Support: ${child_support_amount}\n'
-
-    # Bills
-    bills = ""
-    if 1 <= current_payday.day <= 7 or (month == 5 and pay_period_counter == 3):
-        bills += 'Rent: $1175\n'
-        spending = income - 1175
+from pathlib import Path
+
+from financial_schedule import write_schedule
+
+# The budget this script used to hard-code
+EXAMPLE_BUDGET = {
+    "starting_balance": 0,
+    "income": {"amount": 1200, "frequency": "biweekly", "next_date": "2025-03-21", "source": "Paycheck"},
+    "additional_income": [
+        {"source": "Child Support", "amount": 200, "frequency": "monthly", "next_date": "2025-04-13",
+         "category": "child_support"}
+    ],
+    "bills": [
+        {"name": "Rent", "amount": 1175, "due_date": "2025-04-01", "frequency": "monthly", "category": "housing"},
+        {"name": "Car Payment", "amount": 530, "due_date": "2025-03-15", "frequency": "monthly",
+         "category": "transportation"},
+        {"name": "CWEP", "amount": 325, "due_date": "2025-03-15", "frequency": "monthly", "category": "other"}
+    ],
+    "savings_goal": 200,
+    "emergency_fund": 0,
+    "expenses": [],
+    "financial_goals": []
+}
+
+def write_file(budget_info, start_date, end_date, path):
+    """Write one budget's schedule to `path`. Returns the number of events."""
+    with open(path, 'wb') as f:
+        return write_schedule(budget_info, start_date, end_date, f.write)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the financial schedule of budgets as iCalendar files")
+    parser.add_argument('budget', nargs='?', help="JSON file with a budget or a list of budgets (default: an example)")
+    parser.add_argument('--start', help="First day, YYYY-MM-DD (default: the example's first payday, or today)")
+    parser.add_argument('--years', type=float, default=1, help="Length of the schedule")
+    parser.add_argument('--output', help="Calendar file, or directory for a list of budgets "
+                                         "(default budget_plan.ics or schedules/)")
+    args = parser.parse_args()
+
+    if args.budget:
+        with open(args.budget) as f:
+            budgets = json.load(f)
+        default_start = datetime.now()
     else:
-        bills += 'Car Payment: $530\nCWEP (max): $325\n'
-        spending = income - 855
-
-    description += f'Bills:\n{bills}'
-
-    # Savings
-    savings_target = max(0, spending - 200)  # aiming to save at least $200 each period
-    description += f'Savings Target: ${savings_target}\n'
-
-    # Weekly Allowance
-    weekly_allowance = (spending - savings_target) // 2
-    description += f'Weekly Allowance: ${weekly_allowance} per week\n'
-
-    # Special case for 3-paycheck months
-    summary = f'Payday #{pay_period_counter}'
-    if month == 5 and pay_period_counter == 3:
-        summary += ' (Extra Check - Savings Boost!)'
-        description += '\nBonus paycheck: Save majority!'
-
-    create_event(current_payday, summary, description)
-
-    current_payday += timedelta(days=14)
-
-    # Reset monthly counter
-    if current_payday.month != month:
-        pay_period_counter = 1
+        budgets = EXAMPLE_BUDGET
+        default_start = datetime(2025, 3, 21)
+    start_date = datetime.strptime(args.start, '%Y-%m-%d') if args.start else default_start
+    end_date = start_date + timedelta(days=round(365 * args.years))
+
+    started = time.perf_counter()
+    if isinstance(budgets, list):
+        output = Path(args.output or 'schedules')
+        output.mkdir(parents=True, exist_ok=True)
+        events = sum(write_file(budget, start_date, end_date, output / f"budget_plan_{index}.ics")
+                     for index, budget in enumerate(budgets))
+        print(f"Wrote {len(budgets)} schedules with {events} events to {output}/ "
+              f"in {time.perf_counter() - started:.2f}s")
     else:
-        pay_period_counter += 1
-
-# Save to file
-with open('budget_plan.ics', 'wb') as f:
-    f.write(cal.to_ical())
+        output = args.output or 'budget_plan.ics'
+        events = write_file(budgets, start_date, end_date, output)
+        print(f"{output} has been created successfully with {events} events!")
 
-print('budget_plan.ics has been created successfully!')
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
 # Install required libraries:
 # pip install icalendar openai python-dotenv
 
-import openai
 from icalendar import Calendar, Event
 from datetime import datetime, timedelta
 import os
@@ -9,9 +8,13 @@ import re
 from dotenv import load_dotenv
 import json
 from pathlib import Path
+from llm_client import chat_completion
+from cashflow import CashFlow, weekly_amount
+from ics_writer import ICSWriter
+from plan_event import parse_duration
+from scheduler import pack_day, work_blocks
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # Initialize calendar
 cal = Calendar()
@@ -21,13 +24,6 @@ cal.add('version', '2.0')
 # Maximum date range (6 months)
 MAX_DATE_RANGE = timedelta(days=180)
 
-# Default time slots for different types of activities
-TIME_SLOTS = {
-    "morning": {"start": "07:00", "end": "12:00"},
-    "afternoon": {"start": "12:00", "end": "17:00"},
-    "evening": {"start": "17:00", "end": "22:00"}
-}
-
 def get_valid_date(prompt):
     while True:
         try:
@@ -70,7 +66,7 @@ def parse_budget_input(user_input):
     """
     
     try:
-        response = openai.chat.completions.create(
+        response_text = chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are a financial information parser. Return only valid JSON, no additional text."},
@@ -78,8 +74,7 @@ def parse_budget_input(user_input):
             ],
             max_tokens=1000,
             temperature=0.3
-        )
-        response_text = response.choices[0].message.content.strip()
+        ).strip()
         response_text = re.sub(r'```json\s*|\s*```', '', response_text)
         return json.loads(response_text)
     except Exception as e:
@@ -112,7 +107,7 @@ def parse_activity_goals(user_input):
     """
     
     try:
-        response = openai.chat.completions.create(
+        response_text = chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are an activity goals parser. Return only valid JSON, no additional text."},
@@ -120,8 +115,7 @@ def parse_activity_goals(user_input):
             ],
             max_tokens=1000,
             temperature=0.3
-        )
-        response_text = response.choices[0].message.content.strip()
+        ).strip()
         response_text = re.sub(r'```json\s*|\s*```', '', response_text)
         return json.loads(response_text)
     except Exception as e:
@@ -132,28 +126,16 @@ def parse_budget_info(budget_info):
     """Parse budget information into a structured format."""
     try:
         # Calculate weekly income
-        weekly_income = budget_info['income']['amount']
-        if budget_info['income']['frequency'] == 'monthly':
-            weekly_income = budget_info['income']['amount'] / 4
-        elif budget_info['income']['frequency'] == 'biweekly':
-            weekly_income = budget_info['income']['amount'] / 2
+        income_frequency = budget_info['income']['frequency']
+        weekly_income = weekly_amount(budget_info['income']['amount'], income_frequency)
 
-        # Calculate weekly expenses
+        # Calculate weekly expenses, each at its own frequency (monthly unless given)
         weekly_expenses = {}
         for expense in budget_info['expenses']:
-            amount = expense['amount']
-            if budget_info['income']['frequency'] == 'monthly':
-                amount = amount / 4
-            elif budget_info['income']['frequency'] == 'biweekly':
-                amount = amount / 2
-            weekly_expenses[expense['name']] = amount
-
-        # Calculate savings goals
-        weekly_savings = budget_info['savings_goal']
-        if budget_info['income']['frequency'] == 'monthly':
-            weekly_savings = budget_info['savings_goal'] / 4
-        elif budget_info['income']['frequency'] == 'biweekly':
-            weekly_savings = budget_info['savings_goal'] / 2
+            weekly_expenses[expense['name']] = weekly_amount(expense['amount'], expense.get('frequency', 'monthly'))
+
+        # Calculate savings goals, set aside once per pay period
+        weekly_savings = weekly_amount(budget_info['savings_goal'], income_frequency)
 
         # Calculate discretionary spending
         total_weekly_expenses = sum(weekly_expenses.values())
@@ -266,43 +248,34 @@ def generate_workout_suggestions(workout_preferences):
         print(f"Error generating workout suggestions: {e}")
         return None
 
-def is_work_time(date, work_schedule):
-    """Check if a given date and time falls within work hours."""
-    if not work_schedule:
-        return False
-        
-    day_name = date.strftime('%A').lower()
-    if day_name not in work_schedule['days']:
-        return False
-        
-    work_start = datetime.strptime(work_schedule['start_time'], '%H:%M').time()
-    work_end = datetime.strptime(work_schedule['end_time'], '%H:%M').time()
-    event_time = date.time()
-    
-    return work_start <= event_time <= work_end
-
-def find_available_time(date, duration_hours, work_schedule):
-    """Find an available time slot that doesn't conflict with work hours."""
-    # Try morning slot (7 AM)
-    morning_time = date.replace(hour=7, minute=0)
-    if not is_work_time(morning_time, work_schedule) and not is_work_time(morning_time + timedelta(hours=duration_hours), work_schedule):
-        return morning_time
-        
-    # Try lunch slot (12 PM)
-    lunch_time = date.replace(hour=12, minute=0)
-    if not is_work_time(lunch_time, work_schedule) and not is_work_time(lunch_time + timedelta(hours=duration_hours), work_schedule):
-        return lunch_time
-        
-    # Try evening slot (18 PM)
-    evening_time = date.replace(hour=18, minute=0)
-    if not is_work_time(evening_time, work_schedule) and not is_work_time(evening_time + timedelta(hours=duration_hours), work_schedule):
-        return evening_time
-        
-    # If no slots available, return None
-    return None
+def is_work_day(date, work_schedule):
+    """Check if a given date is one of the work schedule's days."""
+    return bool(work_schedule) and date.strftime('%A').lower() in work_schedule.get('days', [])
+
+def activity_minutes(duration):
+    """Return the minutes of an activity goal's duration ('30' minutes, or '1h' / '30m')."""
+    duration = str(duration)
+    return int(duration) if duration.isdigit() else parse_duration(duration)
 
-def generate_daily_plan(budget_info, activity_goals, date):
-    """Generate a detailed daily plan with financial analysis and workout suggestions."""
+def find_available_times(date, requests, work_schedule):
+    """Place the day's (duration minutes, preferred time) requests around work hours.
+
+    Returns a start datetime per request; activities are packed into free
+    time instead of all landing on the same slot.
+    """
+    blocked = work_blocks(work_schedule) if is_work_day(date, work_schedule) else []
+    starts = pack_day([(None, minutes, 5, preferred) for minutes, preferred in requests], blocked)
+    midnight = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [midnight + timedelta(minutes=start) for start in starts]
+
+def prepare_plan(budget_info, activity_goals, start_date=None, end_date=None):
+    """Derive everything a plan needs that doesn't depend on the day.
+
+    The budget analysis, the daily financial figures, the workout template
+    and the valid activity goals are the same for every day of a run, so
+    they are computed once here instead of once per day. Given the range,
+    the balance of every day is projected once as well.
+    """
     try:
         # Parse budget information
         budget_analysis = parse_budget_info(budget_info)
@@ -316,9 +289,15 @@ def generate_daily_plan(budget_info, activity_goals, date):
             print("Failed to generate workout suggestions")
             return None
 
-        # Create daily plan
-        daily_plan = {
-            'date': date,
+        goals = []
+        for goal in activity_goals.get('goals', []):
+            # Skip if goal is missing required fields
+            if not all(key in goal for key in ['title', 'duration']):
+                print(f"Skipping goal due to missing required fields: {goal}")
+                continue
+            goals.append(goal)
+
+        return {
             'work_schedule': budget_info.get('work_schedule'),
             'financial_analysis': {
                 'daily_budget': budget_analysis['weekly_income'] / 7,
@@ -331,18 +310,40 @@ def generate_daily_plan(budget_info, activity_goals, date):
                 }
             },
             'workout_plan': workout_plan,
+            'goals': goals,
+            'cashflow': CashFlow(budget_info, start_date, end_date) if start_date and end_date else None
+        }
+    except Exception as e:
+        print(f"Error preparing plan: {str(e)}")
+        return None
+
+def generate_daily_plan(budget_info, activity_goals, date, prepared=None):
+    """Generate a detailed daily plan with financial analysis and workout suggestions.
+
+    `prepared` is the result of prepare_plan() for the same inputs; it is
+    computed here when not given.
+    """
+    try:
+        prepared = prepared or prepare_plan(budget_info, activity_goals)
+        if not prepared:
+            return None
+
+        # Create daily plan
+        daily_plan = {
+            'date': date,
+            'work_schedule': prepared['work_schedule'],
+            'financial_analysis': prepared['financial_analysis'],
+            'workout_plan': prepared['workout_plan'],
             'activity_schedule': []
         }
+        cashflow = prepared.get('cashflow')
+        if cashflow and cashflow.index(date) is not None:
+            daily_plan['financial_analysis'] = dict(prepared['financial_analysis'],
+                                                    expected_balance=cashflow.summary(date)['expected_balance'])
 
         # Add activities based on goals
-        goals = activity_goals.get('goals', [])
-        for goal in goals:
+        for goal in prepared['goals']:
             try:
-                # Skip if goal is missing required fields
-                if not all(key in goal for key in ['title', 'duration']):
-                    print(f"Skipping goal due to missing required fields: {goal}")
-                    continue
-
                 # Determine if this goal should be added today
                 should_add = False
                 if goal.get('frequency') == 'daily':
@@ -366,6 +367,15 @@ def generate_daily_plan(budget_info, activity_goals, date):
         print(f"Error generating daily plan: {str(e)}")
         return None
 
+def iter_daily_plans(start_date, end_date, budget_info, activity_goals, prepared):
+    """Yield the daily plan of each day from `start_date` to `end_date`, one day at a time."""
+    current_date = start_date
+    while current_date <= end_date:
+        daily_plan = generate_daily_plan(budget_info, activity_goals, current_date, prepared)
+        if daily_plan:
+            yield daily_plan
+        current_date += timedelta(days=1)
+
 def create_event(date, time_str, summary, description, duration_str):
     event = Event()
     
@@ -411,30 +421,40 @@ def gpt_format_details(financial_info):
     Keep the response concise and focused on key points.
     """
     try:
-        response = openai.chat.completions.create(
+        return chat_completion(
             model="gpt-3.5-turbo",  # Using 3.5 for faster response
             messages=[{"role": "user", "content": prompt}],
             max_tokens=500,  # Reduced token count
             temperature=0.4
         )
-        return response.choices[0].message.content
     except Exception as e:
         print(f"Warning: Error generating financial advice: {str(e)}")
         return "Unable to generate financial advice at this time."
 
-def create_calendar_events(plans):
-    """Create calendar events with detailed descriptions."""
+def new_calendar():
+    """Return an empty calendar with this planner's properties."""
+    calendar = Calendar()
+    calendar.add('prodid', '-//AI Life & Budget Planner//EN')
+    calendar.add('version', '2.0')
+    return calendar
+
+def create_calendar_events(plans, calendar=None):
+    """Create calendar events with detailed descriptions.
+
+    Events are added to `calendar` (a new Calendar by default), which may be
+    an ics_writer.ICSWriter to write each day's events out as the plans
+    iterable produces them. Returns the calendar, or None on failure.
+    """
     try:
-        calendar = Calendar()
-        calendar.add('prodid', '-//AI Life & Budget Planner//EN')
-        calendar.add('version', '2.0')
+        if calendar is None:
+            calendar = new_calendar()
         
         for plan in plans:
             date = plan["date"]
             work_schedule = plan.get("work_schedule", None)
             
             # Add work event if it's a work day
-            if work_schedule and date.strftime('%A').lower() in work_schedule['days']:
+            if is_work_day(date, work_schedule):
                 work_start = datetime.strptime(work_schedule['start_time'], '%H:%M').time()
                 work_end = datetime.strptime(work_schedule['end_time'], '%H:%M').time()
                 
@@ -445,8 +465,14 @@ def create_calendar_events(plans):
                 event.add('description', 'Work hours')
                 calendar.add_component(event)
             
+            # Place the financial summary (30 minutes), workout (1 hour) and activities around work
+            activities = plan["activity_schedule"]
+            times = find_available_times(date, [(30, 'morning'), (60, 'morning')] +
+                                         [(activity_minutes(activity['duration']), None) for activity in activities],
+                                         work_schedule)
+            financial_time, workout_time = times[:2]
+
             # Add financial summary event
-            financial_time = find_available_time(date, 0.5, work_schedule)  # 30 minutes
             if financial_time:
                 financial_summary = f"""
 Financial Summary for {date.strftime("%B %d, %Y")}:
@@ -454,7 +480,10 @@ Financial Summary for {date.strftime("%B %d, %Y")}:
 • Daily Expenses: ${plan["financial_analysis"]["daily_expenses"]:.2f}
 • Daily Savings: ${plan["financial_analysis"]["daily_savings"]:.2f}
 • Discretionary Spending: ${plan["financial_analysis"]["discretionary_spending"]:.2f}
-
+"""
+                if 'expected_balance' in plan["financial_analysis"]:
+                    financial_summary += f"• Projected Balance: ${plan['financial_analysis']['expected_balance']:.2f}\n"
+                financial_summary += f"""
 Progress Towards Goals:
 • Emergency Fund: {plan["financial_analysis"]["progress_towards_goals"]["emergency_fund"]*100:.1f}%
 """
@@ -469,7 +498,6 @@ Progress Towards Goals:
                 calendar.add_component(event)
 
             # Add workout event
-            workout_time = find_available_time(date, 1, work_schedule)  # 1 hour
             if workout_time:
                 workout = plan["workout_plan"]
                 workout_description = f"""
@@ -492,13 +520,12 @@ Cooldown:
                 calendar.add_component(event)
 
             # Add other activities
-            for activity in plan["activity_schedule"]:
-                activity_time = find_available_time(date, 1, work_schedule)  # Default 1 hour
+            for activity, activity_time in zip(activities, times[2:]):
                 if activity_time:
                     event = Event()
                     event.add('summary', activity["title"])
                     event.add('dtstart', activity_time)
-                    event.add('dtend', activity_time + timedelta(hours=1))
+                    event.add('dtend', activity_time + timedelta(minutes=activity_minutes(activity['duration'])))
                     event.add('description', f"Duration: {activity['duration']} minutes")
                     calendar.add_component(event)
 
@@ -508,29 +535,32 @@ Cooldown:
         return None
 
 def generate_plan(start_date, end_date, budget_info, activity_goals):
-    """Generate a complete plan for the specified date range."""
-    try:
-        plans = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            daily_plan = generate_daily_plan(budget_info, activity_goals, current_date)
-            if daily_plan:
-                plans.append(daily_plan)
-            current_date += timedelta(days=1)
+    """Generate a complete plan for the specified date range.
 
-        if not plans:
+    The day-independent parts of the plan are prepared once; each day's
+    plan is then turned into events and written to the calendar file as it
+    is generated, so no per-day state is kept for the whole range.
+    """
+    try:
+        prepared = prepare_plan(budget_info, activity_goals, start_date, end_date)
+        if not prepared:
             print("No plans were generated")
             return None
 
-        calendar = create_calendar_events(plans)
-        if not calendar:
+        # Write to a temporary file so a failed run leaves the previous calendar in place
+        path = Path('static/calendar.ics')
+        tmp_path = Path(f"{path}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            writer = ICSWriter(f.write, new_calendar())
+            calendar = create_calendar_events(iter_daily_plans(start_date, end_date, budget_info, activity_goals, prepared),
+                                              writer)
+            if calendar:
+                writer.close()
+        if not calendar or not writer.count:
+            tmp_path.unlink(missing_ok=True)
             print("Failed to create calendar events")
             return None
-
-        # Save the calendar to a file
-        with open('static/calendar.ics', 'wb') as f:
-            f.write(calendar.to_ical())
+        os.replace(tmp_path, path)
         
         print("Calendar file generated successfully")
         return True
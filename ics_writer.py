@@ -0,0 +1,94 @@
+"""Incremental iCalendar serialization.
+
+Calendar.to_ical() renders the whole document into one bytes object, so
+memory grows with the number of events and nothing can be sent until the
+last event exists. ICSWriter writes the VCALENDAR header up front, each
+component as soon as it is added, and the footer on close. Output goes to
+any `write(bytes)` callable: a file, an HTTP response queue, or both.
+
+split_calendar() goes the other way for merging: it cuts a serialized
+calendar into its header and the raw bytes of each component, so unchanged
+components can be copied through without being parsed and re-rendered.
+"""
+from perf import stage
+
+CALENDAR_FOOTER = b"END:VCALENDAR\r\n"
+COMPONENT_TYPES = (b"VEVENT", b"VTODO", b"VJOURNAL", b"VTIMEZONE")
+
+def calendar_header(cal):
+    """Return the opening lines of `cal`: BEGIN:VCALENDAR and its own properties."""
+    # Render the calendar without its components and cut off the closing line
+    envelope = cal.__class__()
+    for name, value in cal.items():
+        envelope[name] = value
+    return envelope.to_ical()[:-len(CALENDAR_FOOTER)]
+
+class ICSWriter:
+    """Write a calendar one component at a time.
+
+    Takes the calendar whose properties (PRODID, VERSION, ...) form the
+    header. Has the same add_component() method as Calendar, so code that
+    builds a calendar can write to a file or stream instead.
+    """
+
+    def __init__(self, write, cal):
+        self.write = write
+        self.count = 0
+        self.write(calendar_header(cal))
+
+    def add_component(self, component):
+        with stage('to_ical'):
+            data = component.to_ical()
+        with stage('file_write'):
+            self.write(data)
+        self.count += 1
+
+    def close(self):
+        self.write(CALENDAR_FOOTER)
+
+def write_calendar(cal, write):
+    """Write an existing calendar component by component rather than as one bytes object."""
+    writer = ICSWriter(write, cal)
+    for component in cal.subcomponents:
+        writer.add_component(component)
+    writer.close()
+    return writer.count
+
+def split_calendar(data):
+    """Split serialized calendar bytes into (header, [component bytes]).
+
+    The header is everything before the first component; each component is
+    its raw BEGIN..END block including the trailing line break.
+    """
+    header = []
+    components = []
+    current = None
+    for line in data.splitlines(keepends=True):
+        if current is None:
+            if line.startswith(b"BEGIN:") and line[6:].strip() in COMPONENT_TYPES:
+                current = [line]
+            elif not components and line.strip() != CALENDAR_FOOTER.strip():
+                header.append(line)
+            continue
+        current.append(line)
+        if line.startswith(b"END:") and line[4:].strip() == current[0][6:].strip():
+            components.append(b"".join(current))
+            current = None
+    return b"".join(header), components
+
+def component_lines(component):
+    """Yield (name, raw value) for each of a serialized component's own property lines."""
+    unfolded = component.replace(b"\r\n ", b"").replace(b"\r\n\t", b"").decode('utf-8')
+    for line in unfolded.splitlines()[1:-1]:
+        name, _, value = line.partition(':')
+        name = name.split(';', 1)[0].upper()
+        if name == 'BEGIN':
+            break  # Nested components (alarms) don't describe the event itself
+        yield name, value
+
+def component_properties(component):
+    """Return {name: raw value} of a serialized component's own properties (first value wins)."""
+    properties = {}
+    for name, value in component_lines(component):
+        properties.setdefault(name, value)
+    return properties
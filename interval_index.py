@@ -0,0 +1,77 @@
+"""Conflict index for events on a timeline of integer minutes.
+
+Events are placed as half-open intervals [start, end) of minutes. Within a
+day that is minutes since midnight; for a longer span any integer timeline
+works, such as minutes since the start of a date range, or week_minutes()
+for events that repeat on weekdays. On such a timeline an event running
+past midnight conflicts with the next morning.
+"""
+from bisect import bisect_right
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+def week_minutes(weekday, minute=0):
+    """Return `minute` of `weekday` (0 = Monday) on a timeline of one repeating week."""
+    return weekday * MINUTES_PER_DAY + minute
+
+def cyclic_intervals(start, end, period=MINUTES_PER_WEEK):
+    """Split [start, end) at the end of a repeating `period` so both parts fall inside it."""
+    if end <= period:
+        return [(start, end)]
+    return [(start, period), (0, min(end - period, start))]
+
+class IntervalIndex:
+    """Non-overlapping intervals of minutes, kept sorted by start.
+
+    Accepted intervals never overlap, so a new interval can only conflict
+    with its neighbours in start order: a check is one bisection instead of
+    a comparison with every accepted event, and an insert is a bisection
+    plus a list insert.
+    """
+    __slots__ = ('_starts', '_ends')
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        return zip(self._starts, self._ends)
+
+    def conflicts(self, start, end):
+        """Check whether [start, end) overlaps an accepted interval."""
+        index = bisect_right(self._starts, start)
+        if index and self._ends[index - 1] > start:
+            return True
+        return index < len(self._starts) and self._starts[index] < end
+
+    def add(self, start, end):
+        """Accept [start, end) unless it conflicts. Returns whether it was accepted."""
+        return self.add_all([(start, end)])
+
+    def add_all(self, intervals):
+        """Accept all of the given (mutually disjoint) intervals, or none of them if any conflicts."""
+        intervals = list(intervals)
+        if any(self.conflicts(start, end) for start, end in intervals):
+            return False
+        for start, end in intervals:
+            index = bisect_right(self._starts, start)
+            self._starts.insert(index, start)
+            self._ends.insert(index, end)
+        return True
+
+    def first_free(self, start, end, length):
+        """Return the earliest minute >= `start` at which `length` free minutes end by `end`, or None."""
+        index = bisect_right(self._starts, start)
+        candidate = start
+        if index and self._ends[index - 1] > candidate:
+            candidate = self._ends[index - 1]
+        while candidate + length <= end:
+            if index == len(self._starts) or self._starts[index] >= candidate + length:
+                return candidate
+            candidate = max(candidate, self._ends[index])
+            index += 1
+        return None
@@ -0,0 +1,166 @@
+"""Background jobs for plan and brain-dump generation.
+
+Submitting a job returns its id immediately while the work runs on a
+process-wide executor. Job state is kept in one JSON file per job, so any
+gunicorn worker can answer a status request for a job started by another.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+
+# Number of jobs a worker process runs at the same time
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Seconds a progress stream waits for a running job without news before giving up
+JOB_STREAM_IDLE_TIMEOUT = int(os.getenv("JOB_STREAM_IDLE_TIMEOUT", "300"))
+
+# Seconds a progress stream stays open; each one holds a server thread, so past this the
+# client is told to poll the job status instead
+JOB_STREAM_MAX_SECONDS = int(os.getenv("JOB_STREAM_MAX_SECONDS", "120"))
+
+# Seconds without progress after which a stream sends a keepalive, so proxies don't close it
+JOB_STREAM_KEEPALIVE = int(os.getenv("JOB_STREAM_KEEPALIVE", "15"))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='plan-job')
+_lock = threading.Lock()
+
+def _job_path(job_id):
+    return Path(JOBS_DIR) / f"{job_id}.json"
+
+def _events_path(job_id):
+    return Path(JOBS_DIR) / f"{job_id}.events"
+
+def _write_job(job):
+    # Write to a temporary file first so readers never see a partial file
+    path = _job_path(job['id'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+def get_job(job_id):
+    """Return the state of a job, or None if it does not exist."""
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id or ''):
+        return None
+    try:
+        with open(_job_path(job_id), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _update_job(job_id, **changes):
+    with _lock:
+        job = get_job(job_id)
+        job.update(changes)
+        _write_job(job)
+        return job
+
+def _run_job(job_id, func, args, kwargs):
+    _update_job(job_id, status='running', started_at=time.time())
+
+    def progress(days, info=None):
+        with _lock:
+            job = get_job(job_id)
+            job['days_completed'] = min(job['days_completed'] + days, job['days_total'])
+            _write_job(job)
+            if info is not None:
+                # One JSON line per completed day, read back by iter_job_events
+                record = dict(info, days_completed=job['days_completed'], days_total=job['days_total'])
+                with open(_events_path(job_id), 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+
+    try:
+        artifact_url = func(*args, job_id=job_id, progress=progress, **kwargs)
+        if artifact_url:
+            job = get_job(job_id)
+            _update_job(job_id, status='done', days_completed=job['days_total'],
+                        artifact_url=artifact_url, finished_at=time.time())
+        else:
+            _update_job(job_id, status='error', error='Failed to generate calendar', finished_at=time.time())
+    except Exception as e:
+        print(f"Error running job {job_id}: {str(e)}")
+        _update_job(job_id, status='error', error=str(e), finished_at=time.time())
+
+def submit_job(kind, days_total, func, *args, **kwargs):
+    """Queue `func` to run in the background and return the new job.
+
+    `func` is called with the given arguments plus `job_id` and a
+    `progress(days, info=None)` callback, and returns the URL of the
+    generated artifact, or None on failure.
+    """
+    job = {
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'status': 'queued',
+        'days_completed': 0,
+        'days_total': days_total,
+        'artifact_url': None,
+        'error': None,
+        'created_at': time.time(),
+        'started_at': None,
+        'finished_at': None
+    }
+    _write_job(job)
+    _executor.submit(_run_job, job['id'], func, args, kwargs)
+    return job
+
+def iter_job_events(job_id, poll_interval=0.5):
+    """Yield (event, data) pairs for a job's progress until it finishes.
+
+    Every completed day is yielded as a 'day' event, followed by a final
+    'done' or 'error' event with the job state. Days completed before the
+    call are replayed first, so a client can connect at any time. A
+    'keepalive' event (with no data) is yielded after JOB_STREAM_KEEPALIVE
+    seconds without news, and after JOB_STREAM_MAX_SECONDS the stream ends
+    with a 'poll' event with the job state, telling the client to poll
+    the job's status instead.
+    """
+    offset = 0
+    started = idle_since = last_sent = time.time()
+    while True:
+        job = get_job(job_id)
+        if job is None:
+            yield 'error', {'error': 'Job not found'}
+            return
+
+        lines = []
+        try:
+            with open(_events_path(job_id), 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+            # Only consume complete lines; a partial line is read next time
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            offset += len(complete)
+            lines = complete.decode('utf-8').splitlines()
+        except OSError:
+            pass
+
+        for line in lines:
+            yield 'day', json.loads(line)
+
+        if job['status'] in ('done', 'error') and not lines:
+            yield job['status'], job
+            return
+
+        now = time.time()
+        if lines:
+            idle_since = last_sent = now
+        elif now - idle_since > JOB_STREAM_IDLE_TIMEOUT:
+            yield 'error', dict(job, error='Timed out waiting for progress')
+            return
+        if now - started > JOB_STREAM_MAX_SECONDS:
+            yield 'poll', job
+            return
+        if now - last_sent > JOB_STREAM_KEEPALIVE:
+            yield 'keepalive', None
+            last_sent = now
+        if not lines:
+            time.sleep(poll_interval)
@@ -0,0 +1,172 @@
+"""Disk-backed cache for OpenAI chat completions.
+
+Responses are stored in a SQLite database keyed by a hash of the model,
+normalized messages, temperature and max_tokens. The database file is shared
+by every gunicorn worker, so re-submitting a form or regenerating the same
+range is answered from disk instead of the network.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from llm_client import chat_completion
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3")
+
+# Entries older than this are treated as misses (default 7 days)
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Total size of cached responses; least recently used entries are evicted past it
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+_local = threading.local()
+
+def _connect():
+    """Return this thread's connection to the cache database."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        Path(LLM_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(LLM_CACHE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        _local.conn = conn
+    return conn
+
+def _count(conn, name, amount=1):
+    conn.execute(
+        "INSERT INTO stats (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
+def normalize_messages(messages):
+    """Strip per-line indentation and surrounding whitespace from message contents."""
+    return [
+        {
+            "role": message["role"],
+            "content": "\n".join(line.strip() for line in message["content"].strip().splitlines())
+        }
+        for message in messages
+    ]
+
+def cache_key(model, messages, temperature, max_tokens):
+    """Return the content hash identifying a chat completion request."""
+    payload = json.dumps({
+        "model": model,
+        "messages": normalize_messages(messages),
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _is_json(response_text):
+    try:
+        json.loads(re.sub(r'```json\s*|\s*```', '', response_text.strip()))
+        return True
+    except ValueError:
+        return False
+
+def _get(key):
+    conn = _connect()
+    row = conn.execute("SELECT response, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        _count(conn, 'misses')
+        return None
+
+    response_text, created_at = row
+    now = time.time()
+    if now - created_at > LLM_CACHE_TTL:
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        _count(conn, 'expired')
+        _count(conn, 'misses')
+        return None
+
+    conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+    _count(conn, 'hits')
+    return response_text
+
+def _put(key, response_text):
+    conn = _connect()
+    now = time.time()
+    size = len(response_text.encode('utf-8'))
+    conn.execute(
+        "INSERT OR REPLACE INTO entries (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+        (key, response_text, size, now, now)
+    )
+
+    # Evict least recently used entries until the cache fits its size limit
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= LLM_CACHE_MAX_BYTES:
+        return
+    evicted = []
+    for old_key, old_size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+        if total <= LLM_CACHE_MAX_BYTES:
+            break
+        evicted.append((old_key,))
+        total -= old_size
+    conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+    _count(conn, 'evictions', len(evicted))
+
+def cached_chat_completion(model, messages, max_tokens, temperature, refresh=False):
+    """Return the response text of a chat completion, from the cache when possible.
+
+    Only responses that parse as JSON are stored, so a malformed reply is
+    requested again next time instead of being replayed. With `refresh` the
+    cached entry is ignored and replaced by the new response.
+    """
+    key = None
+    if LLM_CACHE_ENABLED:
+        try:
+            key = cache_key(model, messages, temperature, max_tokens)
+            cached = None if refresh else _get(key)
+            if cached is not None:
+                return cached
+        except sqlite3.Error as e:
+            print(f"Warning: LLM cache lookup failed: {str(e)}")
+            key = None
+
+    response_text = chat_completion(model, messages, max_tokens, temperature)
+
+    if key and _is_json(response_text):
+        try:
+            _put(key, response_text)
+        except sqlite3.Error as e:
+            print(f"Warning: LLM cache write failed: {str(e)}")
+    return response_text
+
+def get_cache_stats():
+    """Return the hit/miss counters and current size of the cache."""
+    conn = _connect()
+    stats = {name: value for name, value in conn.execute("SELECT name, value FROM stats")}
+    entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+    hits = stats.get('hits', 0)
+    misses = stats.get('misses', 0)
+    return {
+        'enabled': LLM_CACHE_ENABLED,
+        'hits': hits,
+        'misses': misses,
+        'expired': stats.get('expired', 0),
+        'evictions': stats.get('evictions', 0),
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        'entries': entries,
+        'size_bytes': size,
+        'max_bytes': LLM_CACHE_MAX_BYTES,
+        'ttl_seconds': LLM_CACHE_TTL
+    }
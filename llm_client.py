@@ -0,0 +1,220 @@
+"""Shared OpenAI client used by every module that calls chat completions.
+
+One pooled client keeps connections alive across calls. Each call gets a
+timeout and is retried with exponential backoff and jitter on rate limits,
+timeouts, connection errors and server errors. A process-wide token bucket
+keeps requests and tokens per minute under the account limits, and a
+circuit breaker fails fast while the API keeps failing instead of piling
+up retries.
+"""
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+
+from perf import stage
+
+# Seconds before a single request is abandoned
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Retries after the first attempt, and the backoff between them in seconds
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+
+# Process-wide rate limits
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "160000"))
+
+# Keep-alive connection pool size
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+# Consecutive failures that open the circuit, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Errors worth retrying; anything else (bad request, auth) fails immediately
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously up to `per_minute` tokens."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available, then take them."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """Open after `threshold` consecutive failures; let one probe through after `cooldown` seconds."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if self.probing or time.monotonic() - self.opened_at >= self.cooldown else 'open'
+
+    def before_call(self):
+        """Raise CircuitOpenError while open; return True if this call is the half-open probe."""
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+                raise CircuitOpenError("OpenAI circuit breaker is open")
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self, probe):
+        """End a call; a probe that recorded neither success nor failure reopens the circuit for another cooldown."""
+        with self.lock:
+            if probe and self.probing:
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+_client = None
+_client_lock = threading.Lock()
+_request_bucket = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+_token_bucket = TokenBucket(LLM_TOKENS_PER_MINUTE)
+_breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+_stats = {'requests': 0, 'retries': 0, 'failures': 0, 'short_circuited': 0}
+_stats_lock = threading.Lock()
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def get_client():
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = openai.OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                timeout=LLM_TIMEOUT,
+                max_retries=0,  # Retries are handled here, with the breaker and limiter
+                http_client=httpx.Client(
+                    timeout=LLM_TIMEOUT,
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_CONNECTIONS
+                    )
+                )
+            )
+        return _client
+
+def estimate_tokens(messages, max_tokens):
+    """Rough token count of a request: ~4 characters per prompt token plus the completion budget."""
+    return sum(len(message['content']) for message in messages) // 4 + max_tokens
+
+def _backoff_delay(attempt, error):
+    # Honour the server's Retry-After when it sends one
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        if retry_after:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+    except ValueError:
+        pass
+    # Full jitter: a random delay up to the exponential backoff
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+def chat_completion(model, messages, max_tokens, temperature, timeout=None):
+    """Return the response text of a chat completion request."""
+    client = get_client()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            probe = _breaker.before_call()
+        except CircuitOpenError:
+            _count('short_circuited')
+            raise
+        try:
+            _request_bucket.acquire()
+            _token_bucket.acquire(estimate_tokens(messages, max_tokens))
+            _count('requests')
+            with stage('llm'):
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=timeout or LLM_TIMEOUT
+                )
+        except RETRYABLE_ERRORS as e:
+            _breaker.record_failure()
+            if attempt == LLM_MAX_RETRIES:
+                _count('failures')
+                raise
+            delay = _backoff_delay(attempt, e)
+            print(f"Warning: OpenAI request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            _count('retries')
+            time.sleep(delay)
+            continue
+        except openai.APIError:
+            # The API answered, so it is up; client errors don't trip the breaker
+            _breaker.record_success()
+            _count('failures')
+            raise
+        except Exception:
+            _count('failures')
+            raise
+        else:
+            _breaker.record_success()
+        finally:
+            # Whatever else was raised, a probe must not leave the breaker half-open for good
+            _breaker.release(probe)
+        return response.choices[0].message.content
+
+def get_client_stats():
+    """Return request/retry/failure counters and the circuit breaker state."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['breaker_state'] = _breaker.state
+    return stats
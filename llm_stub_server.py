@@ -0,0 +1,347 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Serves POST /v1/chat/completions so the planner can be run, benchmarked and
+load-tested offline. Point the app at it with
+
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python app.py
+
+Modes:
+    replay  answer from a recorded fixture when one exists, otherwise
+            synthesize a schema-valid response for the prompt (default)
+    record  forward the request to the real API and save the response as a
+            fixture for later replays
+    synth   always synthesize
+
+Fixtures are keyed with llm_cache.cache_key, so a fixture matches exactly
+the requests the cache would treat as identical. Latency and error
+injection are configurable, and every random choice is seeded from the
+request, so runs are reproducible.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+from llm_cache import cache_key
+
+DEFAULT_OPTIONS = {
+    'mode': 'replay',
+    'fixtures_dir': 'fixtures/llm',
+    'latency_ms': 0,
+    'jitter_ms': 0,
+    'error_rate': 0.0,
+    'error_status': 429,
+    'seed': 0,
+    'upstream': 'https://api.openai.com/v1',
+    'api_key': None
+}
+
+ACTIVITIES = [
+    ("Morning Workout", "workout", 60),
+    ("Breakfast", "meal", 30),
+    ("Study Session", "learning", 60),
+    ("Lunch", "meal", 45),
+    ("Guitar Practice", "hobby", 30),
+    ("Dinner", "meal", 45),
+    ("Evening Reading", "learning", 30),
+    ("Family Time", "other", 60)
+]
+
+FINANCIAL_TASKS = [
+    ("Budget Review", "budget_review"),
+    ("Pay Bills", "bill_payment"),
+    ("Savings Transfer", "savings"),
+    ("Track Expenses", "expense")
+]
+
+def _format_duration(minutes):
+    return f"{minutes // 60}h" if minutes % 60 == 0 else f"{minutes}m"
+
+def _spread_events(rng, activities, start_hour=6, end_hour=22):
+    """Lay out activities one after another with random gaps, never overlapping."""
+    events = []
+    cursor = start_hour * 60 + rng.choice([0, 15, 30])
+    for title, category, minutes in activities:
+        if cursor + minutes > end_hour * 60:
+            break
+        events.append({
+            "title": title,
+            "time": f"{cursor // 60:02d}:{cursor % 60:02d}",
+            "duration": _format_duration(minutes),
+            "description": f"{title} as planned for the day.",
+            "category": category,
+            "priority": rng.choice(["high", "medium", "low"])
+        })
+        cursor += minutes + rng.choice([15, 30, 45, 60])
+    return events
+
+def synth_budget(rng):
+    return {
+        "starting_balance": float(rng.randrange(500, 5000, 50)),
+        "income": {"amount": 2400.0, "frequency": "biweekly", "next_date": "2025-01-10", "source": "Employer"},
+        "bills": [
+            {"name": "Rent", "amount": 1200.0, "due_date": "2025-01-01", "frequency": "monthly", "category": "housing"},
+            {"name": "Car Payment", "amount": 350.0, "due_date": "2025-01-15", "frequency": "monthly", "category": "transportation"},
+            {"name": "Phone", "amount": 60.0, "due_date": "2025-01-20", "frequency": "monthly", "category": "utilities"}
+        ],
+        "savings_goal": 5000.0,
+        "emergency_fund": 10000.0,
+        "additional_income": [
+            {"source": "Freelance", "amount": 300.0, "frequency": "monthly", "next_date": "2025-01-25", "category": "freelance"}
+        ],
+        "expenses": [
+            {"name": "Groceries", "amount": 400.0, "frequency": "monthly", "category": "groceries"},
+            {"name": "Entertainment", "amount": 100.0, "frequency": "monthly", "category": "entertainment"}
+        ],
+        "financial_goals": [
+            {"name": "Emergency Fund", "target_amount": 10000.0, "target_date": "2025-12-31", "priority": "high"}
+        ]
+    }
+
+def synth_activity_goals(rng):
+    return {
+        "goals": [
+            {"type": "workout", "frequency": "specific_days", "days": ["monday", "wednesday", "friday"],
+             "details": "Strength training", "duration": "1h", "preferred_time": "morning", "category": "health",
+             "priority": "high", "dependencies": [], "notes": ""},
+            {"type": "learning", "frequency": "daily", "days": [], "details": "Read for 30 minutes",
+             "duration": "30m", "preferred_time": "evening", "category": "education", "priority": "medium",
+             "dependencies": [], "notes": ""},
+            {"type": "hobby", "frequency": "weekly", "days": ["saturday"], "details": "Guitar practice",
+             "duration": "1h", "preferred_time": "afternoon", "category": "personal", "priority": "low",
+             "dependencies": [], "notes": ""}
+        ],
+        "preferences": {
+            "meal_times": ["breakfast", "lunch", "dinner"],
+            "workout_times": ["morning"],
+            "other_preferences": "",
+            "free_time_activities": [],
+            "constraints": []
+        }
+    }
+
+def synth_daily_plan(rng, date_str):
+    tasks = rng.sample(FINANCIAL_TASKS, rng.randint(1, 2))
+    activities = [(title, "financial", 30) for title, _ in tasks] + rng.sample(ACTIVITIES, 3)
+    events = _spread_events(rng, activities)
+    details = dict(tasks)
+    for event in events:
+        if event["category"] == "financial":
+            event["financial_details"] = {
+                "type": details[event["title"]],
+                "amount": float(rng.randrange(0, 500, 10)),
+                "due_date": date_str,
+                "account_balance": float(rng.randrange(500, 5000, 10)),
+                "notes": "Synthesized by the stub server"
+            }
+    return {
+        "events": events,
+        "financial_summary": {
+            "expected_balance": float(rng.randrange(500, 5000, 10)),
+            "upcoming_bills": [],
+            "upcoming_income": [],
+            "savings_progress": {"current": 1000.0, "goal": 5000.0, "percentage": 20.0}
+        }
+    }
+
+def synth_events(rng, date_str):
+    activities = sorted(rng.sample(ACTIVITIES, rng.randint(4, 6)), key=ACTIVITIES.index)
+    events = _spread_events(rng, activities)
+    for event in events:
+        event["activity_details"] = {
+            "type": event["category"],
+            "preferred_time": "morning" if event["time"] < "12:00" else "afternoon" if event["time"] < "17:00" else "evening",
+            "notes": "",
+            "sub_activities": []
+        }
+    return {
+        "events": events,
+        "work_schedule": {"start_time": "09:00", "end_time": "17:00", "breaks": [{"start": "12:00", "end": "12:30"}]}
+    }
+
+def synth_merged_day(rng, date_str):
+    """One day of the merged schema: the financial and activity events of a day in one list."""
+    financial = synth_daily_plan(rng, date_str)
+    activity = synth_events(rng, date_str)
+    return {
+        "events": [event for event in financial["events"] if event["category"] == "financial"] + activity["events"],
+        "financial_summary": financial["financial_summary"],
+        "work_schedule": activity["work_schedule"]
+    }
+
+def synth_brain_dump(rng):
+    plan = synth_events(rng, None)
+    for event in plan["events"]:
+        event["days"] = rng.choice([[], [], ["monday", "wednesday", "friday"], ["saturday", "sunday"]])
+    return plan
+
+def _prompt_dates(prompt):
+    """Return the dates a plan prompt asks for, from its first line."""
+    first_line = next((line for line in prompt.splitlines() if line.strip()), '')
+    return re.findall(r'\d{4}-\d{2}-\d{2}', first_line) or [datetime.now().strftime('%Y-%m-%d')]
+
+def synthesize(messages, rng):
+    """Return response text shaped like the real model's answer to the given prompt."""
+    system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+    prompt = messages[-1]['content']
+    dates = _prompt_dates(prompt)
+    batched = 'keyed by date' in system
+
+    if 'financial information parser' in system:
+        body = synth_budget(rng)
+    elif 'activity goals parser' in system:
+        body = synth_activity_goals(rng)
+    elif 'combined financial and activity planner' in system:
+        body = synth_merged_day(rng, dates[0]) if not batched else \
+            {"days": {date: synth_merged_day(rng, date) for date in dates}}
+    elif 'daily planner' in system:
+        body = synth_daily_plan(rng, dates[0]) if not batched else \
+            {"days": {date: synth_daily_plan(rng, date) for date in dates}}
+    elif 'activity planner' in system:
+        body = synth_events(rng, dates[0]) if not batched else \
+            {"days": {date: synth_events(rng, date) for date in dates}}
+    elif 'calendar planning assistant' in system:
+        body = synth_brain_dump(rng)
+    else:
+        return "You're on track. Keep your savings transfers automatic and review spending weekly."
+    return json.dumps(body)
+
+def completion_response(model, content, messages):
+    prompt_tokens = sum(len(m['content']) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-stub-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+def create_app(**options):
+    """Create the stand-in server app; see DEFAULT_OPTIONS for the settings."""
+    options = dict(DEFAULT_OPTIONS, **options)
+    stub = Flask(__name__)
+    fixtures_dir = Path(options['fixtures_dir'])
+    seen = {}
+    seen_lock = threading.Lock()
+    stats = {'requests': 0, 'replayed': 0, 'recorded': 0, 'synthesized': 0, 'errors_injected': 0}
+
+    def request_rng(key):
+        # Seeded per request key and repetition, so results don't depend on thread interleaving
+        with seen_lock:
+            count = seen[key] = seen.get(key, 0) + 1
+            stats['requests'] += 1
+        return random.Random(f"{options['seed']}:{key}:{count}")
+
+    @stub.route('/v1/chat/completions', methods=['POST'])
+    @stub.route('/chat/completions', methods=['POST'])
+    def chat_completions():
+        body = request.get_json()
+        model = body.get('model', 'gpt-3.5-turbo')
+        messages = body.get('messages', [])
+        key = cache_key(model, messages, body.get('temperature'), body.get('max_tokens'))
+        rng = request_rng(key)
+
+        delay = options['latency_ms'] + rng.uniform(0, options['jitter_ms'])
+        if delay:
+            time.sleep(delay / 1000)
+
+        if rng.random() < options['error_rate']:
+            with seen_lock:
+                stats['errors_injected'] += 1
+            return jsonify({"error": {"message": "Injected error", "type": "stub_error"}}), options['error_status']
+
+        fixture_path = fixtures_dir / f"{key}.json"
+        if options['mode'] == 'replay' and fixture_path.exists():
+            with open(fixture_path, 'r') as f:
+                fixture = json.load(f)
+            with seen_lock:
+                stats['replayed'] += 1
+            return jsonify(fixture['response'])
+
+        if options['mode'] == 'record':
+            upstream = httpx.post(
+                f"{options['upstream'].rstrip('/')}/chat/completions",
+                json=body,
+                headers={"Authorization": f"Bearer {options['api_key']}"},
+                timeout=120
+            )
+            if upstream.status_code != 200:
+                return upstream.content, upstream.status_code, {'Content-Type': 'application/json'}
+            fixtures_dir.mkdir(parents=True, exist_ok=True)
+            with open(fixture_path, 'w') as f:
+                json.dump({"request": body, "response": upstream.json()}, f, indent=2)
+            with seen_lock:
+                stats['recorded'] += 1
+            return jsonify(upstream.json())
+
+        with seen_lock:
+            stats['synthesized'] += 1
+        return jsonify(completion_response(model, synthesize(messages, rng), messages))
+
+    @stub.route('/stats')
+    def stub_stats():
+        with seen_lock:
+            return jsonify(dict(stats))
+
+    return stub
+
+def start_in_thread(host='127.0.0.1', port=0, **options):
+    """Run the stand-in server on a background thread.
+
+    Returns (server, base_url); call server.shutdown() to stop it. Port 0
+    picks a free port.
+    """
+    server = make_server(host, port, create_app(**options), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat completions API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--mode', choices=['replay', 'record', 'synth'], default=DEFAULT_OPTIONS['mode'])
+    parser.add_argument('--fixtures-dir', default=DEFAULT_OPTIONS['fixtures_dir'])
+    parser.add_argument('--latency-ms', type=float, default=0, help="Fixed delay added to every response")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="Random extra delay, up to this many ms")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument('--error-status', type=int, default=429, help="HTTP status of injected errors")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--upstream', default=DEFAULT_OPTIONS['upstream'], help="Real API base URL for record mode")
+    args = parser.parse_args()
+
+    stub = create_app(
+        mode=args.mode,
+        fixtures_dir=args.fixtures_dir,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        upstream=args.upstream,
+        api_key=os.getenv("OPENAI_API_KEY")
+    )
+    print(f"LLM stand-in listening on http://{args.host}:{args.port}/v1 ({args.mode} mode)")
+    stub.run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Minute-resolution occupancy grid of a plan, for bulk free/busy queries.
+
+An Occupancy holds, per event category, how many events occupy each minute
+of a date range as a (categories x days*1440) array. It is built with one
+scatter and one cumulative sum, and conflicts, the first free slot of each
+day and busy hours per category per week are whole-array passes, so a
+180-day plan is analysed in milliseconds rather than event by event.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from interval_index import MINUTES_PER_DAY
+from plan_event import EVENT_CATEGORIES
+
+CATEGORIES = list(EVENT_CATEGORIES)
+
+def _runs(mask):
+    """Return (starts, ends) of the runs of True in a 1-D boolean array."""
+    edges = np.diff(np.concatenate(([False], mask, [False])).astype(np.int8))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+class Occupancy:
+    """Per-category minute counts of the events in a date range.
+
+    `events` are (start, end, category) with datetimes; parts outside the
+    range are ignored and unknown categories count as 'other'.
+    """
+
+    def __init__(self, start_date, days, events):
+        self.start = datetime.combine(start_date, datetime.min.time())
+        self.days = days
+        size = days * MINUTES_PER_DAY
+        events = list(events)
+        origin = np.datetime64(self.start, 'm')
+        starts = (np.array([event[0] for event in events], dtype='datetime64[m]') - origin).astype(np.int64)
+        ends = (np.array([event[1] for event in events], dtype='datetime64[m]') - origin).astype(np.int64)
+        rows = np.array([CATEGORIES.index(event[2]) if event[2] in CATEGORIES else CATEGORIES.index('other')
+                         for event in events], dtype=np.int64)
+
+        # +1 where an event starts and -1 where it ends; the running sum is the number of events per minute
+        starts, ends = np.clip(starts, 0, size), np.clip(ends, 0, size)
+        keep = ends > starts
+        changes = np.zeros((len(CATEGORIES), size + 1), dtype=np.int32)
+        np.add.at(changes, (rows[keep], starts[keep]), 1)
+        np.add.at(changes, (rows[keep], ends[keep]), -1)
+        self.counts = np.cumsum(changes, axis=1)[:, :size]
+        self.total = self.counts.sum(axis=0)
+
+    @classmethod
+    def from_events(cls, start_date, days, events):
+        """Build from event dicts as returned by event_store.query_events."""
+        return cls(start_date, days, ((event['start'], event['end'], event['category']) for event in events))
+
+    def _time(self, minute):
+        return self.start + timedelta(minutes=int(minute))
+
+    def conflicts(self):
+        """Return [(start, end, events)] of the periods where events overlap, with the most overlapping at once."""
+        starts, ends = _runs(self.total > 1)
+        peaks = np.maximum.reduceat(self.total, starts) if len(starts) else []
+        return [(self._time(start), self._time(end), int(peak)) for start, end, peak in zip(starts, ends, peaks)]
+
+    def first_free(self, length, earliest=0, latest=MINUTES_PER_DAY):
+        """Return, for each day, the start of the first free `length` minutes between `earliest` and `latest`, or None."""
+        busy = (self.total.reshape(self.days, MINUTES_PER_DAY)[:, earliest:latest] > 0).astype(np.int32)
+        if length > busy.shape[1]:
+            return [None] * self.days
+        # Busy minutes in each window of `length` minutes, from a running sum per day
+        running = np.concatenate((np.zeros((self.days, 1), dtype=np.int32), np.cumsum(busy, axis=1)), axis=1)
+        free = (running[:, length:] - running[:, :-length]) == 0
+        first = free.argmax(axis=1)
+        return [self._time(day * MINUTES_PER_DAY + earliest + offset) if free[day, offset] else None
+                for day, offset in enumerate(first)]
+
+    def busy_minutes(self):
+        """Return the number of minutes occupied by any event, per day."""
+        return (self.total.reshape(self.days, MINUTES_PER_DAY) > 0).sum(axis=1)
+
+    def busy_hours_by_week(self):
+        """Return {week start date: {category: hours}} of the time occupied by each category, per Monday-based week."""
+        per_day = (self.counts.reshape(len(CATEGORIES), self.days, MINUTES_PER_DAY) > 0).sum(axis=2)
+        weeks = (np.arange(self.days) + self.start.weekday()) // 7
+        per_week = np.zeros((len(CATEGORIES), weeks[-1] + 1 if self.days else 0), dtype=np.int64)
+        np.add.at(per_week, (slice(None), weeks), per_day)
+        first_monday = self.start - timedelta(days=self.start.weekday())
+        return {
+            (first_monday + timedelta(weeks=int(week))).strftime('%Y-%m-%d'): {
+                category: round(per_week[row, week] / 60, 2)
+                for row, category in enumerate(CATEGORIES) if per_week[row, week]
+            }
+            for week in range(per_week.shape[1])
+        }
@@ -0,0 +1,38 @@
+"""Cumulative per-stage timers used by the benchmark suite.
+
+Code wraps a stage in `with stage('name'):`, or decorates a function with
+`@stage('name')`, and the elapsed time is added to a process-wide total.
+Stages run on several threads at once are summed, so with concurrency a
+stage total can exceed the wall time.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_totals = defaultdict(float)
+_calls = defaultdict(int)
+_lock = threading.Lock()
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block and add it to the total for `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _totals[name] += elapsed
+            _calls[name] += 1
+
+def reset_stages():
+    """Clear all stage totals."""
+    with _lock:
+        _totals.clear()
+        _calls.clear()
+
+def get_stage_times():
+    """Return {stage: {'seconds': total, 'calls': count}}."""
+    with _lock:
+        return {name: {'seconds': _totals[name], 'calls': _calls[name]} for name in _totals}
@@ -0,0 +1,223 @@
+"""Compact event representation used between validation and serialization.
+
+Generated events are validated into PlanEvent objects: slotted, with start
+and duration as integer minutes, interned titles and categories, and an
+integer priority. Overlap checks compare integers instead of re-parsing
+time strings (see interval_index), and no icalendar.Event is built; each
+event is rendered straight to VEVENT text when the calendar is written
+(see ics_writer).
+"""
+import copy
+import hashlib
+import json
+import sys
+from datetime import datetime, timedelta
+
+from icalendar.parser import escape_char, foldline
+
+# Event categories and their colors
+EVENT_CATEGORIES = {
+    "financial": "#4CAF50",  # Green
+    "meal": "#FF9800",       # Orange
+    "workout": "#2196F3",    # Blue
+    "learning": "#9C27B0",   # Purple
+    "hobby": "#E91E63",      # Pink
+    "work": "#FF5722",       # Deep Orange
+    "other": "#607D8B"       # Grey
+}
+
+# Weekday names as used in goals and parsed events, and their RRULE BYDAY codes
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+BYDAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+# iCalendar PRIORITY values (1 = highest, 9 = lowest)
+PRIORITY_VALUES = {'high': 1, 'medium': 5, 'low': 9}
+PRIORITY_NAMES = {value: name for name, value in PRIORITY_VALUES.items()}
+
+def parse_minutes(time_str, default=9 * 60):
+    """Return minutes since midnight for 'HH:MM', or `default` if it is invalid."""
+    try:
+        hour, minute = map(int, time_str.split(':'))
+    except (ValueError, AttributeError):
+        return default
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return default
+    return hour * 60 + minute
+
+def parse_duration(duration_str, default=60):
+    """Return the minutes in a '1h' / '1.5h' / '30m' duration, or `default` if it is invalid."""
+    try:
+        if duration_str.endswith('h'):
+            return max(1, round(float(duration_str[:-1]) * 60))
+        if duration_str.endswith('m'):
+            return max(1, round(float(duration_str[:-1])))
+    except (ValueError, AttributeError):
+        pass
+    return default
+
+def profile_hash(*inputs):
+    """Return a short hash identifying the inputs (budget, goals, ...) a plan was generated from."""
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def event_uid(profile, date, slot):
+    """Return the UID of the event in `slot` on `date` of a plan generated from `profile`.
+
+    The same inputs always give the same UIDs, so a regenerated event
+    replaces the old one in calendars instead of being added next to it.
+    """
+    digest = hashlib.sha1(f"{profile}|{date.strftime('%Y-%m-%d')}|{slot}".encode('utf-8')).hexdigest()
+    return f"{digest}@ical-agent"
+
+def _format_datetime(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+def _content_line(name, value):
+    return foldline(f"{name}:{value}") + "\r\n"
+
+def _text_line(name, value):
+    return _content_line(name, escape_char(str(value)))
+
+class PlanEvent:
+    """One validated event of a generated day.
+
+    `start` is minutes since midnight and `duration` is minutes. `details`
+    holds the financial or activity details from the model, if any. `date`,
+    `uid`, `rrule` and `exdates` are set when the event is placed in a calendar.
+    """
+    __slots__ = ('start', 'duration', 'title', 'description', 'category', 'priority', 'details',
+                 'date', 'uid', 'rrule', 'exdates')
+
+    def __init__(self, start, duration, title, description='', category='other', priority=5, details=None):
+        self.start = start
+        self.duration = duration
+        self.title = sys.intern(title)
+        self.description = description
+        self.category = sys.intern(category)
+        self.priority = priority
+        self.details = details
+        self.date = None
+        self.uid = None
+        self.rrule = None
+        self.exdates = None
+
+    @classmethod
+    def from_dict(cls, event, details_key=None):
+        """Build an event from a validated event dict as returned by the model."""
+        return cls(
+            parse_minutes(event.get('time')),
+            parse_duration(event.get('duration')),
+            event.get('title') or 'Untitled Event',
+            event.get('description') or '',
+            event.get('category') if event.get('category') in EVENT_CATEGORIES else 'other',
+            PRIORITY_VALUES.get(event.get('priority'), 5),
+            event.get(details_key) if details_key else None
+        )
+
+    @property
+    def end(self):
+        return self.start + self.duration
+
+    def copy(self):
+        """Return a copy of the event with its own details, not yet placed in a calendar."""
+        return PlanEvent(self.start, self.duration, self.title, self.description, self.category, self.priority,
+                         copy.deepcopy(self.details))
+
+    @property
+    def time_str(self):
+        return f"{self.start // 60:02d}:{self.start % 60:02d}"
+
+    @property
+    def duration_str(self):
+        return f"{self.duration // 60}h" if self.duration % 60 == 0 else f"{self.duration}m"
+
+    def to_dict(self):
+        """Return the event in the dict shape used by the API and the model's schema."""
+        event = {
+            'title': self.title,
+            'time': self.time_str,
+            'duration': self.duration_str,
+            'description': self.description,
+            'category': self.category,
+            'priority': PRIORITY_NAMES.get(self.priority, 'medium')
+        }
+        if self.details:
+            event['financial_details' if self.category == 'financial' else 'activity_details'] = self.details
+        return event
+
+    def full_description(self):
+        """Return the description, with a summary of the financial details appended."""
+        details = self.details if self.category == 'financial' else None
+        if not details:
+            return self.description
+        financial_info = []
+        if details.get('type') == 'bill_payment':
+            financial_info.append(f"Bill Payment: ${details.get('amount', 0):.2f}")
+            financial_info.append(f"Due Date: {details.get('due_date', '')}")
+        elif details.get('type') == 'income':
+            financial_info.append(f"Income: ${details.get('amount', 0):.2f}")
+            financial_info.append(f"Date: {details.get('due_date', '')}")
+        elif details.get('type') == 'savings':
+            financial_info.append(f"Savings Goal: ${details.get('amount', 0):.2f}")
+            if 'account_balance' in details:
+                financial_info.append(f"Current Balance: ${details['account_balance']:.2f}")
+        if details.get('notes'):
+            financial_info.append(f"Notes: {details['notes']}")
+        if not financial_info:
+            return self.description
+        return self.description + "\n\nFinancial Details:\n" + "\n".join(financial_info)
+
+    def to_ical(self):
+        """Render the event as VEVENT text, the way ICSWriter expects components to."""
+        start = datetime.combine(self.date, datetime.min.time()) + timedelta(minutes=self.start)
+        lines = ["BEGIN:VEVENT\r\n"]
+        if self.uid:
+            lines.append(_content_line('UID', self.uid))
+        lines.append(_text_line('SUMMARY', self.title))
+        lines.append(_content_line('DTSTART', _format_datetime(start)))
+        lines.append(_content_line('DTEND', _format_datetime(start + timedelta(minutes=self.duration))))
+        if self.rrule:
+            rule = [f"FREQ={self.rrule['freq'].upper()}"]
+            if self.rrule.get('interval', 1) != 1:
+                rule.append(f"INTERVAL={self.rrule['interval']}")
+            if self.rrule.get('until'):
+                rule.append(f"UNTIL={_format_datetime(self.rrule['until'])}")
+            if self.rrule.get('bymonth'):
+                rule.append(f"BYMONTH={self.rrule['bymonth']}")
+            if self.rrule.get('byday'):
+                rule.append(f"BYDAY={','.join(self.rrule['byday'])}")
+            if self.rrule.get('bymonthday'):
+                rule.append(f"BYMONTHDAY={','.join(str(day) for day in self.rrule['bymonthday'])}")
+            if self.rrule.get('bysetpos'):
+                rule.append(f"BYSETPOS={self.rrule['bysetpos']}")
+            lines.append(_content_line('RRULE', ';'.join(rule)))
+            if self.exdates:
+                lines.append(_content_line('EXDATE', ','.join(
+                    _format_datetime(datetime.combine(day, start.time())) for day in self.exdates)))
+        lines.append(_text_line('DESCRIPTION', self.full_description()))
+        lines.append(_text_line('CATEGORIES', self.category))
+        lines.append(_content_line('COLOR', EVENT_CATEGORIES.get(self.category, EVENT_CATEGORIES['other'])))
+        lines.append(_content_line('PRIORITY', self.priority))
+        if self.details and self.category == 'financial':
+            lines.append(_text_line('X-FINANCIAL-TYPE', self.details.get('type', '')))
+            lines.append(_text_line('X-FINANCIAL-AMOUNT', self.details.get('amount', 0)))
+            lines.append(_text_line('X-FINANCIAL-DUE-DATE', self.details.get('due_date', '')))
+            if 'account_balance' in self.details:
+                lines.append(_text_line('X-FINANCIAL-BALANCE', self.details['account_balance']))
+        elif self.details:
+            lines.append(_text_line('X-ACTIVITY-DETAILS', json.dumps(self.details)))
+        lines.append("END:VEVENT\r\n")
+        return ''.join(lines).encode('utf-8')
+
+def cancelled_event_ical(uid, start, end, title, sequence):
+    """Render the VEVENT that tells a subscribed calendar an event was removed."""
+    return ''.join([
+        "BEGIN:VEVENT\r\n",
+        _text_line('UID', uid),
+        _content_line('DTSTART', _format_datetime(start)),
+        _content_line('DTEND', _format_datetime(end)),
+        _text_line('SUMMARY', title),
+        _content_line('STATUS', 'CANCELLED'),
+        _content_line('SEQUENCE', sequence),
+        "END:VEVENT\r\n"
+    ]).encode('utf-8')
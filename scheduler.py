@@ -0,0 +1,146 @@
+"""Local placement of activities into the free time of a day.
+
+The model suggests a time for each activity, but generated days often
+overlap and fixed slot lists put every activity at the same hour.
+pack_day() keeps each suggested time that is free and moves the rest into
+free time instead of dropping them: first in the activity's preferred part
+of the day, then in the other TIME_SLOTS, then anywhere in the day. Work
+hours are blocked except for their breaks, and higher-priority activities
+are placed first. pack_week() does the same for events repeating on
+several weekdays, which need a time that is free on each of them.
+"""
+from interval_index import IntervalIndex, MINUTES_PER_DAY, cyclic_intervals, week_minutes
+from plan_event import parse_minutes
+
+# Default time slots for different types of activities
+TIME_SLOTS = {
+    "morning": {"start": "07:00", "end": "12:00"},
+    "afternoon": {"start": "12:00", "end": "17:00"},
+    "evening": {"start": "17:00", "end": "22:00"}
+}
+
+SLOT_MINUTES = {name: (parse_minutes(slot['start']), parse_minutes(slot['end'])) for name, slot in TIME_SLOTS.items()}
+
+def work_blocks(work_schedule):
+    """Return the [(start, end)] minutes a work schedule blocks: its hours minus its breaks."""
+    if not work_schedule:
+        return []
+    start = parse_minutes(work_schedule.get('start_time'), None)
+    end = parse_minutes(work_schedule.get('end_time'), None)
+    if start is None or end is None or end <= start:
+        return []
+    blocks = []
+    for work_break in sorted(work_schedule.get('breaks') or [],
+                             key=lambda work_break: parse_minutes(work_break.get('start'), MINUTES_PER_DAY)):
+        break_start = parse_minutes(work_break.get('start'), None)
+        break_end = parse_minutes(work_break.get('end'), None)
+        if break_start is None or break_end is None or not start < break_start < break_end <= end:
+            continue
+        blocks.append((start, break_start))
+        start = break_end
+    if start < end:
+        blocks.append((start, end))
+    return blocks
+
+def slot_of(minute):
+    """Return the name of the TIME_SLOTS slot containing `minute`, or None."""
+    return next((name for name, (start, end) in SLOT_MINUTES.items() if start <= minute < end), None)
+
+def search_windows(start, duration, preferred):
+    """Return the (start, end) windows to look for free time in, most preferred first."""
+    if preferred not in SLOT_MINUTES and start is not None:
+        preferred = slot_of(start)
+    windows = []
+    if start is not None:
+        # The requested time itself, then later in the same slot
+        windows.append((start, start + duration))
+        if preferred in SLOT_MINUTES:
+            windows.append((start, SLOT_MINUTES[preferred][1]))
+    if preferred in SLOT_MINUTES:
+        windows.append(SLOT_MINUTES[preferred])
+    windows += [window for name, window in SLOT_MINUTES.items() if name != preferred]
+    windows.append((0, MINUTES_PER_DAY))
+    return windows
+
+def find_start(index, start, duration, preferred):
+    """Return the first free start for an activity in `index`, searching search_windows(), or None."""
+    for window_start, window_end in search_windows(start, duration, preferred):
+        found = index.first_free(window_start, window_end, duration)
+        if found is not None:
+            return found
+    return None
+
+def pack_day(requests, blocked=()):
+    """Choose a start minute for each (start, duration, priority, preferred_time) request of one day.
+
+    `start` is the requested minute since midnight or None, `priority` follows
+    iCalendar (1 = highest) and `preferred_time` is a TIME_SLOTS name or None.
+    `blocked` lists (start, end) minutes no activity may use, such as
+    work_blocks(). Returns the chosen starts in request order. An activity
+    that fits nowhere keeps its requested time (or its preferred slot's
+    start), overlapping, so nothing is dropped.
+    """
+    index = IntervalIndex()
+    for start, end in blocked:
+        index.add(start, end)
+    starts = [None] * len(requests)
+    order = sorted(range(len(requests)), key=lambda position: (requests[position][2], position))
+    for position in order:
+        start, duration, _, preferred = requests[position]
+        duration = max(1, min(duration, MINUTES_PER_DAY))
+        found = find_start(index, start, duration, preferred)
+        if found is None:
+            found = start if start is not None else SLOT_MINUTES.get(preferred, (0, 0))[0]
+            print(f"Warning: No free time for a {duration} minute activity, keeping it at {found // 60:02d}:{found % 60:02d}")
+        else:
+            index.add(found, found + duration)
+        starts[position] = found
+    return starts
+
+def _week_intervals(weekdays, start, duration):
+    """Return the intervals of a repeating week an event at `start` on `weekdays` occupies."""
+    return [interval for weekday in weekdays
+            for interval in cyclic_intervals(week_minutes(weekday, start), week_minutes(weekday, start) + duration)]
+
+def find_week_start(index, start, duration, preferred, weekdays):
+    """Return the first start free on every one of `weekdays` in the week `index`, searching search_windows(), or None."""
+    for window_start, window_end in search_windows(start, duration, preferred):
+        candidate = window_start
+        while candidate + duration <= window_end:
+            # The latest of the first free starts on each weekday; found once they all agree
+            found = [index.first_free(week_minutes(weekday, candidate), week_minutes(weekday, window_end), duration)
+                     for weekday in weekdays]
+            if None in found:
+                break
+            latest = max(minute - week_minutes(weekday, 0) for weekday, minute in zip(weekdays, found))
+            if latest == candidate:
+                return candidate
+            candidate = latest
+    return None
+
+def pack_week(requests):
+    """Choose a start minute for each (start, duration, priority, preferred_time, weekdays) weekly request.
+
+    Like pack_day(), but each request repeats on its `weekdays` (0 = Monday)
+    and gets a time that is free on all of them. Events running past
+    midnight continue into the next day. Returns the chosen starts in
+    request order; an event that fits nowhere keeps its requested time.
+    """
+    index = IntervalIndex()
+    starts = [None] * len(requests)
+    order = sorted(range(len(requests)), key=lambda position: (requests[position][2], position))
+    for position in order:
+        start, duration, _, preferred, weekdays = requests[position]
+        weekdays = sorted(weekdays)
+        duration = max(1, min(duration, MINUTES_PER_DAY))
+        found = find_week_start(index, start, duration, preferred, weekdays)
+        if found is None:
+            found = start if start is not None else SLOT_MINUTES.get(preferred, (0, 0))[0]
+            print(f"Warning: No free time for a {duration} minute activity, keeping it at {found // 60:02d}:{found % 60:02d}")
+        intervals = _week_intervals(weekdays, found, duration)
+        if not index.add_all(intervals):
+            # Overlapping as a last resort: keep the free parts of the week blocked for later events
+            for interval in intervals:
+                index.add(*interval)
+        starts[position] = found
+    return starts
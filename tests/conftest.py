@@ -0,0 +1,21 @@
+"""Shared test setup: the repository root on sys.path, and a stand-in LLM server for tests that generate plans."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+
+@pytest.fixture(scope='session')
+def llm_stub(tmp_path_factory):
+    """Point the app at llm_stub_server and write plans, jobs and indexes to a temporary directory."""
+    import llm_stub_server
+    server, url = llm_stub_server.start_in_thread(mode='synth', seed=1)
+    os.environ["OPENAI_BASE_URL"] = url
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('plans'))
+    yield url
+    os.chdir(cwd)
+    server.shutdown()
@@ -0,0 +1,56 @@
+import os
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+import artifacts
+import event_store
+
+@pytest.fixture(scope='module')
+def app(llm_stub):
+    import app
+    return app
+
+def new_plan(app):
+    import llm_stub_server
+    budget = llm_stub_server.synth_budget(random.Random(0))
+    goals = llm_stub_server.synth_activity_goals(random.Random(0))
+    url = app.generate_plan(datetime(2025, 1, 6), datetime(2025, 1, 7), budget, goals)
+    return url.rsplit('/', 1)[1][:-4]
+
+def plan_files(plan_id):
+    return [artifacts.plan_path(plan_id), Path(artifacts.PLAN_INPUTS_DIR) / f"{plan_id}.json"] + \
+        [variant for _, variant in artifacts.plan_variants(plan_id)]
+
+def age(plan_id, seconds):
+    """Make a plan's files and indexed events look last used `seconds` ago."""
+    then = time.time() - seconds
+    for path in plan_files(plan_id):
+        os.utime(path, (then, then))
+    event_store._connect().execute("UPDATE plans SET updated_at = ? WHERE plan = ?", (then, plan_id))
+
+def test_cleanup_removes_only_expired_plans(app):
+    expired, fresh = new_plan(app), new_plan(app)
+    expired_files = plan_files(expired)
+    assert len(expired_files) >= 3  # Calendar, inputs and at least the gzip variant
+    age(expired, artifacts.PLAN_TTL + 60)
+
+    assert artifacts.cleanup_artifacts() >= len(expired_files)
+    assert not any(path.exists() for path in expired_files)
+    assert event_store.query_events(expired, datetime(2025, 1, 6), datetime(2025, 1, 8)) is None
+    assert app.app.test_client().get(f"/static/plans/{expired}.ics").status_code == 404
+
+    assert all(path.exists() for path in plan_files(fresh))
+    assert event_store.query_events(fresh, datetime(2025, 1, 6), datetime(2025, 1, 8))
+
+def test_reading_the_feed_restarts_the_ttl(app):
+    plan_id = new_plan(app)
+    age(plan_id, artifacts.PLAN_TTL - 60)
+    assert app.app.test_client().get(f"/api/plans/{plan_id}/feed.ics").status_code == 200
+
+    artifacts.cleanup_artifacts(max_age=artifacts.PLAN_TTL - 120)
+    assert all(path.exists() for path in plan_files(plan_id))
+    assert event_store.sync_token(plan_id) is not None
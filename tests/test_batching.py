@@ -0,0 +1,32 @@
+import random
+from datetime import datetime
+
+import pytest
+
+START, END = datetime(2025, 1, 6), datetime(2025, 1, 9)
+
+@pytest.fixture(scope='module')
+def app(llm_stub):
+    import app
+    return app
+
+def test_window_days_limits(app):
+    assert app.window_days(30, 'local') == app.max_batch_days(app.EVENT_BATCH_DAY_TOKENS) > 1
+    assert app.window_days(30, 'merged') == app.max_batch_days(app.MERGED_BATCH_DAY_TOKENS) > 1
+    assert app.window_days(30, 'llm') == min(app.max_batch_days(app.DAILY_PLAN_BATCH_DAY_TOKENS),
+                                             app.max_batch_days(app.EVENT_BATCH_DAY_TOKENS))
+    assert app.window_days(3, 'llm') == 3
+    assert app.window_days(None, 'llm') == app.PLAN_BATCH_DAYS
+
+@pytest.mark.parametrize('financial_source, requests', [('local', 1), ('llm', 2), ('merged', 1)])
+def test_window_is_one_batched_request(app, financial_source, requests):
+    import llm_client
+    import llm_stub_server
+    budget = llm_stub_server.synth_budget(random.Random(0))
+    goals = llm_stub_server.synth_activity_goals(random.Random(0))
+    days = (END - START).days + 1
+    assert app.window_days(days, financial_source) == days
+
+    before = llm_client.get_client_stats()['requests']
+    app.generate_plan(START, END, budget, goals, batch_days=days, financial_source=financial_source)
+    assert llm_client.get_client_stats()['requests'] - before == requests
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+import pytest
+
+from cashflow import CashFlow, occurrence_dates
+
+BUDGET = {
+    'starting_balance': 100,
+    'savings_goal': 500,
+    'income': {'source': 'Salary', 'amount': 1000, 'frequency': 'biweekly', 'next_date': '2025-01-10'},
+    'bills': [{'name': 'Rent', 'amount': 600, 'due_date': '2025-01-31', 'frequency': 'monthly'}],
+    'expenses': [{'name': 'Food', 'amount': 70, 'frequency': 'weekly'}]
+}
+
+def test_occurrences_start_at_the_anchor():
+    dates = occurrence_dates(datetime(2025, 1, 10), 'biweekly', datetime(2025, 1, 1), datetime(2025, 2, 10))
+    assert dates == [datetime(2025, 1, 10), datetime(2025, 1, 24), datetime(2025, 2, 7)]
+
+def test_monthly_occurrences_fall_on_the_last_day_of_shorter_months():
+    dates = occurrence_dates(datetime(2025, 1, 31), 'monthly', datetime(2025, 1, 1), datetime(2025, 4, 30))
+    assert dates == [datetime(2025, 1, 31), datetime(2025, 2, 28), datetime(2025, 3, 31), datetime(2025, 4, 30)]
+
+def test_unknown_frequency_counts_as_monthly():
+    assert (occurrence_dates(datetime(2025, 1, 5), 'fortnightly', datetime(2025, 1, 1), datetime(2025, 3, 31))
+            == occurrence_dates(datetime(2025, 1, 5), 'monthly', datetime(2025, 1, 1), datetime(2025, 3, 31)))
+
+def test_balance_projection():
+    cashflow = CashFlow(BUDGET, datetime(2025, 1, 1), datetime(2025, 2, 28))
+    assert cashflow.days == 59
+    assert cashflow.income.sum() == 4000  # Jan 10, Jan 24, Feb 7, Feb 21
+    assert cashflow.bills.sum() == 1200   # Jan 31, Feb 28
+    assert cashflow.expenses[0] == pytest.approx(10)
+    # Nothing arrives before the first payday: only the daily expenses go out
+    assert cashflow.balance[cashflow.index(datetime(2025, 1, 9))] == pytest.approx(100 - 9 * 10)
+    assert cashflow.balance[cashflow.index(datetime(2025, 1, 10))] == pytest.approx(100 + 1000 - 10 * 10)
+    assert cashflow.balance[-1] == pytest.approx(100 + 4000 - 1200 - 59 * 10)
+
+def test_summary_lists_upcoming_transactions():
+    cashflow = CashFlow(BUDGET, datetime(2025, 1, 1), datetime(2025, 2, 28))
+    summary = cashflow.summary(datetime(2025, 1, 28))
+    assert summary['upcoming_bills'] == [{'name': 'Rent', 'amount': 600.0, 'due_date': '2025-01-31'}]
+    assert summary['upcoming_income'] == []
+    assert summary['savings_progress']['goal'] == 500
+    assert cashflow.index(datetime(2025, 3, 1)) is None
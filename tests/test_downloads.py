@@ -0,0 +1,47 @@
+import gzip
+import random
+from datetime import datetime
+
+import pytest
+
+@pytest.fixture(scope='module')
+def plan(llm_stub):
+    """Return (app, url) of a generated one-week plan."""
+    import app
+    import llm_stub_server
+    budget = llm_stub_server.synth_budget(random.Random(0))
+    goals = llm_stub_server.synth_activity_goals(random.Random(0))
+    url = app.generate_plan(datetime(2025, 1, 6), datetime(2025, 1, 12), budget, goals)
+    return app, url
+
+def test_download_outside_repo_directory(plan):
+    app, url = plan
+    response = app.app.test_client().get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/calendar'
+    assert response.data.startswith(b'BEGIN:VCALENDAR')
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+def test_download_conditional_and_range(plan):
+    app, url = plan
+    client = app.app.test_client()
+    full = client.get(url)
+    etag = full.headers['ETag']
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    partial = client.get(url, headers={'Range': 'bytes=0-14'})
+    assert partial.status_code == 206
+    assert partial.data == full.data[:15]
+
+def test_download_precompressed(plan):
+    app, url = plan
+    client = app.app.test_client()
+    identity = client.get(url)
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == identity.data
+    assert response.headers['ETag'] != identity.headers['ETag']
+
+def test_download_unknown_plan(plan):
+    app, _ = plan
+    assert app.app.test_client().get('/static/plans/' + '0' * 32 + '.ics').status_code == 404
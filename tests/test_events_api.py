@@ -0,0 +1,70 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from dateutil.rrule import rrulestr
+from icalendar import Calendar
+
+@pytest.fixture(scope='module')
+def app(llm_stub):
+    import app
+    return app
+
+@pytest.fixture(scope='module')
+def plans(app):
+    """Return {mode: (plan id, VEVENTs)} of a two-week plan generated in each mode."""
+    import llm_stub_server
+    budget = llm_stub_server.synth_budget(random.Random(0))
+    goals = llm_stub_server.synth_activity_goals(random.Random(0))
+    plans = {}
+    for mode in ['daily', 'weekday_template']:
+        url = app.generate_plan(datetime(2025, 1, 6), datetime(2025, 1, 19), budget, goals, mode=mode, batch_days=4)
+        plan_id = url.rsplit('/', 1)[1][:-4]
+        with open(app.plan_path(plan_id), 'rb') as f:
+            plans[mode] = plan_id, Calendar.from_ical(f.read()).walk('VEVENT')
+    return plans
+
+def occurrences(vevent, start, end):
+    """Return (uid, start) of each occurrence of a VEVENT in [start, end)."""
+    first = vevent.get('DTSTART').dt
+    if 'RRULE' not in vevent:
+        dates = [first]
+    else:
+        exdates = vevent.get('EXDATE') or []
+        skipped = {dt.dt for exdate in (exdates if isinstance(exdates, list) else [exdates]) for dt in exdate.dts}
+        rule = rrulestr(vevent.get('RRULE').to_ical().decode(), dtstart=first)
+        dates = [occurrence for occurrence in rule if occurrence not in skipped]
+    return [(str(vevent['UID']), date.isoformat()) for date in dates if start <= date < end]
+
+@pytest.mark.parametrize('mode', ['daily', 'weekday_template'])
+def test_events_match_the_calendar(app, plans, mode):
+    plan_id, vevents = plans[mode]
+    start, end = datetime(2025, 1, 8), datetime(2025, 1, 16)
+    response = app.app.test_client().get('/api/events', query_string={'plan': plan_id, 'from': '2025-01-08',
+                                                                      'to': '2025-01-15'})
+    assert response.status_code == 200
+    events = response.get_json()['events']
+    assert [event['start'] for event in events] == sorted(event['start'] for event in events)
+    assert Counter((event['uid'], event['start']) for event in events) == \
+        Counter(occurrence for vevent in vevents for occurrence in occurrences(vevent, start, end))
+    assert any(event['recurring'] for event in events) == (mode == 'weekday_template')
+
+def test_events_of_one_category(app, plans):
+    plan_id, _ = plans['daily']
+    client = app.app.test_client()
+    query = {'plan': plan_id, 'from': '2025-01-06', 'to': '2025-01-19'}
+    events = client.get('/api/events', query_string=query).get_json()['events']
+    financial = client.get('/api/events', query_string=dict(query, category='financial')).get_json()['events']
+    assert financial == [event for event in events if event['category'] == 'financial']
+    assert financial
+
+def test_invalid_event_queries(app, plans):
+    plan_id, _ = plans['daily']
+    client = app.app.test_client()
+    too_long = (datetime(2025, 1, 1) + app.MAX_DATE_RANGE + timedelta(days=1)).strftime('%Y-%m-%d')
+    for query in [{'from': '2025-01-06'}, {'from': '2025-01-10', 'to': '2025-01-06'},
+                  {'from': '2025-01-01', 'to': too_long}, {'from': '2025-01-06', 'to': '2025-01-07', 'category': 'nap'}]:
+        assert client.get('/api/events', query_string=dict(query, plan=plan_id)).status_code == 400
+    assert client.get('/api/events', query_string={'plan': '0' * 32, 'from': '2025-01-06',
+                                                   'to': '2025-01-07'}).status_code == 404
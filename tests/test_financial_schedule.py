@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from dateutil.rrule import rrulestr
+from icalendar import Calendar
+
+from cashflow import occurrence_dates
+from financial_schedule import recurrence, schedule_events, write_schedule
+
+BUDGET = {
+    'income': {'source': 'Paycheck', 'amount': 1200, 'frequency': 'biweekly', 'next_date': '2025-03-21'},
+    'bills': [{'name': 'Rent', 'amount': 1175, 'due_date': '2025-01-31', 'frequency': 'monthly'}],
+    'financial_goals': []
+}
+
+def expand(event, start, end):
+    """Return the occurrence dates of a serialized event from `start` to `end`."""
+    vevent = Calendar.from_ical(b"BEGIN:VCALENDAR\r\n" + event.to_ical() + b"END:VCALENDAR\r\n").walk('VEVENT')[0]
+    dtstart = vevent.get('DTSTART').dt
+    rule = rrulestr(vevent.get('RRULE').to_ical().decode(), dtstart=dtstart)
+    return [date.replace(hour=0, minute=0) for date in rule.between(start, end.replace(hour=23, minute=59), inc=True)]
+
+def test_biweekly_income_is_a_two_weekly_rule():
+    rule = recurrence(datetime(2025, 3, 21), 'biweekly', datetime(2025, 12, 31))
+    assert rule == {'freq': 'weekly', 'interval': 2, 'until': datetime(2025, 12, 31)}
+
+def test_late_month_days_use_the_last_day_of_shorter_months():
+    rule = recurrence(datetime(2025, 1, 31), 'monthly', datetime(2025, 12, 31))
+    assert rule['bymonthday'] == [28, 29, 30, 31] and rule['bysetpos'] == -1
+
+def test_rrules_match_the_cash_flow_dates():
+    start, end = datetime(2025, 1, 1), datetime(2025, 12, 31)
+    events = {event.title: event for event in schedule_events(BUDGET, start, end)}
+    assert expand(events['Payday: Paycheck'], start, end) == occurrence_dates(
+        datetime(2025, 3, 21), 'biweekly', start, end)
+    assert expand(events['Rent due'], start, end) == occurrence_dates(datetime(2025, 1, 31), 'monthly', start, end)
+
+def test_rrule_output():
+    chunks = []
+    count = write_schedule(BUDGET, datetime(2025, 1, 1), datetime(2025, 12, 31), chunks.append)
+    data = b"".join(chunks)
+    assert data.endswith(b"END:VCALENDAR\r\n")
+    assert count == len(Calendar.from_ical(data).walk('VEVENT'))
+    data = data.replace(b"\r\n ", b"")  # Unfold long lines
+    assert b"RRULE:FREQ=WEEKLY;INTERVAL=2;UNTIL=20251231T235959\r\n" in data
+    assert b"RRULE:FREQ=MONTHLY;UNTIL=20251231T235959;BYMONTHDAY=28,29,30,31;BYSETPOS=-1\r\n" in data
@@ -0,0 +1,65 @@
+import random
+from datetime import datetime
+
+import pytest
+from icalendar import Calendar, Event
+
+from ics_writer import CALENDAR_FOOTER, split_calendar, write_calendar
+
+def sample_calendar():
+    cal = Calendar()
+    cal.add('prodid', '-//Test//EN')
+    cal.add('version', '2.0')
+    for day in range(1, 4):
+        event = Event()
+        event.add('summary', f"Event {day}, with a long description " + 'x' * 80)
+        event.add('dtstart', datetime(2025, 1, day, 9))
+        event.add('uid', f"{day}@test")
+        cal.add_component(event)
+    return cal
+
+def test_write_calendar_matches_to_ical():
+    cal = sample_calendar()
+    chunks = []
+    assert write_calendar(cal, chunks.append) == 3
+    assert b''.join(chunks) == cal.to_ical()
+    # Header first, one chunk per component, footer last
+    assert len(chunks) == 5
+    assert chunks[-1] == CALENDAR_FOOTER
+
+def test_split_calendar_round_trips():
+    data = sample_calendar().to_ical()
+    header, components = split_calendar(data)
+    assert header.startswith(b'BEGIN:VCALENDAR\r\n')
+    assert len(components) == 3
+    assert all(component.startswith(b'BEGIN:VEVENT') for component in components)
+    assert header + b''.join(components) + CALENDAR_FOOTER == data
+
+@pytest.fixture(scope='module')
+def client(llm_stub):
+    import app
+    return app.app.test_client()
+
+@pytest.fixture(scope='module')
+def plan_request():
+    import llm_stub_server
+    return {
+        'start_date': '2025-01-06',
+        'end_date': '2025-01-08',
+        'budget_info': llm_stub_server.synth_budget(random.Random(0)),
+        'activity_goals': llm_stub_server.synth_activity_goals(random.Random(0)),
+    }
+
+def test_streamed_plan_matches_saved_calendar(client, plan_request):
+    response = client.post('/api/generate_plan/stream', json=plan_request)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/calendar'
+    body = response.get_data()
+    assert body.endswith(CALENDAR_FOOTER)
+    assert body == client.get(response.headers['X-Calendar-Url']).get_data()
+    assert Calendar.from_ical(body).walk('VEVENT')
+
+def test_failed_stream_ends_without_footer(client, plan_request):
+    response = client.post('/api/generate_plan/stream', json={**plan_request, 'mode': 'unknown'})
+    assert response.status_code == 200
+    assert not response.get_data().endswith(CALENDAR_FOOTER)
@@ -0,0 +1,24 @@
+from interval_index import IntervalIndex, MINUTES_PER_WEEK, cyclic_intervals, week_minutes
+
+def test_conflicts_and_first_free():
+    index = IntervalIndex()
+    assert index.add(60, 120)
+    assert index.add(180, 240)
+    assert not index.add(100, 200)
+    assert index.conflicts(119, 130) and not index.conflicts(120, 180)
+    assert index.first_free(0, 300, 60) == 0
+    assert index.first_free(90, 300, 60) == 120
+    assert index.first_free(90, 301, 61) == 240
+    assert index.first_free(90, 300, 61) is None
+    assert list(index) == [(60, 120), (180, 240)]
+
+def test_add_all_accepts_all_or_nothing():
+    index = IntervalIndex()
+    index.add(100, 200)
+    assert not index.add_all([(0, 50), (150, 160)])
+    assert len(index) == 1
+
+def test_week_minutes_and_wrapping():
+    assert week_minutes(2, 90) == 2 * 24 * 60 + 90
+    assert cyclic_intervals(MINUTES_PER_WEEK - 30, MINUTES_PER_WEEK + 30) == [
+        (MINUTES_PER_WEEK - 30, MINUTES_PER_WEEK), (0, 30)]
@@ -0,0 +1,64 @@
+import json
+import random
+import threading
+
+import pytest
+
+import jobs
+
+@pytest.fixture(scope='module')
+def client(llm_stub):
+    import app
+    return app.app.test_client()
+
+def sse_events(body):
+    """Return [(event, data)] of an SSE body, with comments as ('comment', text)."""
+    events = []
+    for block in body.decode('utf-8').strip().split('\n\n'):
+        if block.startswith(':'):
+            events.append(('comment', block[1:].strip()))
+            continue
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+def test_job_events_stream_each_day_then_done(client):
+    import llm_stub_server
+    response = client.post('/api/jobs/generate_plan', json={
+        'start_date': '2025-01-06',
+        'end_date': '2025-01-08',
+        'budget_info': llm_stub_server.synth_budget(random.Random(0)),
+        'activity_goals': llm_stub_server.synth_activity_goals(random.Random(0)),
+    })
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    stream = client.get(f"/api/jobs/{job_id}/events")
+    assert stream.mimetype == 'text/event-stream'
+    events = [(name, data) for name, data in sse_events(stream.get_data()) if name != 'comment']
+    days = [data for name, data in events if name == 'day']
+    assert [day['days_completed'] for day in days] == [1, 2, 3]
+    assert events[-1][0] == 'done'
+    assert events[-1][1]['artifact_url']
+
+def test_idle_stream_sends_keepalives_then_poll(client, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_STREAM_KEEPALIVE', 0)
+    monkeypatch.setattr(jobs, 'JOB_STREAM_MAX_SECONDS', 1)
+    release = threading.Event()
+
+    def stalled(job_id, progress):
+        release.wait(10)
+        return None
+
+    job = jobs.submit_job('test', 1, stalled)
+    try:
+        events = sse_events(client.get(f"/api/jobs/{job['id']}/events").get_data())
+    finally:
+        release.set()
+    assert ('comment', 'keepalive') in events
+    name, data = events[-1]
+    assert name == 'poll'
+    assert data['id'] == job['id'] and data['status'] in ('queued', 'running')
+
+def test_events_of_unknown_job(client):
+    assert client.get('/api/jobs/' + '0' * 32 + '/events').status_code == 404
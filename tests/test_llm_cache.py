@@ -0,0 +1,50 @@
+import json
+import threading
+
+import pytest
+
+import llm_cache
+
+MESSAGES = [{"role": "user", "content": "Plan 2025-01-01"}]
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """An enabled, empty cache whose completions are numbered replies instead of API calls."""
+    calls = []
+
+    def chat_completion(model, messages, max_tokens, temperature):
+        calls.append(messages)
+        return json.dumps({"reply": len(calls)})
+
+    monkeypatch.setattr(llm_cache, 'LLM_CACHE_ENABLED', True)
+    monkeypatch.setattr(llm_cache, 'LLM_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.setattr(llm_cache, '_local', threading.local())
+    monkeypatch.setattr(llm_cache, 'chat_completion', chat_completion)
+    return calls
+
+def test_hit_after_miss(cache):
+    first = llm_cache.cached_chat_completion("model", MESSAGES, 100, 0.7)
+    second = llm_cache.cached_chat_completion("model", MESSAGES, 100, 0.7)
+    assert first == second and len(cache) == 1
+    stats = llm_cache.get_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+def test_key_ignores_indentation_but_not_parameters(cache):
+    llm_cache.cached_chat_completion("model", MESSAGES, 100, 0.7)
+    llm_cache.cached_chat_completion("model", [{"role": "user", "content": "  Plan 2025-01-01\n"}], 100, 0.7)
+    assert len(cache) == 1
+    llm_cache.cached_chat_completion("model", MESSAGES, 200, 0.7)
+    assert len(cache) == 2
+
+def test_refresh_skips_the_lookup_and_replaces_the_entry(cache):
+    first = llm_cache.cached_chat_completion("model", MESSAGES, 100, 0.7)
+    refreshed = llm_cache.cached_chat_completion("model", MESSAGES, 100, 0.7, refresh=True)
+    assert refreshed != first and len(cache) == 2
+    assert llm_cache.cached_chat_completion("model", MESSAGES, 100, 0.7) == refreshed
+    assert llm_cache.get_cache_stats()['entries'] == 1
+
+def test_invalid_json_is_not_cached(cache, monkeypatch):
+    monkeypatch.setattr(llm_cache, 'chat_completion', lambda *args: cache.append(args) or "not json")
+    llm_cache.cached_chat_completion("model", MESSAGES, 100, 0.7)
+    llm_cache.cached_chat_completion("model", MESSAGES, 100, 0.7)
+    assert len(cache) == 2
@@ -0,0 +1,50 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import llm_client
+from llm_client import CircuitBreaker, CircuitOpenError
+
+def failing_client(error):
+    def create(**kwargs):
+        raise error
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    monkeypatch.setattr(llm_client, '_breaker', breaker)
+    return breaker
+
+def test_breaker_opens_and_lets_one_probe_through(breaker):
+    assert breaker.before_call() is False
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+def test_probe_failing_with_unclassified_error_reopens_the_breaker(breaker, monkeypatch):
+    monkeypatch.setattr(llm_client, 'get_client', lambda: failing_client(RuntimeError('malformed response')))
+    messages = [{'role': 'user', 'content': 'hello'}]
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    probe_started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        llm_client.chat_completion('gpt-3.5-turbo', messages, 10, 0)
+    assert breaker.state == 'open'
+    assert not breaker.probing
+    assert breaker.opened_at >= probe_started
+    with pytest.raises(CircuitOpenError):
+        llm_client.chat_completion('gpt-3.5-turbo', messages, 10, 0)
+
+    # After a fresh cooldown the next call is a probe again
+    time.sleep(0.06)
+    assert breaker.before_call() is True
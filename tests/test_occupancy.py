@@ -0,0 +1,37 @@
+from datetime import date, datetime, timedelta
+
+from event_generator import process_events
+from occupancy import Occupancy
+
+DAY = date(2025, 1, 6)
+
+def at(hour, minute=0, day=6):
+    return datetime(2025, 1, day, hour, minute)
+
+def test_conflicts_first_free_and_busy_time():
+    grid = Occupancy(DAY, 2, [
+        (at(9), at(10), 'work'),
+        (at(9, 30), at(11), 'workout'),
+        (at(7), at(8), 'learning'),
+        (at(23), at(1, day=7), 'other'),
+    ])
+    assert grid.conflicts() == [(at(9, 30), at(10), 2)]
+    assert grid.first_free(60, 7 * 60, 22 * 60) == [at(8), at(7, day=7)]
+    assert list(grid.busy_minutes()) == [240, 60]
+    assert grid.busy_hours_by_week() == {'2025-01-06': {'work': 1.0, 'workout': 1.5, 'learning': 1.0, 'other': 2.0}}
+
+def test_activities_in_work_breaks_are_not_conflicts():
+    events = process_events({
+        'work_schedule': {'start_time': '09:00', 'end_time': '17:00', 'breaks': [{'start': '12:00', 'end': '13:00'}]},
+        'events': [
+            {'title': 'Lunch Walk', 'time': '12:00', 'duration': '1h', 'category': 'workout', 'priority': 'high'},
+            {'title': 'Reading', 'time': '10:00', 'duration': '30m', 'category': 'learning', 'priority': 'medium'},
+        ],
+    })['events']
+    assert [(event.start, event.end) for event in events if event.category == 'work'] == [(540, 720), (780, 1020)]
+    assert next(event for event in events if event.title == 'Lunch Walk').start == 720
+
+    midnight = at(0)
+    grid = Occupancy(DAY, 1, [(midnight + timedelta(minutes=event.start), midnight + timedelta(minutes=event.end),
+                               event.category) for event in events])
+    assert grid.conflicts() == []
@@ -0,0 +1,46 @@
+import json
+from datetime import date
+
+from icalendar import Event
+
+from plan_event import PlanEvent
+
+def rendered(event):
+    event.date = date(2025, 1, 6)
+    event.uid = 'abc@ical-agent'
+    return event.to_ical()
+
+def test_text_values_are_escaped():
+    event = PlanEvent(540, 30, 'Call mom, dad; sister', 'Line one\nLine two \\ done', category='other')
+    data = rendered(event)
+    assert rb'SUMMARY:Call mom\, dad\; sister' + b'\r\n' in data
+    assert rb'DESCRIPTION:Line one\nLine two \\ done' + b'\r\n' in data
+
+    parsed = Event.from_ical(data)
+    assert str(parsed['SUMMARY']) == 'Call mom, dad; sister'
+    assert str(parsed['DESCRIPTION']) == 'Line one\nLine two \\ done'
+
+def test_long_lines_are_folded():
+    description = 'Stretch and breathe. ' * 20 + 'Café ☕ ' * 10
+    data = rendered(PlanEvent(540, 30, 'Yoga', description, category='workout',
+                              details={'type': 'yoga', 'notes': 'x' * 200}))
+    lines = data.split(b'\r\n')
+    assert all(len(line) <= 75 for line in lines)
+    assert any(line.startswith(b' ') for line in lines)
+    # Folding never splits a multi-byte character
+    for line in lines:
+        line.decode('utf-8')
+
+    parsed = Event.from_ical(data)
+    assert str(parsed['DESCRIPTION']) == description
+    assert json.loads(str(parsed['X-ACTIVITY-DETAILS'])) == {'type': 'yoga', 'notes': 'x' * 200}
+
+def test_times_and_financial_details():
+    event = PlanEvent(1410, 45, 'Pay rent', 'Monthly rent', category='financial',
+                      details={'type': 'bill_payment', 'amount': 1200.5, 'due_date': '2025-01-07'})
+    parsed = Event.from_ical(rendered(event))
+    assert parsed['DTSTART'].dt.isoformat() == '2025-01-06T23:30:00'
+    assert parsed['DTEND'].dt.isoformat() == '2025-01-07T00:15:00'
+    assert str(parsed['UID']) == 'abc@ical-agent'
+    assert str(parsed['X-FINANCIAL-AMOUNT']) == '1200.5'
+    assert 'Bill Payment: $1200.50' in str(parsed['DESCRIPTION'])
@@ -0,0 +1,31 @@
+import random
+
+import pytest
+
+@pytest.fixture(scope='module')
+def client(llm_stub):
+    import app
+    return app.app.test_client()
+
+@pytest.fixture(scope='module')
+def plan_request():
+    import llm_stub_server
+    return {
+        'start_date': '2025-01-06',
+        'end_date': '2025-01-07',
+        'budget_info': llm_stub_server.synth_budget(random.Random(0)),
+        'activity_goals': llm_stub_server.synth_activity_goals(random.Random(0)),
+    }
+
+@pytest.mark.parametrize('route', ['/api/generate_plan', '/api/generate_plan/stream', '/api/jobs/generate_plan'])
+@pytest.mark.parametrize('options', [{'concurrency': 'abc'}, {'concurrency': 0}, {'batch_days': -2},
+                                     {'batch_days': 1.5}, {'concurrency': True}])
+def test_invalid_plan_options_are_rejected(client, plan_request, route, options):
+    response = client.post(route, json={**plan_request, **options})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+def test_valid_plan_options(client, plan_request):
+    response = client.post('/api/generate_plan', json={**plan_request, 'concurrency': 2, 'batch_days': 2})
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
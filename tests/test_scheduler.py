@@ -0,0 +1,26 @@
+from scheduler import SLOT_MINUTES, pack_day, pack_week, work_blocks
+
+def test_work_blocks_leave_the_breaks_free():
+    schedule = {'start_time': '09:00', 'end_time': '17:00', 'breaks': [{'start': '12:00', 'end': '13:00'}]}
+    assert work_blocks(schedule) == [(540, 720), (780, 1020)]
+
+def test_pack_day_keeps_free_times_and_moves_overlaps():
+    starts = pack_day([(480, 60, 5, None), (480, 30, 5, None), (480, 60, 1, None)])
+    # The high-priority request keeps its time; the others move to the next free time
+    assert starts == [540, 600, 480]
+
+def test_pack_day_avoids_blocked_time():
+    morning_start, morning_end = SLOT_MINUTES['morning']
+    starts = pack_day([(600, 30, 5, 'morning')], blocked=[(morning_start, morning_end)])
+    assert starts[0] >= morning_end
+
+def test_pack_day_never_drops_requests():
+    starts = pack_day([(0, 24 * 60, 1, None), (600, 30, 5, None)])
+    assert starts == [0, 600]
+
+def test_pack_week_finds_a_time_free_on_every_weekday():
+    # Daily at 9:00 for an hour, then Wednesday/Friday at 9:00 for an hour
+    starts = pack_week([(540, 60, 5, None, range(7)), (540, 60, 5, None, [2, 4]), (540, 30, 5, None, [0])])
+    assert starts[0] == 540
+    assert starts[1] == 600
+    assert starts[2] == 600
@@ -0,0 +1,82 @@
+import random
+from datetime import datetime
+
+import pytest
+from icalendar import Calendar, Event
+
+from ics_writer import CALENDAR_FOOTER, split_calendar
+
+@pytest.fixture(scope='module')
+def app(llm_stub):
+    import app
+    return app
+
+def calendar(*events):
+    cal = Calendar()
+    cal.add('prodid', '-//Test//EN')
+    cal.add('version', '2.0')
+    for uid, title in events:
+        event = Event()
+        event.add('uid', uid)
+        event.add('summary', title)
+        event.add('dtstart', datetime(2025, 1, 6, 9))
+        event.add('dtend', datetime(2025, 1, 6, 10))
+        cal.add_component(event)
+    return cal.to_ical()
+
+def test_changes_since_reports_changes_and_tombstones(app):
+    import event_store
+    plan_id = 'sync-test'
+    event_store.index_plan(plan_id, calendar(('a', 'Run'), ('b', 'Read')))
+    first = event_store.sync_token(plan_id)
+
+    # Re-indexing the same calendar doesn't advance the token
+    event_store.index_plan(plan_id, calendar(('a', 'Run'), ('b', 'Read')))
+    assert event_store.sync_token(plan_id) == first
+
+    event_store.index_plan(plan_id, calendar(('a', 'Long run'), ('c', 'Cook')))
+    second = event_store.sync_token(plan_id)
+    assert int(second) == int(first) + 1
+    changes = {uid: (title, ical) for uid, _, _, title, _, ical in event_store.changes_since(plan_id, first)}
+    assert set(changes) == {'a', 'b', 'c'}
+    assert changes['a'][0] == 'Long run' and changes['a'][1]
+    assert changes['b'] == ('Read', None)
+
+    assert event_store.changes_since(plan_id, second) == []
+    assert event_store.changes_since(plan_id, str(int(second) + 1)) is None
+    assert event_store.changes_since(plan_id, 'abc') is None
+
+def test_feed_sends_only_changes_since_the_token(app):
+    import event_store
+    import llm_stub_server
+    budget = llm_stub_server.synth_budget(random.Random(0))
+    goals = llm_stub_server.synth_activity_goals(random.Random(0))
+    url = app.generate_plan(datetime(2025, 1, 6), datetime(2025, 1, 7), budget, goals)
+    plan_id = url.rsplit('/', 1)[1][:-4]
+    client = app.app.test_client()
+    feed = f"/api/plans/{plan_id}/feed.ics"
+
+    full = client.get(feed)
+    token = full.headers['X-Sync-Token']
+    assert client.get(feed, headers={'If-None-Match': full.headers['ETag']}).status_code == 304
+
+    unchanged = client.get(feed, query_string={'sync_token': token})
+    assert unchanged.headers['X-Sync-Token'] == token
+    assert not Calendar.from_ical(unchanged.get_data()).walk('VEVENT')
+    assert client.get(feed, query_string={'sync_token': token},
+                      headers={'If-None-Match': unchanged.headers['ETag']}).status_code == 304
+
+    # Drop the first event from the plan
+    header, components = split_calendar(full.get_data())
+    removed = Calendar.from_ical(components[0]).get('UID')
+    event_store.index_plan(plan_id, header + b''.join(components[1:]) + CALENDAR_FOOTER)
+
+    delta = client.get(feed, query_string={'sync_token': token})
+    assert int(delta.headers['X-Sync-Token']) == int(token) + 1
+    [cancelled] = Calendar.from_ical(delta.get_data()).walk('VEVENT')
+    assert cancelled['UID'] == removed
+    assert cancelled['STATUS'] == 'CANCELLED'
+    assert int(cancelled['SEQUENCE']) == int(token) + 1
+
+    # An unknown token gets the full calendar
+    assert client.get(feed, query_string={'sync_token': '999999'}).get_data() == full.get_data()
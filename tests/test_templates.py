@@ -0,0 +1,51 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from dateutil.rrule import rrulestr
+from icalendar import Calendar
+
+from cashflow import CashFlow
+
+START, END = datetime(2025, 1, 6), datetime(2025, 2, 2)
+
+@pytest.fixture(scope='module')
+def app(llm_stub):
+    import app
+    return app
+
+def occurrences(vevent):
+    """Return the dates on which a VEVENT occurs, with its RRULE expanded and EXDATEs removed."""
+    start = vevent.get('DTSTART').dt
+    if 'RRULE' not in vevent:
+        return [start.date()]
+    exdates = vevent.get('EXDATE') or []
+    excluded = {dt.dt for exdate in (exdates if isinstance(exdates, list) else [exdates]) for dt in exdate.dts}
+    rule = rrulestr(vevent.get('RRULE').to_ical().decode(), dtstart=start)
+    return [occurrence.date() for occurrence in rule if occurrence not in excluded]
+
+@pytest.mark.parametrize('financial_source', ['llm', 'local'])
+def test_override_days_replace_their_template(app, financial_source):
+    import llm_stub_server
+    budget = llm_stub_server.synth_budget(random.Random(0))
+    goals = llm_stub_server.synth_activity_goals(random.Random(0))
+    url = app.generate_plan(START, END, budget, goals, mode='weekday_template', financial_source=financial_source)
+    with open(app.plan_path(url.rsplit('/', 1)[1][:-4]), 'rb') as f:
+        events = Calendar.from_ical(f.read()).walk('VEVENT')
+    overrides = {date.date() for date in CashFlow(budget, START, END).event_dates()}
+    assert overrides
+
+    templates = [event for event in events if 'RRULE' in event]
+    for event in templates:
+        assert not overrides & set(occurrences(event)), str(event.get('SUMMARY'))
+    # Bills and paydays never repeat weekly; only the budget review does
+    assert {str(event.get('SUMMARY')) for event in templates if event.get('CATEGORIES').cats == ['financial']} \
+        <= {"Budget Review"}
+
+    by_day = Counter((date, str(event.get('SUMMARY')), event.get('DTSTART').dt.time())
+                     for event in events for date in occurrences(event))
+    assert not [key for key, count in by_day.items() if count > 1]
+    # Every day of the range is planned
+    planned = {date for date, _, _ in by_day}
+    assert planned == {(START + timedelta(days=offset)).date() for offset in range((END - START).days + 1)}
@@ -0,0 +1,66 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from ics_writer import component_properties, split_calendar
+from plan_event import PlanEvent
+
+@pytest.fixture(scope='module')
+def app(llm_stub):
+    import app
+    return app
+
+def day_plans():
+    financial = {'events': [PlanEvent(480, 15, "Rent due", category='financial')]}
+    activities = {'events': [PlanEvent(420, 30, "Breakfast", category='meal'),
+                             PlanEvent(1080, 60, "Morning Run", category='workout'),
+                             PlanEvent(1140, 30, "Breakfast", category='meal')]}
+    return financial, activities
+
+def uids(app, financial, activities, date=datetime(2025, 1, 6), **options):
+    added = app.add_day_to_calendar(app.EventCollector(), date, financial, activities, profile='p', **options)
+    return {(event.category, event.title, event.start): event.uid for event in added}
+
+def test_uids_are_unique_and_stable(app):
+    first = uids(app, *day_plans())
+    assert len(set(first.values())) == 4
+    assert uids(app, *day_plans()) == first
+
+def test_uids_do_not_depend_on_the_order_of_other_categories(app):
+    financial, activities = day_plans()
+    first = uids(app, financial, activities)
+    financial, activities = day_plans()
+    # Another category's events come first and in between
+    activities['events'].insert(0, PlanEvent(600, 30, "Read", category='learning'))
+    activities['events'].insert(2, PlanEvent(660, 30, "Sketch", category='hobby'))
+    second = uids(app, financial, activities)
+    assert {key: uid for key, uid in second.items() if key[0] in ('financial', 'meal', 'workout')} == first
+
+def test_recurring_and_single_events_differ(app):
+    single = uids(app, *day_plans())
+    recurring = uids(app, *day_plans(), rrule={'freq': 'weekly', 'byday': ['MO']})
+    assert not set(single.values()) & set(recurring.values())
+
+def plan_uids(app, plan_id):
+    with open(app.plan_path(plan_id), 'rb') as f:
+        _, components = split_calendar(f.read())
+    return components, [component_properties(component)['UID'] for component in components]
+
+@pytest.mark.parametrize('mode', ['daily', 'weekday_template'])
+def test_replan_keeps_uids_unique(app, mode):
+    import llm_stub_server
+    budget = llm_stub_server.synth_budget(random.Random(0))
+    goals = llm_stub_server.synth_activity_goals(random.Random(0))
+    url = app.generate_plan(datetime(2025, 1, 6), datetime(2025, 1, 19), budget, goals, mode=mode)
+    plan_id = url.rsplit('/', 1)[1][:-4]
+    before, before_uids = plan_uids(app, plan_id)
+    assert len(before_uids) == len(set(before_uids))
+
+    result = app.replan(plan_id, datetime(2025, 1, 8), datetime(2025, 1, 9), category='meal')
+    assert result is not None
+    after, after_uids = plan_uids(app, plan_id)
+    assert len(after_uids) == len(set(after_uids))
+    # Events of other categories are copied through unchanged
+    assert [component for component in before if component_properties(component).get('CATEGORIES') != 'meal'] \
+        == [component for component in after if component_properties(component).get('CATEGORIES') != 'meal']